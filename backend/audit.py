@@ -0,0 +1,393 @@
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import Session
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+import models, database, dates
+
+# --- AUDITORÍA ASÍNCRONA (LEY 20.584) ---
+# Las rutas de escritura NO insertan en audit_logs: dejan el registro en la
+# bandeja `audit_outbox` dentro de su propia transacción (atómico con la
+# operación: si hay COMMIT hay auditoría, si hay ROLLBACK no). Un worker en
+# segundo plano la traspasa en bloque a audit_logs, encadenando cada fila
+# con un HMAC sobre la anterior para que cualquier edición o borrado sea
+# detectable (ver verify_chain).
+
+logger = logging.getLogger("odonto.audit")
+
+AUDIT_WORKER = os.getenv("AUDIT_WORKER", "true").lower() == "true"
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+# Llave de la cadena; por defecto la misma SECRET_KEY de los JWT
+AUDIT_CHAIN_KEY = (os.getenv("AUDIT_CHAIN_KEY") or os.getenv("SECRET_KEY") or "").encode()
+# Meses de particiones creadas por adelantado y retención por defecto
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", 3))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", 24))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "./audit_archive")
+# Proxies de confianza delante de la API (0 = se usa la IP del socket)
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+
+# Un solo traspaso a la vez aunque haya varios procesos/réplicas
+_ADVISORY_LOCK_KEY = 0x4155444954  # 'AUDIT'
+GENESIS_HASH = "0" * 64
+
+# --- IP REAL DEL CLIENTE ---
+client_ip: ContextVar = ContextVar("client_ip", default=None)
+
+class ClientIPMiddleware:
+    """
+    Middleware ASGI que deja la IP del cliente en `client_ip` para el resto
+    del request. Detrás de N proxies de confianza se toma la N-ésima
+    dirección desde la derecha de X-Forwarded-For (las de la izquierda las
+    controla el cliente y no son confiables).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = client_ip.set(resolve_client_ip(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            client_ip.reset(token)
+
+def resolve_client_ip(scope) -> str:
+    peer = scope["client"][0] if scope.get("client") else None
+    if TRUSTED_PROXY_COUNT <= 0:
+        return peer
+    forwarded = []
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            forwarded.extend(ip.strip() for ip in value.decode("latin-1").split(","))
+    forwarded = [ip for ip in forwarded if ip]
+    if len(forwarded) >= TRUSTED_PROXY_COUNT:
+        return forwarded[-TRUSTED_PROXY_COUNT][:50]
+    return peer
+
+# --- REGISTRO (RUTA DEL REQUEST) ---
+
+def record(db: Session, action: str, user_id=None, clinic_id=None, details=None):
+    """
+    Agrega un evento de auditoría a la transacción en curso de `db`.
+    Se confirma con el mismo COMMIT que la operación auditada.
+    """
+    db.add(models.AuditOutbox(payload=json.dumps({
+        "action": action,
+        "user_id": str(user_id) if user_id else None,
+        "clinic_id": str(clinic_id) if clinic_id else None,
+        "details": details,
+        "ip_address": client_ip.get(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })))
+    db.info["audit_pending"] = True
+
+# --- CADENA DE INTEGRIDAD ---
+
+def chain_hash(prev_hash: str, seq: int, entry: dict) -> str:
+    # sort_keys: JSONB no conserva el orden de las llaves de `details`
+    canonical = json.dumps([
+        seq,
+        entry["action"],
+        str(entry["user_id"]) if entry["user_id"] else None,
+        str(entry["clinic_id"]) if entry["clinic_id"] else None,
+        entry["details"],
+        entry["ip_address"],
+        dates.as_utc(entry["created_at"]).isoformat(),
+    ], separators=(",", ":"), sort_keys=True)
+    return hmac.new(AUDIT_CHAIN_KEY, (prev_hash + canonical).encode(), hashlib.sha256).hexdigest()
+
+# --- TRASPASO EN BLOQUE (WORKER) ---
+
+def flush_outbox(db: Session, batch_size: int = AUDIT_BATCH_SIZE) -> int:
+    """
+    Mueve hasta `batch_size` eventos de la bandeja a audit_logs en UNA
+    transacción (INSERT multi-fila + DELETE). Retorna cuántos movió.
+    """
+    if db.bind.dialect.name == "postgresql":
+        try:
+            ensure_partitions(db)
+        except Exception:
+            # Sin el mes nuevo las filas caen en audit_logs_default: no se pierden
+            db.rollback()
+            logger.exception("No se pudieron crear las particiones de auditoría")
+        # Lock de transacción: se libera solo con el COMMIT/ROLLBACK
+        locked = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            db.rollback()
+            return 0
+
+    pending = db.execute(
+        select(models.AuditOutbox.id, models.AuditOutbox.payload)
+        .order_by(models.AuditOutbox.id)
+        .limit(batch_size)
+    ).all()
+    if not pending:
+        db.rollback()
+        return 0
+
+    last = db.execute(
+        select(models.AuditLog.seq, models.AuditLog.record_hash)
+        .where(models.AuditLog.seq != None)
+        .order_by(models.AuditLog.seq.desc())
+        .limit(1)
+    ).first()
+    seq, prev_hash = (last.seq, last.record_hash) if last else (0, GENESIS_HASH)
+
+    rows = []
+    for outbox_id, payload in pending:
+        entry = json.loads(payload)
+        entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+        for key in ("user_id", "clinic_id"):
+            entry[key] = uuid.UUID(entry[key]) if entry[key] else None
+        seq += 1
+        prev_hash = chain_hash(prev_hash, seq, entry)
+        rows.append({**entry, "seq": seq, "record_hash": prev_hash})
+
+    db.execute(insert(models.AuditLog), rows)
+    db.query(models.AuditOutbox).filter(
+        models.AuditOutbox.id.in_([outbox_id for outbox_id, _ in pending])
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(rows)
+
+def drain(batch_size: int = AUDIT_BATCH_SIZE) -> int:
+    total = 0
+    with database.SessionLocal() as db:
+        while True:
+            moved = flush_outbox(db, batch_size)
+            total += moved
+            if moved < batch_size:
+                return total
+
+def verify_chain(db: Session, batch_size: int = 1000, archive_dir: str = AUDIT_ARCHIVE_DIR):
+    """
+    Recalcula la cadena completa. Retorna el `seq` del primer registro
+    alterado (o el siguiente a uno borrado), o None si está íntegra.
+    Sin archivos, el primer registro debe ser seq=1 enlazado con el hash
+    génesis. Si los meses más antiguos ya se archivaron, los manifiestos
+    deben cubrir 1..N sin huecos y el primer registro vigente debe ser el
+    N+1, enlazado con el `last_hash` del último manifiesto: borrar las
+    primeras filas (o una partición sin su archivo) también se detecta.
+    """
+    expected_seq, prev_hash = 0, GENESIS_HASH
+    for manifest in load_manifests(archive_dir):
+        if manifest["first_seq"] != expected_seq + 1:
+            return expected_seq + 1
+        expected_seq, prev_hash = manifest["last_seq"], manifest["last_hash"]
+
+    rows = db.execute(
+        select(models.AuditLog)
+        .where(models.AuditLog.seq != None)
+        .order_by(models.AuditLog.seq)
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+    for row in rows:
+        expected_seq += 1
+        entry = {
+            "action": row.action,
+            "user_id": row.user_id,
+            "clinic_id": row.clinic_id,
+            "details": row.details,
+            "ip_address": row.ip_address,
+            "created_at": row.created_at,
+        }
+        if row.seq != expected_seq or chain_hash(prev_hash, row.seq, entry) != row.record_hash:
+            return expected_seq
+        prev_hash = row.record_hash
+    return None
+
+# --- PARTICIONES MENSUALES Y RETENCIÓN ---
+
+PARTITION_NAME = re.compile(r"^audit_logs_p(\d{4})_(\d{2})$")
+_partitions_checked = None  # Mes para el que ya se aseguraron particiones
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def ensure_partitions(db: Session, months_ahead: int = AUDIT_PARTITIONS_AHEAD):
+    """
+    Crea (si faltan) las particiones desde el mes anterior hasta
+    `months_ahead` meses adelante. Se revisa una vez por mes y proceso.
+    """
+    global _partitions_checked
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    if _partitions_checked == current:
+        return
+    for offset in range(-1, months_ahead + 1):
+        start = _add_months(current, offset)
+        end = _add_months(start, 1)
+        # Límites en UTC explícito (no dependen del timezone de la sesión)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS audit_logs_p{start:%Y_%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        ))
+    db.commit()
+    _partitions_checked = current
+
+def list_partitions(db: Session) -> list:
+    """[(nombre, primer día del mes)] de las particiones mensuales, de la más antigua a la más nueva."""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'audit_logs'::regclass"
+    )).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+def archive_partitions(months: int = AUDIT_RETENTION_MONTHS, directory: str = AUDIT_ARCHIVE_DIR) -> list:
+    """
+    Retención: cada mes completo más antiguo que `months` se exporta a
+    `<directorio>/<partición>.csv.gz` (+ manifiesto .json con conteo, rango
+    de `seq`, último hash y sha256 del archivo) y luego se separa y elimina
+    la partición. Sin DELETE fila a fila ni VACUUM posterior.
+    """
+    os.makedirs(directory, exist_ok=True)
+    cutoff = _add_months(datetime.now(timezone.utc).date().replace(day=1), -months)
+    with database.SessionLocal() as db:
+        expired = [name for name, month in list_partitions(db) if _add_months(month, 1) <= cutoff]
+    return [archive_partition(name, directory) for name in expired]
+
+def archive_partition(name: str, directory: str) -> dict:
+    path = os.path.join(directory, f"{name}.csv.gz")
+    raw = database.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # 1. Exportación (COPY en streaming, comprimida) a un archivo temporal
+        with gzip.open(path + ".tmp", "wb") as fh:
+            cursor.copy_expert(f"COPY (SELECT * FROM {name} ORDER BY seq) TO STDOUT WITH (FORMAT csv, HEADER)", fh)
+        with open(path + ".tmp", "rb") as fh:
+            os.fsync(fh.fileno())
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        os.replace(path + ".tmp", path)
+
+        cursor.execute(f"SELECT count(*), min(seq), max(seq) FROM {name}")
+        rows, first_seq, last_seq = cursor.fetchone()
+        cursor.execute(f"SELECT record_hash FROM {name} ORDER BY seq DESC LIMIT 1")
+        last = cursor.fetchone()
+        manifest = {
+            "partition": name,
+            "rows": rows,
+            "first_seq": first_seq,
+            "last_seq": last_seq,
+            "last_hash": last[0] if last else None,
+            "sha256": digest,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(directory, f"{name}.json"), "w") as fh:
+            json.dump(manifest, fh, indent=2)
+
+        # 2. Recién con el archivo en disco: separar y eliminar (una transacción)
+        cursor.execute(f"ALTER TABLE audit_logs DETACH PARTITION {name}")
+        cursor.execute(f"DROP TABLE {name}")
+        raw.commit()
+        return manifest
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+def load_manifests(directory: str = AUDIT_ARCHIVE_DIR) -> list:
+    """Manifiestos de las particiones archivadas con registros encadenados, por `seq`."""
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for filename in os.listdir(directory):
+        name, extension = os.path.splitext(filename)
+        if extension != ".json" or not PARTITION_NAME.match(name):
+            continue
+        with open(os.path.join(directory, filename)) as fh:
+            manifest = json.load(fh)
+        # Un mes vacío (o sólo con filas anteriores a la cadena) no tiene seq
+        if manifest.get("first_seq") is not None:
+            manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m["first_seq"])
+
+class AuditWorker:
+    """Hilo que vacía la bandeja cada AUDIT_FLUSH_INTERVAL o al confirmarse un evento."""
+
+    def __init__(self, interval: float = AUDIT_FLUSH_INTERVAL):
+        self.interval = interval
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="audit-worker", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                drain()
+            except Exception:
+                # La bandeja es durable: se reintenta en la próxima vuelta
+                logger.exception("No se pudo traspasar la bandeja de auditoría")
+
+    def stop(self):
+        # Apagado ordenado: último traspaso de lo que quede en la bandeja
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+        try:
+            drain()
+        except Exception:
+            logger.exception("Quedaron eventos en la bandeja de auditoría")
+
+audit_worker = AuditWorker()
+
+@event.listens_for(Session, "after_commit")
+def _wake_audit_worker(session):
+    if session.info.pop("audit_pending", False):
+        audit_worker.wake.set()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_audit_pending(session, previous_transaction):
+    if previous_transaction.nested:
+        return
+    session.info.pop("audit_pending", None)
+
+if __name__ == "__main__":
+    # Uso: python audit.py flush | verify | partitions | archive [--months N] [--dir RUTA]
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Mantenimiento de la auditoría (Ley 20.584)")
+    parser.add_argument("command", choices=["flush", "verify", "partitions", "archive"])
+    parser.add_argument("--months", type=int, default=AUDIT_RETENTION_MONTHS, help="Meses a conservar en línea")
+    parser.add_argument("--dir", default=AUDIT_ARCHIVE_DIR, help="Directorio de los archivos exportados")
+    args = parser.parse_args()
+
+    if args.command == "flush":
+        print(f"Eventos traspasados: {drain()}")
+    elif args.command == "partitions":
+        with database.SessionLocal() as db:
+            ensure_partitions(db)
+            for name, month in list_partitions(db):
+                print(f"{name}\t{month:%Y-%m}")
+    elif args.command == "archive":
+        for manifest in archive_partitions(args.months, args.dir):
+            print(f"{manifest['partition']}: {manifest['rows']} filas -> {args.dir}")
+    else:
+        with database.SessionLocal() as db:
+            broken = verify_chain(db, archive_dir=args.dir)
+        print("Cadena de auditoría íntegra" if broken is None else f"Cadena alterada desde seq={broken}")
+        sys.exit(0 if broken is None else 1)
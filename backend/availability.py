@@ -0,0 +1,166 @@
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from zoneinfo import ZoneInfo
+import json
+import os
+import uuid
+import models, replicas, dates
+from cache import app_cache
+
+# --- DISPONIBILIDAD DE DOCTORES (BLOQUES LIBRES) ---
+# Los horarios de atención se expresan en hora local de la clínica; las citas
+# se guardan en UTC (timestamptz). Para cada (doctor, día) se calculan los
+# intervalos libres = horario de atención - citas activas, con un barrido
+# lineal sobre ambas listas ordenadas. Esos intervalos se cachean y se
+# invalidan al reservar/cancelar; el corte en bloques de N minutos se hace
+# por request (es barato y depende del parámetro).
+
+CLINIC_TIMEZONE = ZoneInfo(os.getenv("CLINIC_TIMEZONE", "America/Santiago"))
+AVAILABILITY_CACHE_TTL = int(os.getenv("AVAILABILITY_CACHE_TTL", 300))
+
+# Horario por defecto si la clínica no registró el suyo: lunes a viernes
+_default_start, _default_end = os.getenv("DEFAULT_WORKDAY", "09:00-18:00").split("-")
+DEFAULT_WORKING_HOURS = {
+    weekday: [(time.fromisoformat(_default_start), time.fromisoformat(_default_end))]
+    for weekday in range(5)
+}
+
+def resolve_working_hours(rows, doctor_id) -> dict:
+    """
+    Horario semanal {weekday: [(inicio, fin)]} de un doctor: sus filas propias
+    si las tiene; si no, las de la clínica; si no, el horario por defecto.
+    """
+    own = [r for r in rows if r.doctor_id == doctor_id]
+    chosen = own or [r for r in rows if r.doctor_id is None]
+    if not chosen:
+        return DEFAULT_WORKING_HOURS
+    hours = {}
+    for r in sorted(chosen, key=lambda r: r.start_time):
+        hours.setdefault(r.weekday, []).append((r.start_time, r.end_time))
+    return hours
+
+def working_windows(day: date, hours: dict) -> list:
+    # Hora local -> UTC (zoneinfo resuelve el cambio de horario de verano)
+    return [
+        (
+            datetime.combine(day, start, tzinfo=CLINIC_TIMEZONE).astimezone(timezone.utc),
+            datetime.combine(day, end, tzinfo=CLINIC_TIMEZONE).astimezone(timezone.utc)
+        )
+        for start, end in hours.get(day.weekday(), [])
+    ]
+
+def subtract_busy(windows: list, busy: list) -> list:
+    """
+    Barrido de intervalos: `windows` y `busy` ordenados por inicio.
+    Retorna los sub-intervalos de `windows` que no tocan ningún `busy`.
+    """
+    free = []
+    i = 0
+    for win_start, win_end in windows:
+        cursor = win_start
+        # Saltamos las citas que terminan antes de esta ventana
+        while i < len(busy) and busy[i][1] <= win_start:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < win_end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            j += 1
+        if cursor < win_end:
+            free.append((cursor, win_end))
+    return free
+
+def split_slots(free: list, slot: timedelta, not_before: datetime) -> list:
+    slots = []
+    for start, end in free:
+        while start + slot <= end:
+            if start >= not_before:
+                slots.append((start, start + slot))
+            start += slot
+    return slots
+
+# --- CACHÉ POR (DOCTOR, DÍA) ---
+# Cada clínica tiene una "generación" que forma parte de la clave: cambiar
+# su horario de atención la renueva e invalida de una vez todos sus días.
+
+def clinic_generation(clinic_id) -> str:
+    key = f"availability:gen:{clinic_id}"
+    generation = app_cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex[:8]
+        app_cache.set(key, generation, AVAILABILITY_CACHE_TTL * 12)
+    return generation
+
+def _day_key(generation: str, doctor_id, day: date) -> str:
+    return f"availability:{generation}:{doctor_id}:{day.isoformat()}"
+
+def get_cached_free(generation: str, doctor_id, day: date):
+    cached = app_cache.get(_day_key(generation, doctor_id, day))
+    if cached is None:
+        return None
+    return [(datetime.fromisoformat(s), datetime.fromisoformat(e)) for s, e in json.loads(cached)]
+
+def cache_free(generation: str, doctor_id, day: date, free: list):
+    key = _day_key(generation, doctor_id, day)
+    # Recién invalidado: pudo leerse de una réplica atrasada (ver replicas.py)
+    if replicas.fenced(key):
+        return
+    payload = json.dumps([(s.isoformat(), e.isoformat()) for s, e in free])
+    app_cache.set(key, payload, AVAILABILITY_CACHE_TTL)
+
+def local_days(start: datetime, end: datetime) -> list:
+    first = dates.as_utc(start).astimezone(CLINIC_TIMEZONE).date()
+    last = (dates.as_utc(end) - timedelta(microseconds=1)).astimezone(CLINIC_TIMEZONE).date()
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+# --- INVALIDACIÓN AUTOMÁTICA ---
+# Igual que el sitio público: se anota en el flush y se aplica tras el COMMIT.
+
+def _previous(state, attr: str, current):
+    deleted = state.attrs[attr].history.deleted
+    return deleted[0] if deleted else current
+
+@event.listens_for(Session, "after_flush")
+def _collect_availability_changes(session, flush_context):
+    days = session.info.setdefault("availability_invalidations", set())
+    clinics = session.info.setdefault("availability_clinic_invalidations", set())
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(obj, models.Appointment):
+            state = inspect(obj)
+            versions = {
+                (obj.clinic_id, obj.doctor_id, obj.start_time, obj.end_time),
+                (
+                    _previous(state, "clinic_id", obj.clinic_id),
+                    _previous(state, "doctor_id", obj.doctor_id),
+                    _previous(state, "start_time", obj.start_time),
+                    _previous(state, "end_time", obj.end_time),
+                ),
+            }
+            for clinic_id, doctor_id, start, end in versions:
+                if clinic_id and doctor_id and start and end:
+                    days.update((clinic_id, doctor_id, day) for day in local_days(start, end))
+        elif isinstance(obj, models.WorkingHours):
+            clinics.add(obj.clinic_id)
+
+@event.listens_for(Session, "after_commit")
+def _flush_availability_invalidations(session):
+    keys = [f"availability:gen:{clinic_id}" for clinic_id in session.info.pop("availability_clinic_invalidations", set())]
+    keys += [
+        _day_key(clinic_generation(clinic_id), doctor_id, day)
+        for clinic_id, doctor_id, day in session.info.pop("availability_invalidations", set())
+    ]
+    if keys:
+        # Antes de borrar: que nadie recachee lo leído de una réplica atrasada
+        replicas.fence(*keys)
+        app_cache.delete(*keys)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_availability_invalidations(session, previous_transaction):
+    # Un SAVEPOINT revertido no descarta lo pendiente de la transacción externa
+    if previous_transaction.nested:
+        return
+    session.info.pop("availability_invalidations", None)
+    session.info.pop("availability_clinic_invalidations", None)
@@ -0,0 +1,80 @@
+"""
+PRUEBA DE ESTRÉS: Reservas concurrentes sobre el mismo bloque
+
+Dispara N reservas en paralelo para el MISMO doctor y el MISMO horario y
+verifica que exactamente una obtenga 201 (el resto 409). Con --distinct-slots
+cada reserva usa un bloque distinto, para medir throughput sin conflictos.
+Para comparar contra la implementación anterior (SELECT ... FOR UPDATE),
+ejecutar el mismo comando sobre ese commit.
+
+Uso (con la API levantada y un usuario de la clínica del doctor):
+    python benchmarks/booking_contention.py --url http://localhost:8000 \\
+        --email admin@dental.cl --password <clave> --doctor-id <uuid> --requests 300
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http_client import percentile, request
+
+
+def run(args) -> dict:
+    _, status, payload = request(args.url + "/auth/login", {"username": args.email, "password": args.password}, form=True)
+    if status != 200:
+        sys.exit(f"Login fallido ({status})")
+    headers = {"Authorization": f"Bearer {json.loads(payload)['access_token']}"}
+
+    # Bloque lejano en el futuro para no chocar con datos reales
+    base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=3650 + args.day_offset)
+
+    def book(i):
+        start = base + timedelta(minutes=30 * i if args.distinct_slots else 0)
+        payload = {
+            "doctor_id": args.doctor_id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=30)).isoformat(),
+            "patient_name": f"Estrés {i}",
+            "patient_rut": "11.111.111-1",
+        }
+        elapsed, code, _ = request(args.url + "/appointments/", payload, headers)
+        return code, elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(book, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    codes = Counter(code for code, _ in results)
+    latencies = [lat for _, lat in results]
+    return {
+        "mode": "distinct_slots" if args.distinct_slots else "same_slot",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "status_codes": dict(codes),
+        "requests_per_sec": round(args.requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estrés de reservas concurrentes")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--doctor-id", required=True)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct-slots", action="store_true")
+    parser.add_argument("--day-offset", type=int, default=0, help="Cambiar entre corridas para usar un día limpio")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+
+    expected_ok = args.requests if args.distinct_slots else 1
+    if result["status_codes"].get(201, 0) != expected_ok:
+        sys.exit(f"FALLA: se esperaban {expected_ok} reservas exitosas")
@@ -0,0 +1,91 @@
+"""
+ARRANQUE EN FRÍO: Desde el proceso nuevo hasta el primer 200 de /healthz
+
+Lanza el servidor de producción (serve.py: gunicorn + workers uvicorn con la
+app precargada) en un puerto libre y mide cuánto tarda en responder, varias
+veces. Reporta además el costo de `import main` aislado, que es la parte que
+paga el maestro una sola vez gracias a preload_app. El esquema NO se toca
+al arrancar (eso es `python migrate.py`), así que la BD sólo se usa si algún
+worker la necesita en su lifespan.
+
+Uso (sale con código 1 si la mediana supera --max-ms; más de un worker
+requiere CACHE_REDIS_URL, ver serve.py):
+    DATABASE_URL=... CACHE_REDIS_URL=... python benchmarks/cold_start.py --runs 5 --workers 2 --max-ms 1000
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _healthy(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+def measure_import() -> float:
+    """Milisegundos de `import main` en un intérprete nuevo."""
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def measure_start(workers: int, timeout: float) -> dict:
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", WEB_CONCURRENCY=str(workers))
+    url = f"http://127.0.0.1:{port}/healthz"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                sys.exit(f"serve.py terminó con código {proc.returncode} antes de responder")
+            if _healthy(url):
+                ready_ms = (time.perf_counter() - start) * 1000
+                break
+            time.sleep(0.01)
+        else:
+            sys.exit(f"Sin respuesta de {url} en {timeout} s")
+    finally:
+        stop = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+    return {"ready_ms": round(ready_ms, 1), "shutdown_ms": round((time.perf_counter() - stop) * 1000, 1)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arranque en frío del servidor de producción")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-ms", type=float, default=1000, help="Mediana máxima hasta el primer 200")
+    args = parser.parse_args()
+
+    runs = [measure_start(args.workers, args.timeout) for _ in range(args.runs)]
+    ready = [run["ready_ms"] for run in runs]
+    report = {
+        "workers": args.workers,
+        "import_main_ms": round(measure_import(), 1),
+        "ready_ms": {"median": round(statistics.median(ready), 1), "max": max(ready), "runs": ready},
+        "shutdown_ms": [run["shutdown_ms"] for run in runs],
+        "max_ms": args.max_ms,
+    }
+    report["ok"] = report["ready_ms"]["median"] <= args.max_ms
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
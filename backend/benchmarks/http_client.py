@@ -0,0 +1,49 @@
+"""
+CLIENTE HTTP COMÚN DE LOS BENCHMARKS
+
+Una sola forma de medir una request y de calcular percentiles para
+suite.py, login_storm.py y booking_contention.py: así sus resultados se
+pueden comparar entre sí (y con --compare) sin diferencias de método.
+Sólo librería estándar (urllib), igual que los scripts.
+"""
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def request(url, data=None, headers=None, form=False) -> tuple:
+    """
+    GET (o POST si hay `data`: JSON, o formulario con form=True).
+    Retorna (segundos, código HTTP, cuerpo); código 0 si no hubo conexión.
+    """
+    headers = dict(headers or {})
+    body = None
+    if data is not None:
+        if form:
+            body = urllib.parse.urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=body, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            payload = resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        payload, code = None, e.code
+    except urllib.error.URLError:
+        payload, code = None, 0
+    return time.perf_counter() - start, code, payload
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Percentil por rango más cercano; 0.0 sin muestras."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,89 @@
+"""
+BENCHMARK: Avalancha de logins (8:00 AM)
+
+Mide logins/seg y, en paralelo, la latencia p50/p99 de otro endpoint
+mientras los logins están en curso. Sirve para comparar HASH_POOL_WORKERS=0
+(bcrypt en línea) contra el pool de procesos.
+
+La sonda por defecto es /patients/ autenticada: pasa por el threadpool y
+el pool de conexiones, que es lo que una avalancha de logins puede dejar
+sin recursos (/healthz no toca ninguno de los dos y esconde el problema).
+Con --concurrency por sobre HASH_POOL_MAX_PENDING deben aparecer 503.
+
+Uso (con la API levantada):
+    python benchmarks/login_storm.py --url http://localhost:8000 \\
+        --email admin@dental.cl --password <clave> --logins 200 --concurrency 60
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http_client import percentile, request
+
+
+def run(args) -> dict:
+    credentials = {"username": args.email, "password": args.password}
+    stop = threading.Event()
+    probe_latencies = []
+    probe_errors = []
+
+    # Token para la sonda, obtenido antes de la avalancha
+    _, code, payload = request(args.url + "/auth/login", credentials, form=True)
+    if code != 200:
+        sys.exit(f"Login fallido ({code})")
+    probe_headers = {"Authorization": "Bearer " + json.loads(payload)["access_token"]}
+
+    def probe_loop():
+        # Tráfico "normal" que no debería degradarse durante la avalancha
+        while not stop.is_set():
+            elapsed, code, _ = request(args.url + args.probe_path, headers=probe_headers)
+            probe_latencies.append(elapsed)
+            if code != 200:
+                probe_errors.append(code)
+            time.sleep(args.probe_interval)
+
+    def login_once(_):
+        elapsed, code, _ = request(args.url + "/auth/login", credentials, form=True)
+        return elapsed, code
+
+    probe = threading.Thread(target=probe_loop, daemon=True)
+    probe.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(login_once, range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    probe.join()
+
+    ok = [lat for lat, code in results if code == 200]
+    rejected = sum(1 for _, code in results if code == 503)
+    return {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "ok": len(ok),
+        "rejected_503": rejected,
+        "logins_per_sec": round(len(ok) / elapsed, 2),
+        "login_p50_ms": round(percentile(ok, 50) * 1000, 1),
+        "login_p99_ms": round(percentile(ok, 99) * 1000, 1),
+        "probe_path": args.probe_path,
+        "probe_samples": len(probe_latencies),
+        "probe_errors": len(probe_errors),
+        "probe_p50_ms": round(percentile(probe_latencies, 50) * 1000, 1),
+        "probe_p99_ms": round(percentile(probe_latencies, 99) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de avalancha de logins")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=60)
+    parser.add_argument("--probe-path", default="/patients/?limit=20")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    print(json.dumps(run(parser.parse_args()), indent=2))
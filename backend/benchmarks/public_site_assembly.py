@@ -0,0 +1,118 @@
+"""
+BENCHMARK: Armado del sitio público (joinedload vs. consulta única)
+
+Crea una clínica temporal con N funcionarios (por defecto 200, 10% DENTIST),
+mide latencia y memoria asignada (tracemalloc) de:
+  - legacy: WebsiteConfig por dominio + Clinic joinedload(users) + filtro en Python
+  - actual: public.build_public_site (un round trip, sólo columnas públicas)
+y al final elimina los datos creados.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/public_site_assembly.py --staff 200 --iterations 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import joinedload
+import database, models, schemas
+from routers import public
+
+
+def legacy_build(domain, db):
+    website_config = db.query(models.WebsiteConfig).filter(models.WebsiteConfig.domain == domain).first()
+    clinic = db.query(models.Clinic).options(
+        joinedload(models.Clinic.users)
+    ).filter(models.Clinic.id == website_config.clinic_id).first()
+    doctors_list = [user for user in clinic.users if user.role == 'DENTIST']
+    return schemas.PublicSiteData(
+        clinic_name=clinic.name,
+        address=clinic.address,
+        phone=clinic.phone,
+        config=website_config,
+        doctors=doctors_list
+    )
+
+
+def current_build(domain, db):
+    return public.build_public_site(domain, db)[0]
+
+
+def seed(db, staff: int):
+    tag = uuid.uuid4().hex[:8]
+    clinic = models.Clinic(name=f"Bench {tag}", rut=f"bench-{tag}")
+    db.add(clinic)
+    db.flush()
+    db.add(models.WebsiteConfig(domain=f"bench-{tag}.odontobuild.cl", clinic_id=clinic.id))
+    roles = ["DENTIST"] + ["RECEPTIONIST"] * 8 + ["ADMIN"]
+    db.add_all([
+        models.User(
+            email=f"staff{i}-{tag}@bench.cl",
+            hashed_password="$2b$12$" + "x" * 53,
+            full_name=f"Funcionario {i}",
+            role=roles[i % len(roles)],
+            clinic_id=clinic.id,
+        )
+        for i in range(staff)
+    ])
+    db.commit()
+    return clinic.id, f"bench-{tag}.odontobuild.cl"
+
+
+def cleanup(db, clinic_id):
+    db.query(models.WebsiteConfig).filter(models.WebsiteConfig.clinic_id == clinic_id).delete()
+    db.query(models.User).filter(models.User.clinic_id == clinic_id).delete()
+    db.query(models.Clinic).filter(models.Clinic.id == clinic_id).delete()
+    db.commit()
+
+
+def measure(fn, domain, iterations: int) -> dict:
+    latencies = []
+    allocated = []
+    for _ in range(iterations):
+        db = database.SessionLocal()
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            fn(domain, db)
+            latencies.append(time.perf_counter() - start)
+            allocated.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        finally:
+            db.close()
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3),
+        "peak_alloc_kib": round(statistics.median(allocated) / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de armado del sitio público")
+    parser.add_argument("--staff", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    db = database.SessionLocal()
+    clinic_id, domain = seed(db, args.staff)
+    try:
+        for fn in (legacy_build, current_build):  # calentamiento
+            measure(fn, domain, 5)
+        results = {
+            "staff": args.staff,
+            "iterations": args.iterations,
+            "legacy_joinedload": measure(legacy_build, domain, args.iterations),
+            "single_query": measure(current_build, domain, args.iterations),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        cleanup(db, clinic_id)
+        db.close()
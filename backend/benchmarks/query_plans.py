@@ -0,0 +1,117 @@
+"""
+REGRESIÓN DE PLANES: Consultas calientes por clínica (índices de las migraciones 0002 y 0011)
+
+Carga un dataset grande con benchmarks/synthetic_data.py en una BD Postgres
+DEDICADA (--reset borra el esquema public completo) y llama a los endpoints reales
+con TestClient. Cada SELECT que emite la API se captura y se pasa por
+EXPLAIN (FORMAT JSON): la verificación falla si la consulta deja de usar el
+índice esperado o si aparece un Seq Scan sobre la tabla.
+
+  - Listado de pacientes           -> ix_patients_clinic_active_name
+  - RUT duplicado (alta)           -> uq_patients_clinic_rut_body
+  - Búsqueda por RUT exacto        -> uq_patients_clinic_rut_body
+  - Agenda por rango de fechas     -> ix_appointments_clinic_start
+  - Choques de horario del doctor  -> ix_appointments_doctor_start_active
+
+Uso (sale con código 1 si algún plan no usa su índice):
+    DATABASE_URL=postgresql://.../odonto_plans python benchmarks/query_plans.py --reset --scale 10
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+import main, database
+import synthetic_data
+
+def login_admin(client: TestClient, manifest: dict) -> dict:
+    clinic = manifest["clinics"][0]
+    token = client.post(
+        "/auth/login", data={"username": clinic["admin_email"], "password": manifest["password"]}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def plan_checks(manifest: dict) -> list:
+    clinic = manifest["clinics"][0]
+    doctor_id, rut = clinic["doctor_ids"][0], clinic["search_ruts"][0]
+    today = datetime.now(timezone.utc).date()
+    return [
+        ("Listado de pacientes", "GET", "/patients/?limit=50", None,
+         "patients", "ix_patients_clinic_active_name"),
+        ("RUT duplicado (alta)", "POST", "/patients/", {"full_name": "Duplicado", "rut": rut},
+         "patients", "uq_patients_clinic_rut_body"),
+        ("Búsqueda por RUT exacto", "GET", f"/patients/?search={rut}", None,
+         "patients", "uq_patients_clinic_rut_body"),
+        ("Agenda por rango de fechas", "GET", f"/appointments/?date_from={today}T00:00:00&date_to={today + timedelta(days=7)}T00:00:00", None,
+         "appointments", "ix_appointments_clinic_start"),
+        ("Choques de horario del doctor", "GET", f"/appointments/availability?doctor_id={doctor_id}&date_from={today}", None,
+         "appointments", "ix_appointments_doctor_start_active"),
+    ]
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+def explain(statement: str, parameters) -> list:
+    # Conexión cruda aparte: el EXPLAIN no pasa por el hook de captura
+    conn = database.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        return list(plan_nodes(cursor.fetchone()[0][0]["Plan"]))
+    finally:
+        conn.close()
+
+def run_checks(client: TestClient, headers: dict, checks: list) -> list:
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    results = []
+    event.listen(database.engine, "before_cursor_execute", capture)
+    try:
+        for name, method, path, body, table, expected in checks:
+            captured.clear()
+            client.request(method, path, json=body, headers=headers)
+            indexes, seq_scans = set(), 0
+            for statement, parameters in list(captured):
+                if f"FROM {table}" not in statement:
+                    continue
+                for node in explain(statement, parameters):
+                    if node.get("Relation Name") == table and node["Node Type"] == "Seq Scan":
+                        seq_scans += 1
+                    if "Index Name" in node:
+                        indexes.add(node["Index Name"])
+            results.append({
+                "check": name,
+                "expected_index": expected,
+                "indexes_used": sorted(indexes),
+                "seq_scans": seq_scans,
+                "ok": expected in indexes and seq_scans == 0,
+            })
+    finally:
+        event.remove(database.engine, "before_cursor_execute", capture)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regresión de planes de las consultas por clínica")
+    parser.add_argument("--reset", action="store_true", help="Borra el esquema public y lo vuelve a crear (BD dedicada)")
+    parser.add_argument("--scale", type=float, default=10, help="Escala de benchmarks/synthetic_data.py (10 = 50 clínicas, 1M citas)")
+    args = parser.parse_args()
+
+    if database.engine.dialect.name != "postgresql":
+        sys.exit("Los planes sólo se verifican contra PostgreSQL")
+    seeding = synthetic_data.generate(args.scale, reset=args.reset)
+    manifest = seeding.pop("manifest")
+    client = TestClient(main.app, base_url="http://localhost")
+    results = run_checks(client, login_admin(client, manifest), plan_checks(manifest))
+    print(json.dumps({"seed": seeding, "checks": results}, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
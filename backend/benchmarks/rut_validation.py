@@ -0,0 +1,94 @@
+"""
+BENCHMARK: Validación de RUT (función anterior vs. ruts.py)
+
+Mide RUTs/segundo sobre una muestra con repetición (como una importación o
+un día de reservas, donde los mismos pacientes vuelven a aparecer):
+  - legacy: replace + regex + bucle de dígitos por cada valor
+  - tabla: ruts.parse_rut sin memo (Módulo 11 por tablas precalculadas)
+  - memo: ruts.parse_rut con la caché acotada (valores ya vistos)
+  - lote: ruts.parse_many (cada valor distinto una sola vez)
+No usa la base de datos.
+
+Uso:
+    python benchmarks/rut_validation.py --values 100000 --distinct 20000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ruts
+
+
+def legacy_validate(rut: str) -> str:
+    # Copia de la validación anterior de schemas.validar_rut_chileno
+    rut_limpio = rut.replace(".", "").replace("-", "").upper().strip()
+    if not re.match(r"^\d{1,8}[0-9K]$", rut_limpio):
+        raise ValueError("Formato de RUT inválido")
+    cuerpo, dv_ingresado = rut_limpio[:-1], rut_limpio[-1]
+    suma, multiplo = 0, 2
+    for c in reversed(cuerpo):
+        suma += int(c) * multiplo
+        multiplo += 1
+        if multiplo == 8:
+            multiplo = 2
+    resultado = 11 - (suma % 11)
+    dv_calculado = "0" if resultado == 11 else "K" if resultado == 10 else str(resultado)
+    if dv_ingresado != dv_calculado:
+        raise ValueError("RUT inválido (Dígito verificador incorrecto)")
+    return f"{cuerpo}-{dv_ingresado}"
+
+
+def make_values(count: int, distinct: int) -> list:
+    rng = random.Random(42)
+    pool = []
+    for _ in range(distinct):
+        body = rng.randint(1_000_000, 29_999_999)
+        dotted = f"{body:,}".replace(",", ".")
+        pool.append(f"{dotted}-{ruts.check_digit(body)}" if rng.random() < 0.5 else f"{body}-{ruts.check_digit(body)}")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def per_value(fn):
+    return lambda values: [fn(v) for v in values]
+
+
+def values_per_second(fn, values: list, repeat: int, setup=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn(values)
+        best = min(best, time.perf_counter() - start)
+    return round(len(values) / best)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de validación de RUT")
+    parser.add_argument("--values", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    values = make_values(args.values, args.distinct)
+    legacy = values_per_second(per_value(legacy_validate), values, args.repeat)
+    table = values_per_second(per_value(ruts.parse_rut.__wrapped__), values, args.repeat)
+    # Caché fría en cada repetición: sólo se aprovechan los repetidos de la muestra
+    memo = values_per_second(per_value(ruts.parse_rut), values, args.repeat, ruts.parse_rut.cache_clear)
+    batch = values_per_second(ruts.parse_many, values, args.repeat, ruts.parse_rut.cache_clear)
+    print(json.dumps({
+        "values": args.values,
+        "distinct": args.distinct,
+        "repeat": args.repeat,
+        "legacy_per_sec": legacy,
+        "table_per_sec": table,
+        "memo_per_sec": memo,
+        "batch_per_sec": batch,
+        "speedup_batch": round(batch / legacy, 1),
+    }, indent=2))
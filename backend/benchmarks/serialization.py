@@ -0,0 +1,110 @@
+"""
+BENCHMARK: Serialización de listados (Pydantic por fila vs. columnas + orjson)
+
+Mide filas/segundo al serializar N pacientes (por defecto 1.000 y 10.000):
+  - legacy: objetos ORM -> List[PatientResponse] con from_attributes (re-ejecuta
+    el validador Módulo 11 del RUT en cada fila) -> json.dumps (JSONResponse)
+  - actual: filas de columnas (como las de db.query(*columnas)) ->
+    responses.json_rows (dict por fila + orjson, sin Pydantic)
+No consulta la base de datos: aísla el costo de serialización (DATABASE_URL
+sólo es necesaria para importar los modelos).
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/serialization.py --rows 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import ConfigDict, TypeAdapter
+import models, schemas, responses
+
+
+class LegacyPatientResponse(schemas.PatientBase):
+    # Esquema de salida anterior: heredaba los validadores de entrada
+    id: uuid.UUID
+    clinic_id: uuid.UUID
+    created_at: datetime
+    is_active: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+def rut_with_dv(body: int) -> str:
+    total, factor = 0, 2
+    for digit in reversed(str(body)):
+        total += int(digit) * factor
+        factor = 2 if factor == 7 else factor + 1
+    dv = 11 - (total % 11)
+    return f"{body}-{'0' if dv == 11 else 'K' if dv == 10 else dv}"
+
+
+def make_patients(count: int) -> list:
+    clinic_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    return [
+        models.Patient(
+            id=uuid.uuid4(),
+            full_name=f"Paciente Número {i}",
+            rut=rut_with_dv(10_000_000 + i),
+            email=f"paciente{i}@correo.cl",
+            phone="+56911111111",
+            address="Av. Siempre Viva 742",
+            clinic_id=clinic_id,
+            created_at=now,
+            is_active=True,
+        )
+        for i in range(count)
+    ]
+
+
+legacy_adapter = TypeAdapter(List[LegacyPatientResponse])
+
+
+def legacy_serialize(patients: list) -> bytes:
+    content = legacy_adapter.dump_python(legacy_adapter.validate_python(patients), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def current_serialize(rows: list) -> bytes:
+    return responses.json_rows(rows, schemas.PatientResponse).body
+
+
+def rows_per_second(fn, data, repeat: int) -> float:
+    fn(data)  # calentamiento
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return round(len(data) / best)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de listados")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fields = list(schemas.PatientResponse.model_fields)
+    results = {"repeat": args.repeat, "runs": []}
+    for count in args.rows:
+        patients = make_patients(count)
+        # Lo que entrega db.query(*columnas): tuplas en el orden del esquema
+        rows = [tuple(getattr(p, f) for f in fields) for p in patients]
+        legacy = rows_per_second(legacy_serialize, patients, args.repeat)
+        current = rows_per_second(current_serialize, rows, args.repeat)
+        results["runs"].append({
+            "rows": count,
+            "legacy_rows_per_sec": legacy,
+            "columns_orjson_rows_per_sec": current,
+            "speedup": round(current / legacy, 1),
+        })
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,190 @@
+"""
+SUITE DE CARGA: Escenarios principales de la API sobre datos sintéticos
+
+Ejercita la API real (levantada con uvicorn sobre un Postgres local cargado
+con benchmarks/synthetic_data.py) y reporta por escenario: throughput,
+p50/p95/p99, errores y códigos HTTP. Los resultados se guardan en JSON con
+el commit actual para comparar entre commits (--compare).
+
+  - login:          POST /auth/login (bcrypt)
+  - agenda:         GET /appointments/ (una semana, keyset)
+  - booking:        POST /appointments/ (bloques libres lejanos en el futuro)
+  - patient_search: GET /patients/?search= (apellido o RUT)
+  - public_site:    GET /public/sites/{dominio}
+Cada clínica del manifiesto aporta su admin: la carga se reparte entre tenants.
+
+Uso:
+    DATABASE_URL=... python benchmarks/synthetic_data.py --scale 10 --reset --manifest bench_manifest.json
+    uvicorn main:app --port 8000   (con la misma DATABASE_URL)
+    python benchmarks/suite.py --manifest bench_manifest.json --requests 500 --concurrency 16 \\
+        --output bench-results.json --compare bench-baseline.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http_client import percentile, request
+
+SCENARIOS = ("login", "agenda", "booking", "patient_search", "public_site")
+
+
+class Suite:
+    """Arma las requests de cada escenario a partir del manifiesto del generador."""
+
+    def __init__(self, args, manifest: dict):
+        self.url = args.url
+        self.password = manifest["password"]
+        self.clinics = manifest["clinics"][:args.tenants]
+        self.tokens = [self._login(clinic) for clinic in self.clinics]
+        # Bloques de reserva propios de esta corrida: lejos en el futuro y
+        # desplazados un día por segundo de inicio para no chocar con corridas previas
+        run_offset = int(time.time()) % 50000
+        self.booking_base = (
+            datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+            + timedelta(days=3650 + run_offset)
+        )
+
+    def _login(self, clinic: dict) -> dict:
+        _, code, payload = request(
+            self.url + "/auth/login", {"username": clinic["admin_email"], "password": self.password}, form=True
+        )
+        if code != 200:
+            sys.exit(f"Login fallido para {clinic['admin_email']} ({code})")
+        return {"Authorization": f"Bearer {json.loads(payload)['access_token']}"}
+
+    def _tenant(self, i: int) -> tuple:
+        n = i % len(self.clinics)
+        return self.clinics[n], self.tokens[n]
+
+    def login(self, i: int) -> tuple:
+        clinic, _ = self._tenant(i)
+        return request(self.url + "/auth/login", {"username": clinic["admin_email"], "password": self.password}, form=True)
+
+    def agenda(self, i: int) -> tuple:
+        _, headers = self._tenant(i)
+        day = datetime.now(timezone.utc).date() - timedelta(days=i % 14)
+        query = urllib.parse.urlencode({"date_from": f"{day}T00:00:00", "date_to": f"{day + timedelta(days=7)}T00:00:00", "limit": 100})
+        return request(f"{self.url}/appointments/?{query}", headers=headers)
+
+    def booking(self, i: int) -> tuple:
+        clinic, headers = self._tenant(i)
+        # Un bloque distinto por request: mide el camino feliz (201), no la contención
+        start = self.booking_base + timedelta(minutes=30 * (i // len(self.clinics)))
+        payload = {
+            "doctor_id": clinic["doctor_ids"][i % len(clinic["doctor_ids"])],
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=30)).isoformat(),
+            "patient_name": f"Carga {i}",
+            "patient_rut": clinic["search_ruts"][0],
+        }
+        return request(self.url + "/appointments/", payload, headers=headers)
+
+    def patient_search(self, i: int) -> tuple:
+        clinic, headers = self._tenant(i)
+        terms = clinic["search_names"] + [rut[:4] for rut in clinic["search_ruts"]]
+        query = urllib.parse.urlencode({"search": terms[i % len(terms)], "limit": 20})
+        return request(f"{self.url}/patients/?{query}", headers=headers)
+
+    def public_site(self, i: int) -> tuple:
+        clinic, _ = self._tenant(i)
+        return request(f"{self.url}/public/sites/{clinic['domain']}")
+
+
+def run_scenario(suite: Suite, name: str, requests: int, concurrency: int) -> dict:
+    call = getattr(suite, name)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [latency for latency, code, _ in results if 200 <= code < 300]
+    codes = Counter(str(code) for _, code, _ in results)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "errors": requests - len(ok),
+        "status_codes": dict(sorted(codes.items())),
+        "throughput_rps": round(len(ok) / elapsed, 1),
+        "p50_ms": round(percentile(ok, 50) * 1000, 1),
+        "p95_ms": round(percentile(ok, 95) * 1000, 1),
+        "p99_ms": round(percentile(ok, 99) * 1000, 1),
+        "max_ms": round(max(ok, default=0) * 1000, 1),
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> dict:
+    """Variación % contra otra corrida; marca regresión si p95 o throughput empeoran más del umbral."""
+    report = {}
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before["p95_ms"] or not before["throughput_rps"]:
+            continue
+        p95_change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        rps_change = (now["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+        report[name] = {
+            "baseline_commit": baseline.get("meta", {}).get("commit"),
+            "p95_change_pct": round(p95_change, 1),
+            "throughput_change_pct": round(rps_change, 1),
+            "regression": p95_change > max_regression or rps_change < -max_regression,
+        }
+    return report
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite de carga sobre datos sintéticos")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="bench_manifest.json", help="Generado por benchmarks/synthetic_data.py")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Requests por escenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="bcrypt es caro a propósito")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tenants", type=int, default=20, help="Clínicas del manifiesto que reciben carga")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="JSON de una corrida anterior (otro commit)")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="%% tolerado en p95 / throughput")
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding="utf-8") as f:
+        suite = Suite(args, json.load(f))
+
+    results = {
+        "meta": {
+            "commit": current_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "tenants": len(suite.clinics),
+            "concurrency": args.concurrency,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            sys.exit(f"Escenario desconocido: {name}")
+        requests = args.login_requests if name == "login" else args.requests
+        results["scenarios"][name] = run_scenario(suite, name, requests, args.concurrency)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            results["comparison"] = compare(results, json.load(f), args.max_regression)
+        exit_code = 1 if any(c["regression"] for c in results["comparison"].values()) else 0
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    sys.exit(exit_code)
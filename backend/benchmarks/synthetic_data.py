@@ -0,0 +1,338 @@
+"""
+GENERADOR DE DATOS SINTÉTICOS (escala de producción, carga por COPY)
+
+Crea clínicas completas y deterministas (misma --seed => mismos datos):
+sitio público, staff (admin, recepción, doctores), horario de atención,
+pacientes con RUT válido y agendas por doctor que respetan ese horario
+(bloques de 30/45/60 min, huecos libres, ~70% en el pasado, cancelaciones).
+
+Escala: --scale 1 = 5 clínicas, 10.000 pacientes y 100.000 citas.
+        --scale 100 = 500 clínicas, 1.000.000 de pacientes y 10.000.000 de citas.
+
+Cada tabla se carga con un solo COPY (streaming, sin archivos intermedios).
+Con --defer-indexes (por defecto) los índices secundarios y la restricción
+de no-solapamiento de patients/appointments se eliminan antes y se vuelven a
+crear al final, y el trigger NOTIFY de la agenda se desactiva durante la
+carga. Requiere PostgreSQL y una BD DEDICADA (con --reset se borra el
+esquema public completo). Escribe un manifiesto JSON con credenciales y
+términos de búsqueda que usa benchmarks/suite.py.
+
+Uso:
+    DATABASE_URL=postgresql://.../odonto_bench python benchmarks/synthetic_data.py --scale 100 --reset --manifest bench_manifest.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, DropConstraint
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+import models, database, hashing, migrate, ruts
+from availability import CLINIC_TIMEZONE
+
+CLINICS_PER_SCALE = 5
+DOCTORS_PER_CLINIC = 4
+PATIENTS_PER_CLINIC = 2000
+APPOINTMENTS_PER_CLINIC = 20000
+
+FIRST_NAMES = [
+    "María", "José", "Juan", "Ana", "Francisca", "Carlos", "Camila", "Luis", "Valentina", "Jorge",
+    "Catalina", "Pedro", "Javiera", "Diego", "Fernanda", "Matías", "Constanza", "Sebastián",
+    "Daniela", "Felipe", "Isidora", "Tomás", "Antonia", "Benjamín", "Sofía", "Vicente",
+]
+SURNAMES = [
+    "González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez",
+    "Sepúlveda", "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya",
+    "Flores", "Espinoza", "Valenzuela", "Castillo", "Tapia", "Reyes", "Gutiérrez", "Castro",
+    "Pizarro", "Álvarez", "Vásquez", "Sánchez", "Fernández", "Ramírez", "Carrasco",
+]
+CITIES = ["Santiago", "Valparaíso", "Concepción", "La Serena", "Temuco", "Puerto Montt", "Antofagasta", "Talca"]
+STREETS = ["Av. Providencia", "Los Carrera", "O Higgins", "Av. Alemania", "Prat", "Colón", "Baquedano", "Freire"]
+
+# Horario de atención de cada clínica (hora local): lunes a viernes en dos
+# bloques y sábado en la mañana. Las agendas generadas lo respetan.
+WORKING_BLOCKS = {
+    **{weekday: [(dtime(9, 0), dtime(13, 0)), (dtime(14, 0), dtime(19, 0))] for weekday in range(5)},
+    5: [(dtime(9, 0), dtime(13, 0))],
+}
+DURATIONS = (30, 30, 30, 45, 60)
+OCCUPANCY = 0.8
+CANCELLED_RATE = 0.08
+PAST_FRACTION = 0.7
+
+# Tablas cuyos índices se difieren durante la carga
+BULK_TABLES = ("patients", "appointments")
+
+class _CopyStream:
+    """Iterador de líneas -> objeto tipo archivo para cursor.copy_expert."""
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        chunks, length = [self.buffer], len(self.buffer)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            chunks.append(line)
+            length += len(line)
+        data = "".join(chunks)
+        if size < 0:
+            self.buffer = ""
+            return data
+        data, self.buffer = data[:size], data[size:]
+        return data
+
+def _uuid(seed: int, kind: str, n: int) -> str:
+    # Determinista (no depende del orden de generación): permite volver a
+    # calcular un paciente desde su índice al armar las citas
+    return str(uuid.UUID(bytes=hashlib.md5(f"{seed}:{kind}:{n}".encode()).digest(), version=4))
+
+def _row(*values) -> str:
+    # Formato texto de COPY: tabulado, \N = NULL (los valores no traen tabs)
+    return "\t".join("\\N" if v is None else str(v) for v in values) + "\n"
+
+class Dataset:
+    """Parámetros de la generación y funciones puras (clínica, paciente) -> datos."""
+
+    def __init__(self, scale: float, seed: int, password: str):
+        self.seed = seed
+        self.clinics = max(1, round(CLINICS_PER_SCALE * scale))
+        self.doctors = DOCTORS_PER_CLINIC
+        self.patients = PATIENTS_PER_CLINIC
+        self.appointments_per_doctor = APPOINTMENTS_PER_CLINIC // DOCTORS_PER_CLINIC
+        self.password = password
+        self.hashed_password = hashing.hash_password(password)
+        self.today = datetime.now(CLINIC_TIMEZONE).date()
+
+    def clinic_id(self, c: int) -> str:
+        return _uuid(self.seed, "clinic", c)
+
+    def domain(self, c: int) -> str:
+        return f"clinica{c + 1}.bench.odontobuild.cl"
+
+    def admin_email(self, c: int) -> str:
+        return f"admin{c + 1}@bench.odontobuild.cl"
+
+    def doctor_id(self, c: int, d: int) -> str:
+        return _uuid(self.seed, "doctor", c * self.doctors + d)
+
+    def patient(self, c: int, i: int) -> tuple:
+        """(id, nombre, rut canónico, cuerpo, dv) del paciente i de la clínica c."""
+        n = c * self.patients + i
+        h = (n * 2654435761 + self.seed) & 0xFFFFFFFF
+        name = (
+            f"{FIRST_NAMES[h % len(FIRST_NAMES)]} "
+            f"{SURNAMES[(h >> 8) % len(SURNAMES)]} {SURNAMES[(h >> 16) % len(SURNAMES)]}"
+        )
+        body = 5_000_000 + n * 17
+        dv = ruts.check_digit(body)
+        return _uuid(self.seed, "patient", n), name, ruts.format_rut(body, dv), body, dv
+
+    # --- FILAS POR TABLA ---
+
+    def clinic_rows(self):
+        for c in range(self.clinics):
+            body = 76_000_000 + c
+            yield _row(
+                self.clinic_id(c), f"Clínica Dental {CITIES[c % len(CITIES)]} {c + 1}",
+                ruts.format_rut(body, ruts.check_digit(body)),
+                f"{STREETS[c % len(STREETS)]} {100 + c}", f"+5622{c:07d}", "t", self.domain(c),
+            )
+
+    def website_rows(self):
+        for c in range(self.clinics):
+            yield _row(
+                _uuid(self.seed, "site", c), self.clinic_id(c), self.domain(c), "#1E3A8A",
+                "Bienvenido a su clínica", "Cuidamos tu sonrisa", "{}",
+            )
+
+    def user_rows(self):
+        for c in range(self.clinics):
+            clinic_id = self.clinic_id(c)
+            yield _row(_uuid(self.seed, "admin", c), self.admin_email(c), self.hashed_password, "Administración", "ADMIN", "t", clinic_id)
+            yield _row(_uuid(self.seed, "reception", c), f"recepcion{c + 1}@bench.odontobuild.cl", self.hashed_password, "Recepción", "RECEPTIONIST", "t", clinic_id)
+            for d in range(self.doctors):
+                first, surname = FIRST_NAMES[(c + d) % len(FIRST_NAMES)], SURNAMES[(c * 3 + d) % len(SURNAMES)]
+                yield _row(
+                    self.doctor_id(c, d), f"doctor{c + 1}-{d + 1}@bench.odontobuild.cl", self.hashed_password,
+                    f"Dr(a). {first} {surname}", "DENTIST", "t", clinic_id,
+                )
+
+    def working_hours_rows(self):
+        for c in range(self.clinics):
+            n = 0
+            for weekday, blocks in WORKING_BLOCKS.items():
+                for start, end in blocks:
+                    yield _row(_uuid(self.seed, f"hours{c}", n), weekday, start, end, self.clinic_id(c), None)
+                    n += 1
+
+    def patient_rows(self):
+        for c in range(self.clinics):
+            clinic_id = self.clinic_id(c)
+            for i in range(self.patients):
+                patient_id, name, rut, body, dv = self.patient(c, i)
+                n = c * self.patients + i
+                yield _row(
+                    patient_id, name, rut, body, dv,
+                    f"paciente{n}@correo.cl" if n % 5 < 3 else None,
+                    f"+569{(n * 7919) % 100_000_000:08d}",
+                    f"{STREETS[n % len(STREETS)]} {n % 3000}, {CITIES[n % len(CITIES)]}",
+                    "f" if n % 33 == 0 else "t", 0, clinic_id,
+                )
+
+    def _schedule(self, rng: random.Random):
+        """Citas (inicio, fin) en hora local de un doctor, día a día desde el pasado."""
+        quota = self.appointments_per_doctor
+        per_week = sum(
+            (datetime.combine(date.min, end) - datetime.combine(date.min, start)).seconds / 60
+            for blocks in WORKING_BLOCKS.values() for start, end in blocks
+        ) / (sum(DURATIONS) / len(DURATIONS)) * OCCUPANCY
+        day = self.today - timedelta(days=int(quota / per_week * 7 * PAST_FRACTION))
+        produced = 0
+        while produced < quota:
+            for block_start, block_end in WORKING_BLOCKS.get(day.weekday(), ()):
+                current = datetime.combine(day, block_start, tzinfo=CLINIC_TIMEZONE)
+                limit = datetime.combine(day, block_end, tzinfo=CLINIC_TIMEZONE)
+                while produced < quota:
+                    end = current + timedelta(minutes=rng.choice(DURATIONS))
+                    if end > limit:
+                        break
+                    if rng.random() < OCCUPANCY:
+                        yield current, end
+                        produced += 1
+                        current = end
+                    else:
+                        current += timedelta(minutes=30) # Hueco libre
+            day += timedelta(days=1)
+
+    def appointment_rows(self):
+        for c in range(self.clinics):
+            clinic_id = self.clinic_id(c)
+            for d in range(self.doctors):
+                rng = random.Random(self.seed * 1_000_003 + c * 101 + d)
+                doctor_id = self.doctor_id(c, d)
+                for start, end in self._schedule(rng):
+                    patient_id, name, rut, _, _ = self.patient(c, rng.randrange(self.patients))
+                    if rng.random() < CANCELLED_RATE:
+                        status = "CANCELLED"
+                    elif start.date() < self.today:
+                        status = "CONFIRMED"
+                    else:
+                        status = "PENDING" if rng.random() < 0.45 else "CONFIRMED"
+                    yield _row(
+                        str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                        start.isoformat(), end.isoformat(), status, 0,
+                        name, rut, clinic_id, doctor_id, patient_id,
+                    )
+
+    def manifest(self) -> dict:
+        clinics = []
+        for c in range(self.clinics):
+            samples = [self.patient(c, i) for i in (0, self.patients // 2, self.patients - 1)]
+            clinics.append({
+                "id": self.clinic_id(c),
+                "domain": self.domain(c),
+                "admin_email": self.admin_email(c),
+                "doctor_ids": [self.doctor_id(c, d) for d in range(self.doctors)],
+                "search_names": [name.split()[1] for _, name, _, _, _ in samples],
+                "search_ruts": [rut for _, _, rut, _, _ in samples],
+            })
+        return {"seed": self.seed, "password": self.password, "clinics": clinics}
+
+COPY_PLAN = (
+    ("clinics", "id, name, rut, address, phone, is_active, domain", Dataset.clinic_rows),
+    ("website_configs", "id, clinic_id, domain, primary_color, welcome_text, hero_text, config_json", Dataset.website_rows),
+    ("users", "id, email, hashed_password, full_name, role, is_active, clinic_id", Dataset.user_rows),
+    ("working_hours", "id, weekday, start_time, end_time, clinic_id, doctor_id", Dataset.working_hours_rows),
+    ("patients", "id, full_name, rut, rut_body, rut_dv, email, phone, address, is_active, change_seq, clinic_id", Dataset.patient_rows),
+    ("appointments", "id, start_time, end_time, status, change_seq, patient_name, patient_rut, clinic_id, doctor_id, patient_id", Dataset.appointment_rows),
+)
+
+def reset_schema():
+    with database.engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+
+def _deferred_objects():
+    for name in BULK_TABLES:
+        table = models.Base.metadata.tables[name]
+        excludes = [c for c in table.constraints if isinstance(c, ExcludeConstraint)]
+        yield table, list(table.indexes), excludes
+
+def generate(scale: float = 1, seed: int = 42, password: str = "bench-password-123",
+             reset: bool = False, defer_indexes: bool = True) -> dict:
+    """Carga el dataset y retorna {filas, segundos por tabla, manifiesto}."""
+    if database.engine.dialect.name != "postgresql":
+        raise RuntimeError("El generador usa COPY: requiere PostgreSQL")
+    if reset:
+        reset_schema()
+    migrate.migrate()
+    with database.SessionLocal() as db:
+        if db.query(models.Clinic.id).first() is not None:
+            raise RuntimeError("La BD ya tiene datos: usar una BD dedicada con reset=True")
+
+    dataset = Dataset(scale, seed, password)
+    report = {"scale": scale, "clinics": dataset.clinics, "tables": {}}
+    started = time.perf_counter()
+
+    with database.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE appointments DISABLE TRIGGER appointments_notify_change"))
+        if defer_indexes:
+            for table, indexes, excludes in _deferred_objects():
+                for constraint in excludes:
+                    conn.execute(DropConstraint(constraint))
+                for index in indexes:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    raw = database.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for table, columns, rows in COPY_PLAN:
+            table_started = time.perf_counter()
+            stream = _CopyStream(rows(dataset))
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", stream, size=1 << 20)
+            raw.commit()
+            report["tables"][table] = {"rows": cursor.rowcount, "seconds": round(time.perf_counter() - table_started, 1)}
+    finally:
+        raw.close()
+
+    index_started = time.perf_counter()
+    with database.engine.begin() as conn:
+        if defer_indexes:
+            for table, indexes, excludes in _deferred_objects():
+                for index in indexes:
+                    index.create(conn)
+                for constraint in excludes:
+                    conn.execute(AddConstraint(constraint))
+        conn.execute(text("ALTER TABLE appointments ENABLE TRIGGER appointments_notify_change"))
+    report["index_seconds"] = round(time.perf_counter() - index_started, 1)
+
+    with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+    report["total_seconds"] = round(time.perf_counter() - started, 1)
+    report["manifest"] = dataset.manifest()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos (COPY)")
+    parser.add_argument("--scale", type=float, default=1, help="1 = 5 clínicas / 10k pacientes / 100k citas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="bench-password-123", help="Clave de todos los usuarios generados")
+    parser.add_argument("--reset", action="store_true", help="Borra el esquema public antes de cargar (BD dedicada)")
+    parser.add_argument("--no-defer-indexes", dest="defer_indexes", action="store_false")
+    parser.add_argument("--manifest", default="bench_manifest.json", help="Credenciales y términos para benchmarks/suite.py")
+    args = parser.parse_args()
+
+    report = generate(args.scale, args.seed, args.password, args.reset, args.defer_indexes)
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(report.pop("manifest"), f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from typing import Optional
+import os
+import threading
+import time
+
+# --- CACHÉ DE APLICACIÓN (LOCAL O COMPARTIDA) ---
+# Backend por defecto: memoria del proceso (LRU + TTL). Si se define
+# CACHE_REDIS_URL se usa un servidor Redis (o compatible: Valkey, KeyDB)
+# compartido entre workers/réplicas, así una invalidación llega a todos.
+# Los valores son siempre strings para que ambos backends sean intercambiables.
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2048))
+
+
+class LocalCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Si Redis no responde la caché se comporta como vacía: se sirve desde la BD
+# en vez de devolver 500 en el sitio público.
+
+
+class RedisCache:
+    def __init__(self, url: str, prefix: str = "odonto:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_REDIS_URL está definido pero el paquete 'redis' no está instalado")
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            return self._client.get(self.prefix + key)
+        except self._errors:
+            return None
+
+    def set(self, key: str, value: str, ttl: int):
+        try:
+            self._client.set(self.prefix + key, value, ex=ttl)
+        except self._errors:
+            pass
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            self._client.delete(*(self.prefix + key for key in keys))
+        except self._errors:
+            pass
+
+
+def create_cache(max_entries: int = CACHE_MAX_ENTRIES):
+    """
+    Una caché con su propio límite local: una función que cachea mucho (ej.
+    identidades por token) no desplaza a las demás. Con Redis el límite es
+    el maxmemory del servidor.
+    """
+    if CACHE_REDIS_URL:
+        return RedisCache(CACHE_REDIS_URL)
+    return LocalCache(max_entries)
+
+# Instancia compartida por los módulos que cachean respuestas
+app_cache = create_cache()
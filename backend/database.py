@@ -1,48 +1,259 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-
-# CONEXIÓN SEGURA
-# Usamos variables de entorno para que las credenciales no estén "quemadas" en el código
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
-
-if not SQLALCHEMY_DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
-
-
-ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
-
-connect_args = {}
-
-if ENVIRONMENT == "production":
-    # BLINDAJE SSL: Obligatorio para datos de salud en tránsito
-    connect_args = {
-        "sslmode": "require", 
-        "connect_timeout": 10
-    }
-
-
-# EL MOTOR (ENGINE)
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args=connect_args,
-    pool_pre_ping=True 
-)
-
-
-# LA FÁBRICA DE SESIONES
-# Cada petición del usuario creará una sesión temporal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# LA CLASE BASE
-Base = declarative_base()
-
-# DEPENDENCIA (INYECCIÓN)
-# Esta función se usará en cada Endpoint para obtener la BD y cerrarla al terminar
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+import os
+import time
+from metrics import PoolMetrics, current_request
+from slow_queries import SlowQueryLog, SLOW_QUERY_EXPLAIN_TIMEOUT_MS
+
+# CONEXIÓN SEGURA
+# Usamos variables de entorno para que las credenciales no estén "quemadas" en el código
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not SQLALCHEMY_DATABASE_URL:
+    raise ValueError("DATABASE_URL environment variable is not set")
+
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+connect_args = {}
+
+if ENVIRONMENT == "production":
+    # BLINDAJE SSL: Obligatorio para datos de salud en tránsito
+    connect_args = {
+        "sslmode": "require", 
+        "connect_timeout": 10
+    }
+
+
+# --- POOL DE CONEXIONES (configurable por entorno) ---
+# Dimensionar con datos: ver la sección "pool" de /healthz.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# pre_ping agrega un "SELECT 1" en cada checkout; con pool_recycle suele bastar
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Modo PgBouncer (transaction pooling): el pooling lo hace PgBouncer, así que
+# usamos NullPool y desactivamos los prepared statements del lado servidor
+# (psycopg2 no los usa; asyncpg sí, ver motor asíncrono más abajo).
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+pool_metrics = PoolMetrics()
+
+class _CheckoutTimingMixin:
+    """Mide cuánto espera un request por una conexión libre del pool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.incr("checkout_timeouts")
+            raise
+        finally:
+            pool_metrics.checkout_wait.observe(time.perf_counter() - start)
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_options(queue_pool_class) -> dict:
+    if DB_PGBOUNCER:
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": queue_pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _instrument_pool(target_engine):
+    @event.listens_for(target_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_metrics.incr("connects")
+
+    @event.listens_for(target_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.incr("checkouts")
+        pool_metrics.incr("checked_out")
+
+    @event.listens_for(target_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_metrics.incr("checked_out", -1)
+
+    # Incluye las conexiones descartadas por un pre-ping fallido
+    @event.listens_for(target_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.incr("invalidations")
+
+# --- CONSULTAS POR REQUEST (Server-Timing y /metrics) ---
+# Suma cada sentencia al RequestStats del request en curso (ver timing.py) y
+# pasa las lentas al muestreo de slow_queries.py. El inicio se guarda en el
+# contexto de ejecución: si la sentencia falla no queda nada colgando en la
+# conexión. Sólo el motor sync captura planes: las sentencias de asyncpg
+# usan otro estilo de parámetros ($1).
+def _instrument_queries(target_engine, can_explain: bool = False):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_query(elapsed, cursor.rowcount)
+        if not executemany:
+            slow_query_log.record(statement, parameters, elapsed, can_explain)
+
+
+# EL MOTOR (ENGINE)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, 
+    connect_args=connect_args,
+    **_pool_options(InstrumentedQueuePool)
+)
+_instrument_pool(engine)
+_instrument_queries(engine, can_explain=True)
+
+# Motor aparte (sin pool ni hooks) para los EXPLAIN ANALYZE del muestreo:
+# no compite por el pool de los requests ni se mide a sí mismo
+_explain_engine = None
+
+def _explain_statement(statement: str, parameters) -> list:
+    global _explain_engine
+    if _explain_engine is None:
+        _explain_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args, poolclass=NullPool)
+    with _explain_engine.connect() as conn:
+        # SET LOCAL: el rollback al cerrar descarta el timeout (y cualquier efecto)
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+        result = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        return [row[0] for row in result]
+
+slow_query_log = SlowQueryLog(explain=_explain_statement if engine.dialect.name == "postgresql" else None)
+
+def pool_status() -> dict:
+    """Estado del pool principal + contadores acumulados."""
+    pool = engine.pool
+    status = {"class": type(pool).__name__, "pgbouncer_mode": DB_PGBOUNCER}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
+
+
+def pool_saturation() -> float:
+    """Fracción de la capacidad del pool en uso (1.0 = todo prestado)."""
+    if DB_PGBOUNCER:
+        return 0.0
+    capacity = DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+    return round(engine.pool.checkedout() / capacity, 3) if capacity else 0.0
+
+# --- SONDA DE DISPONIBILIDAD (READINESS) ---
+# Un único hilo dedicado: si una sonda anterior sigue colgada no apilamos otra,
+# y quien consulta espera como máximo `timeout` segundos.
+_probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-probe")
+
+def _run_probe(timeout: float) -> float:
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # La consulta tampoco puede quedarse colgada en el servidor
+            # (SET LOCAL: se descarta con el rollback al devolver la conexión)
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+        conn.execute(text("SELECT 1"))
+    return time.perf_counter() - start
+
+def probe_database(timeout: float) -> float:
+    """
+    Ejecuta SELECT 1 pasando por el pool (incluye la espera de checkout).
+    Retorna la latencia en segundos; lanza TimeoutError o el error de la BD.
+    """
+    return _probe_executor.submit(_run_probe, timeout).result(timeout=timeout)
+
+def create_read_engine(url: str):
+    """Motor de una réplica de lectura (ver replicas.py): mismo pool y métricas por request."""
+    read_engine = create_engine(url, connect_args=connect_args, **_pool_options(QueuePool))
+    _instrument_queries(read_engine)
+    return read_engine
+
+# LA FÁBRICA DE SESIONES
+# Cada petición del usuario creará una sesión temporal
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# LA CLASE BASE
+Base = declarative_base()
+
+# DEPENDENCIA (INYECCIÓN)
+# Esta función se usará en cada Endpoint para obtener la BD y cerrarla al terminar
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- MOTOR ASÍNCRONO (OPCIONAL) ---
+# Con DATABASE_ASYNC=true las rutas principales se sirven con `async def`
+# sobre asyncpg: un request esperando a la BD ya no ocupa un hilo del
+# threadpool de FastAPI (40 por defecto), sólo una corrutina.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Por defecto derivamos la URL asyncpg desde DATABASE_URL (mismo servidor)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or str(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername="postgresql+asyncpg")
+)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_connect_args = {}
+    if ENVIRONMENT == "production":
+        # asyncpg usa 'ssl' y 'timeout' en vez de 'sslmode' y 'connect_timeout'
+        async_connect_args = {
+            "ssl": "require",
+            "timeout": 10
+        }
+    async_url = make_url(ASYNC_DATABASE_URL)
+    if DB_PGBOUNCER:
+        # PgBouncer en modo transacción no soporta prepared statements:
+        # se apaga la caché de asyncpg y la del dialecto de SQLAlchemy
+        async_connect_args["statement_cache_size"] = 0
+        async_url = async_url.update_query_dict({"prepared_statement_cache_size": "0"})
+
+    async_engine = create_async_engine(
+        async_url,
+        connect_args=async_connect_args,
+        **_pool_options(InstrumentedAsyncQueuePool)
+    )
+    _instrument_pool(async_engine.sync_engine)
+    _instrument_queries(async_engine.sync_engine)
+
+    # expire_on_commit=False: los objetos se serializan fuera de la sesión
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# DEPENDENCIA ASÍNCRONA (equivalente a get_db)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
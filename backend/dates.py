@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+# --- FECHAS EN UTC ---
+# La BD guarda timestamptz, pero en SQLite y en parámetros sin zona llegan
+# datetimes "naive": se interpretan como UTC (igual que populate_demo.py).
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
@@ -0,0 +1,214 @@
+from collections import defaultdict
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+import models, database
+
+# --- AGENDA EN VIVO (BUS DE EVENTOS POR CLÍNICA) ---
+# Las pantallas de recepción ya no consultan /appointments/ en bucle: se
+# suscriben a /appointments/stream (SSE) y reciben los cambios. Cada
+# instancia tiene UN solo origen de eventos que reparte a todos sus clientes:
+# - "postgres": LISTEN sobre el canal que alimenta el trigger de appointments
+#   (ve los cambios de todas las instancias y de cualquier proceso).
+# - "local": hooks de la Session de este proceso (desarrollo / una instancia).
+
+logger = logging.getLogger("odonto.events")
+
+AGENDA_CHANNEL = "agenda_changes"
+AGENDA_EVENTS_SOURCE = os.getenv(
+    "AGENDA_EVENTS_SOURCE",
+    "postgres" if database.engine.dialect.name == "postgresql" else "local"
+)
+# LISTEN no funciona a través de PgBouncer en modo transacción: usar la URL directa
+AGENDA_LISTEN_URL = os.getenv("AGENDA_LISTEN_URL", database.SQLALCHEMY_DATABASE_URL)
+AGENDA_STREAM_QUEUE = int(os.getenv("AGENDA_STREAM_QUEUE", 256))
+
+# Se emite cuando un cliente pudo perder eventos (cola llena o listener
+# reconectado): el cliente debe volver a pedir el snapshot
+RESYNC = {"type": "resync"}
+
+class Subscription(asyncio.Queue):
+    """Cola de un cliente conectado; recuerda su event loop para publicar desde otros hilos."""
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+
+class AgendaBus:
+    """
+    Reparte eventos a las colas asyncio de los suscriptores de cada clínica.
+    `publish` es seguro desde cualquier hilo (listener, threadpool de FastAPI).
+    """
+    def __init__(self, max_queue: int = AGENDA_STREAM_QUEUE):
+        self.max_queue = max_queue
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, clinic_id) -> Subscription:
+        queue = Subscription(self.max_queue)
+        with self.lock:
+            self.subscribers[str(clinic_id)].add(queue)
+        return queue
+
+    def unsubscribe(self, clinic_id, queue: Subscription):
+        with self.lock:
+            clinic_queues = self.subscribers.get(str(clinic_id))
+            if clinic_queues is not None:
+                clinic_queues.discard(queue)
+                if not clinic_queues:
+                    del self.subscribers[str(clinic_id)]
+
+    def publish(self, clinic_id, payload: dict):
+        with self.lock:
+            queues = list(self.subscribers.get(str(clinic_id), ()))
+        for queue in queues:
+            queue.loop.call_soon_threadsafe(_offer, queue, payload)
+
+    def broadcast(self, payload: dict):
+        with self.lock:
+            clinic_ids = list(self.subscribers)
+        for clinic_id in clinic_ids:
+            self.publish(clinic_id, payload)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"clinics": len(self.subscribers), "subscribers": sum(len(q) for q in self.subscribers.values())}
+
+def _offer(queue: Subscription, payload: dict):
+    # Cliente lento: en vez de acumular memoria se vacía su cola y se le
+    # pide resincronizar con un snapshot nuevo
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+agenda_bus = AgendaBus()
+
+def to_event(op: str, row: dict) -> dict:
+    """INSERT/UPDATE/DELETE de una cita -> evento para el cliente."""
+    if op == "INSERT":
+        kind = "created"
+    elif op == "DELETE":
+        kind = "deleted"
+    elif row.get("status") == "CANCELLED":
+        kind = "cancelled"
+    else:
+        kind = "updated"
+    return {"type": kind, "appointment": row}
+
+# --- ORIGEN "postgres": LISTEN/NOTIFY ---
+
+class AgendaListener:
+    """Hilo con una conexión dedicada (fuera del pool) en LISTEN."""
+
+    def __init__(self, url: str = AGENDA_LISTEN_URL):
+        self.engine = create_engine(url, poolclass=NullPool, connect_args=database.connect_args)
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="agenda-listener", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+
+    def _run(self):
+        backoff = 1
+        first = True
+        while not self.stopping.is_set():
+            try:
+                conn = self.engine.raw_connection()
+            except Exception:
+                logger.exception("Listener de agenda sin conexión, reintentando en %ss", backoff)
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            try:
+                driver_conn = conn.driver_connection
+                driver_conn.autocommit = True
+                driver_conn.cursor().execute(f"LISTEN {AGENDA_CHANNEL}")
+                backoff = 1
+                if not first:
+                    # Pudimos perder NOTIFY mientras estábamos desconectados
+                    agenda_bus.broadcast(RESYNC)
+                first = False
+                while not self.stopping.is_set():
+                    if select.select([driver_conn], [], [], 5) == ([], [], []):
+                        continue
+                    driver_conn.poll()
+                    while driver_conn.notifies:
+                        self._dispatch(driver_conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Listener de agenda desconectado")
+                time.sleep(backoff)
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _dispatch(raw_payload: str):
+        try:
+            payload = json.loads(raw_payload)
+        except ValueError:
+            return
+        row = payload["row"]
+        agenda_bus.publish(row["clinic_id"], to_event(payload["op"], row))
+
+agenda_listener = AgendaListener() if AGENDA_EVENTS_SOURCE == "postgres" else None
+
+def start():
+    if agenda_listener is not None:
+        agenda_listener.start()
+
+def stop():
+    if agenda_listener is not None:
+        agenda_listener.stop()
+
+# --- ORIGEN "local": HOOKS DE LA SESSION ---
+# Igual que las invalidaciones de caché: se anota en el flush (los objetos
+# aún tienen sus valores) y se publica sólo tras el COMMIT.
+
+def _appointment_row(obj) -> dict:
+    return {
+        "id": str(obj.id),
+        "clinic_id": str(obj.clinic_id),
+        "doctor_id": str(obj.doctor_id),
+        "start_time": obj.start_time.isoformat() if obj.start_time else None,
+        "end_time": obj.end_time.isoformat() if obj.end_time else None,
+        "status": obj.status,
+        "patient_name": obj.patient_name,
+    }
+
+@event.listens_for(Session, "after_flush")
+def _collect_agenda_events(session, flush_context):
+    if AGENDA_EVENTS_SOURCE != "local":
+        return
+    pending = session.info.setdefault("agenda_events", [])
+    for op, objects in (("INSERT", session.new), ("UPDATE", session.dirty), ("DELETE", session.deleted)):
+        for obj in objects:
+            if isinstance(obj, models.Appointment) and (op != "UPDATE" or session.is_modified(obj)):
+                pending.append((op, _appointment_row(obj)))
+
+@event.listens_for(Session, "after_commit")
+def _publish_agenda_events(session):
+    for op, row in session.info.pop("agenda_events", []):
+        agenda_bus.publish(row["clinic_id"], to_event(op, row))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_agenda_events(session, previous_transaction):
+    if previous_transaction.nested:
+        return
+    session.info.pop("agenda_events", None)
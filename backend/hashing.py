@@ -0,0 +1,21 @@
+from passlib.context import CryptContext
+import os
+
+# --- HASHING DE CONTRASEÑAS (BCRYPT) ---
+# Módulo mínimo y sin dependencias de la BD: se importa dentro de los
+# procesos del pool de hashing, por eso NO debe importar models/database.
+
+# Costo de bcrypt. Si se sube, los hashes antiguos se re-generan al hacer login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    """
+    Retorna (válido, nuevo_hash). `nuevo_hash` es None salvo que el hash
+    almacenado use parámetros de costo obsoletos (passlib `needs_update`).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
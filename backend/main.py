@@ -1,75 +1,183 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-import models, database
-from routers import auth, patients, appointments, public
-
-# --- CICLO DE VIDA (MIGRACIONES MVP) ---
-# NOTA TÉCNICA: En un entorno productivo (Ley 21.663), esto se reemplaza 
-# por Alembic para mantener la integridad histórica del esquema de datos.
-models.Base.metadata.create_all(bind=database.engine)
-
-app = FastAPI(
-    title="OdontoBuild SaaS API", 
-    version="1.0.0",
-    description="Sistema Operativo Dental. Cumplimiento Normativo: Ley 19.628, Ley 20.584 y OWASP."
-)
-
-# --- SEGURIDAD NIVEL 1: PROTECCIÓN DE HOST (OWASP) ---
-# Mitiga ataques de 'Host Header Injection'.
-# En producción, 'allowed_hosts' se restringe al dominio real (ej: api.odontobuild.cl)
-# para cumplir con los estándares de la Ley Marco de Ciberseguridad (21.663).
-app.add_middleware(
-    TrustedHostMiddleware, 
-    allowed_hosts=[
-        "localhost", 
-        "127.0.0.1", 
-        "0.0.0.0",
-        # "*",  # <--- COMENTADO PARA LA DEMO (Riesgo OWASP) - Solo habilitar si falla la red local
-        "odonto_backend" # Host interno de Docker
-    ] 
-)
-
-# --- SEGURIDAD NIVEL 2: CORS (Interoperabilidad Frontend) ---
-# Define quién puede hablar con la API.
-# OWASP API8:2023 Security Misconfiguration: Nunca usar "*" con allow_credentials=True en Prod.
-origins = [
-    "http://localhost:3000", # Frontend Local
-    "http://localhost:8080", # Docker Network
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins, # Restricción explícita (Cumplimiento Ley 19.628)
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# --- ENSAMBLAJE DE ROUTERS (Modularidad) ---
-app.include_router(auth.router)
-app.include_router(patients.router)
-app.include_router(appointments.router)
-app.include_router(public.router)
-
-# --- ENDPOINTS DE INFRAESTRUCTURA ---
-
-@app.get("/", tags=["Infraestructura"])
-def read_root():
-    """
-    Endpoint raíz para verificación de estado y cumplimiento.
-    """
-    return {
-        "system": "OdontoBuild SaaS", 
-        "version": "1.0.0", 
-        "status": "operational",
-        "legal_compliance": ["Ley 20.584", "Ley 19.628", "OWASP Top 10"]
-    }
-
-@app.get("/healthz", tags=["Infraestructura"])
-def health_check():
-    """
-    Heartbeat para orquestadores (AWS ECS / Docker Swarm).
-    Garantiza disponibilidad (SLA) según Ley 21.663.
-    """
-    return {"status": "ok", "database": "connected"}
\ No newline at end of file
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+import database, security, audit, events, timing, replicas
+import os
+from routers import auth, patients, appointments, public, audit_logs, delta_sync, diagnostics
+
+# --- ESQUEMA DE DATOS ---
+# Lo administra Alembic (Ley 21.663: integridad histórica del esquema):
+# `python migrate.py` corre antes de levantar la API, no en cada import.
+
+# --- CICLO DE VIDA (RECURSOS DEL PROCESO) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Traspaso en segundo plano de la bandeja de auditoría (ver audit.py)
+    if audit.AUDIT_WORKER:
+        audit.audit_worker.start()
+    # Un solo LISTEN por instancia para la agenda en vivo (ver events.py)
+    events.start()
+    # Salud y atraso de las réplicas de lectura, si hay (ver replicas.py)
+    replicas.replica_set.start()
+    yield
+    replicas.replica_set.stop()
+    events.stop()
+    if audit.AUDIT_WORKER:
+        audit.audit_worker.stop()
+    # Apagado ordenado: liberamos los procesos de hashing (bcrypt)
+    security.shutdown_hash_pool()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+app = FastAPI(
+    title="OdontoBuild SaaS API", 
+    version="1.0.0",
+    description="Sistema Operativo Dental. Cumplimiento Normativo: Ley 19.628, Ley 20.584 y OWASP.",
+    lifespan=lifespan,
+    # orjson para toda respuesta que FastAPI serializa (más rápido que json)
+    default_response_class=ORJSONResponse
+)
+
+# --- SEGURIDAD NIVEL 1: PROTECCIÓN DE HOST (OWASP) ---
+# Mitiga ataques de 'Host Header Injection'.
+# En producción, 'allowed_hosts' se restringe al dominio real (ej: api.odontobuild.cl)
+# para cumplir con los estándares de la Ley Marco de Ciberseguridad (21.663).
+app.add_middleware(
+    TrustedHostMiddleware, 
+    allowed_hosts=[
+        "localhost", 
+        "127.0.0.1", 
+        "0.0.0.0",
+        # "*",  # <--- COMENTADO PARA LA DEMO (Riesgo OWASP) - Solo habilitar si falla la red local
+        "odonto_backend" # Host interno de Docker
+    ] 
+)
+
+# --- SEGURIDAD NIVEL 2: CORS (Interoperabilidad Frontend) ---
+# Define quién puede hablar con la API.
+# OWASP API8:2023 Security Misconfiguration: Nunca usar "*" con allow_credentials=True en Prod.
+origins = [
+    "http://localhost:3000", # Frontend Local
+    "http://localhost:8080", # Docker Network
+]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins, # Restricción explícita (Cumplimiento Ley 19.628)
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"], # Paginación keyset y tiempos por request visibles para el navegador
+)
+
+# --- RÉPLICAS DE LECTURA: READ-YOUR-WRITES ---
+# Tras una escritura exitosa el usuario lee del primario unos segundos.
+# Se agrega antes que ClientIPMiddleware para quedar por dentro: usa la IP
+# resuelta en las rutas anónimas.
+if replicas.replica_set.enabled:
+    app.add_middleware(replicas.ReadYourWritesMiddleware)
+
+# --- TRAZABILIDAD: IP REAL DEL CLIENTE (Ley 20.584) ---
+# Se registra en cada evento de auditoría. Detrás de un balanceador,
+# TRUSTED_PROXY_COUNT indica cuántos saltos de X-Forwarded-For son confiables.
+app.add_middleware(audit.ClientIPMiddleware)
+
+# --- OBSERVABILIDAD: TIEMPOS POR REQUEST ---
+# Server-Timing (app, db, auth, serialize), log JSON por request y
+# histogramas por ruta para GET /metrics (ver timing.py).
+app.add_middleware(timing.TimingMiddleware)
+
+# --- ENSAMBLAJE DE ROUTERS (Modularidad) ---
+# Con DATABASE_ASYNC=true las variantes async se registran primero y
+# atienden los paths que comparten; el resto sigue servido por los routers sync.
+if database.DATABASE_ASYNC:
+    from routers import async_api
+    for async_router in async_api.routers:
+        app.include_router(async_router)
+
+app.include_router(auth.router)
+app.include_router(patients.router)
+app.include_router(appointments.router)
+app.include_router(public.router)
+app.include_router(audit_logs.router)
+app.include_router(delta_sync.router)
+app.include_router(diagnostics.router)
+
+# --- ENDPOINTS DE INFRAESTRUCTURA ---
+
+@app.get("/", tags=["Infraestructura"])
+def read_root():
+    """
+    Endpoint raíz para verificación de estado y cumplimiento.
+    """
+    return {
+        "system": "OdontoBuild SaaS", 
+        "version": "1.0.0", 
+        "status": "operational",
+        "legal_compliance": ["Ley 20.584", "Ley 19.628", "OWASP Top 10"]
+    }
+
+@app.get("/metrics", tags=["Infraestructura"], include_in_schema=False)
+def prometheus_metrics():
+    """
+    Métricas en formato Prometheus: requests, duración, tiempo en BD,
+    consultas y filas por ruta, el pool de conexiones y la caché de
+    identidades (aciertos/fallos). Son de ESTE proceso: con varios workers,
+    scrapear cada uno. No incluye datos de pacientes; igual conviene
+    exponerlo sólo en la red interna.
+    """
+    return PlainTextResponse(timing.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+# Umbrales de readiness: sobre ellos la instancia pide no recibir tráfico
+READINESS_PROBE_TIMEOUT = float(os.getenv("READINESS_PROBE_TIMEOUT", 2))
+READINESS_MAX_LATENCY_MS = float(os.getenv("READINESS_MAX_LATENCY_MS", 500))
+READINESS_MAX_POOL_SATURATION = float(os.getenv("READINESS_MAX_POOL_SATURATION", 1.0))
+
+@app.get("/healthz", tags=["Infraestructura"])
+def health_check():
+    """
+    Liveness: el proceso está vivo y responde. NO toca la base de datos,
+    para que un problema de la BD no provoque reinicios en cadena.
+    Incluye el estado del pool y de las réplicas (en memoria, sin costo).
+    """
+    body = {"status": "ok", "pool": database.pool_status()}
+    if replicas.replica_set.enabled:
+        body["replicas"] = replicas.replica_set.status()
+    return body
+
+@app.get("/readyz", tags=["Infraestructura"])
+def readiness_check():
+    """
+    Readiness para el balanceador (AWS ECS / Docker Swarm).
+    Ejecuta una sonda acotada en tiempo contra la BD a través del pool y
+    responde 503 si falla, si supera el umbral de latencia o si el pool está
+    saturado, para que el tráfico se desvíe a otra réplica (Ley 21.663).
+    """
+    saturation = database.pool_saturation()
+    body = {
+        "status": "ready",
+        "database": "connected",
+        "latency_ms": None,
+        "pool_saturation": saturation,
+        "thresholds": {
+            "max_latency_ms": READINESS_MAX_LATENCY_MS,
+            "max_pool_saturation": READINESS_MAX_POOL_SATURATION,
+        },
+    }
+
+    try:
+        latency_ms = round(database.probe_database(READINESS_PROBE_TIMEOUT) * 1000, 2)
+        body["latency_ms"] = latency_ms
+        if latency_ms > READINESS_MAX_LATENCY_MS:
+            body["status"] = "degraded"
+    except TimeoutError:
+        body.update({"status": "unavailable", "database": "timeout"})
+    except Exception:
+        body.update({"status": "unavailable", "database": "error"})
+
+    if body["status"] == "ready" and saturation >= READINESS_MAX_POOL_SATURATION:
+        body["status"] = "saturated"
+
+    return JSONResponse(status_code=200 if body["status"] == "ready" else 503, content=body)
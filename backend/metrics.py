@@ -0,0 +1,220 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import threading
+import time
+
+# --- MÉTRICAS EN PROCESO ---
+# Primitivas mínimas (sin dependencias externas) para instrumentar el pool
+# de conexiones y los requests. Cada worker mantiene sus propios valores.
+
+# Límites superiores de los buckets, en segundos
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Histograma acumulativo estilo Prometheus (buckets 'le')."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for upper, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[str(upper)] = running
+            cumulative["+Inf"] = self._count
+            return {"buckets": cumulative, "count": self._count, "sum": round(self._sum, 6)}
+
+
+class PoolMetrics:
+    """Contadores del pool de conexiones de SQLAlchemy."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait = Histogram()
+        self._lock = threading.Lock()
+
+    def incr(self, field: str, delta: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                "checked_out": self.checked_out,
+                "checkouts_total": self.checkouts,
+                "connects_total": self.connects,
+                "invalidations_total": self.invalidations,
+                "checkout_timeouts_total": self.checkout_timeouts,
+            }
+        counters["checkout_wait_seconds"] = self.checkout_wait.snapshot()
+        return counters
+
+
+# --- MÉTRICAS POR REQUEST ---
+# El middleware de timing.py deja un RequestStats en `current_request`; los
+# hooks de database.py le suman el tiempo y las filas de cada consulta.
+# Los endpoints sync corren en el threadpool con una copia del contexto, así
+# que comparten el mismo objeto.
+
+class RequestStats:
+    """Acumulado del request en curso: consultas, tiempo en BD, filas y fases."""
+
+    __slots__ = ("started", "queries", "db_time", "rows", "phases")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.phases = {}
+
+    def add_query(self, elapsed: float, rowcount: int):
+        self.queries += 1
+        self.db_time += elapsed
+        # rowcount es -1 cuando el driver no lo informa (ej. SELECT en SQLite)
+        self.rows += max(rowcount, 0)
+
+    def add_phase(self, name: str, elapsed: float):
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+@contextmanager
+def phase(name: str):
+    """Mide un tramo del request (auth, serialize...) para Server-Timing."""
+    stats = current_request.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_phase(name, time.perf_counter() - start)
+
+
+# Consultas y filas por request: buckets enteros (no segundos)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+class RouteMetrics:
+    """
+    Histogramas por (método, plantilla de ruta): duración, tiempo en BD,
+    consultas y filas. Se usa la plantilla (/patients/{patient_id}) y no el
+    path real para acotar la cardinalidad de las series.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def _histograms(self, key: tuple) -> dict:
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = {
+                    "duration_seconds": Histogram(),
+                    "db_seconds": Histogram(),
+                    "queries": Histogram(QUERY_BUCKETS),
+                    "rows": Histogram(ROW_BUCKETS),
+                }
+            return histograms
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        histograms = self._histograms((method, route))
+        histograms["duration_seconds"].observe(duration)
+        histograms["db_seconds"].observe(stats.db_time)
+        histograms["queries"].observe(stats.queries)
+        histograms["rows"].observe(stats.rows)
+        with self._lock:
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = dict(self._routes)
+            responses = dict(self._responses)
+        return {
+            "routes": {key: {name: h.snapshot() for name, h in hs.items()} for key, hs in routes.items()},
+            "responses": responses,
+        }
+
+
+# --- EXPOSICIÓN EN FORMATO PROMETHEUS (text/plain 0.0.4) ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _histogram_lines(name: str, snapshot: dict, **labels) -> list:
+    lines = [f"{name}_bucket{_labels(**labels, le=upper)} {count}" for upper, count in snapshot["buckets"].items()]
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+    return lines
+
+_ROUTE_HISTOGRAMS = {
+    "duration_seconds": ("odonto_http_request_duration_seconds", "Duración total del request"),
+    "db_seconds": ("odonto_http_request_db_seconds", "Tiempo en la base de datos por request"),
+    "queries": ("odonto_http_request_queries", "Consultas SQL por request"),
+    "rows": ("odonto_http_request_rows", "Filas leídas o escritas por request"),
+}
+
+# Contados en este proceso aunque la caché se comparta por Redis
+_AUTH_CACHE_COUNTERS = {
+    "hits_total": "Identidades servidas desde la caché (contador por proceso)",
+    "misses_total": "Identidades resueltas en la BD (contador por proceso)",
+}
+
+def render_prometheus(route_metrics: RouteMetrics, pool: PoolMetrics, auth_cache: Optional[dict] = None) -> str:
+    snapshot = route_metrics.snapshot()
+    lines = [
+        "# HELP odonto_http_requests_total Requests atendidos por ruta y código",
+        "# TYPE odonto_http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(snapshot["responses"].items()):
+        lines.append(f"odonto_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    for field, (name, help_text) in _ROUTE_HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (method, route), histograms in sorted(snapshot["routes"].items()):
+            lines += _histogram_lines(name, histograms[field], method=method, route=route)
+
+    counters = pool.snapshot()
+    wait = counters.pop("checkout_wait_seconds")
+    for field, value in counters.items():
+        kind = "counter" if field.endswith("_total") else "gauge"
+        lines += [f"# TYPE odonto_db_pool_{field} {kind}", f"odonto_db_pool_{field} {value}"]
+    lines += ["# TYPE odonto_db_pool_checkout_wait_seconds histogram"]
+    lines += _histogram_lines("odonto_db_pool_checkout_wait_seconds", wait)
+
+    for field, value in (auth_cache or {}).items():
+        name = f"odonto_auth_cache_{field}"
+        lines += [f"# HELP {name} {_AUTH_CACHE_COUNTERS[field]}", f"# TYPE {name} counter", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
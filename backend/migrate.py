@@ -0,0 +1,63 @@
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+import os
+import models, database
+
+# --- MIGRACIONES DEL ESQUEMA (PASO EXPLÍCITO) ---
+# El esquema ya no se crea al importar main.py: se corre `python migrate.py`
+# una vez por despliegue, antes de levantar la API (ver Dockerfile).
+# - BD vacía: create_all (incluye extensiones, triggers y partición por
+#   defecto de models.py) y se marca con la última revisión.
+# - BD creada antes de Alembic: se marca con la revisión base SÓLO si sus
+#   tablas y columnas son exactamente las del esquema original (0001) y se
+#   aplican las migraciones desde ahí. Si no coincide (ej. una BD creada
+#   con una versión intermedia) no se adivina: se aborta con las diferencias
+#   y se marca a mano con `alembic stamp <revisión>`.
+# - Resto: `alembic upgrade head`.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_REVISION = "0001"
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return config
+
+def baseline_differences(config: Config, inspector) -> list:
+    """Diferencias entre la BD y las tablas/columnas de la revisión base."""
+    baseline = ScriptDirectory.from_config(config).get_revision(BASELINE_REVISION).module.BASELINE_COLUMNS
+    existing = set(inspector.get_table_names())
+    differences = [f"falta la tabla {name}" for name in sorted(set(baseline) - existing)]
+    for name in sorted(existing & (set(baseline) | set(models.Base.metadata.tables))):
+        if name not in baseline:
+            differences.append(f"tabla {name} no es del esquema base")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(name)}
+        differences += [f"falta {name}.{column}" for column in sorted(baseline[name] - columns)]
+        differences += [f"{name}.{column} no es del esquema base" for column in sorted(columns - baseline[name])]
+    return differences
+
+def migrate() -> str:
+    config = alembic_config()
+    inspector = inspect(database.engine)
+    tables = set(inspector.get_table_names())
+    if "alembic_version" not in tables:
+        if not tables & set(models.Base.metadata.tables):
+            models.Base.metadata.create_all(bind=database.engine)
+            command.stamp(config, "head")
+            return "created"
+        differences = baseline_differences(config, inspector)
+        if differences:
+            raise RuntimeError(
+                f"La BD no tiene alembic_version y su esquema no es el de la revisión {BASELINE_REVISION}: "
+                + "; ".join(differences)
+                + ". Marcarla a mano con `alembic stamp <revisión>` y volver a correr migrate.py"
+            )
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+    return "upgraded"
+
+if __name__ == "__main__":
+    print(f"Esquema {migrate()}")
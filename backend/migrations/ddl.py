@@ -0,0 +1,36 @@
+from alembic import context, op
+import sqlalchemy as sa
+
+# --- DDL COMPARTIDO POR LAS REVISIONES ---
+# Los índices sobre tablas que crecen con las clínicas (patients,
+# appointments) se crean CONCURRENTLY en Postgres: no bloquean las
+# escrituras mientras se construyen. CONCURRENTLY no puede correr dentro de
+# una transacción, así que cada uno va en su propio bloque autocommit.
+# Con `alembic upgrade --sql` (modo offline) no hay BD que consultar: los
+# chequeos previos y los backfill que leen datos se omiten.
+
+def is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+def is_offline() -> bool:
+    return context.is_offline_mode()
+
+def scalar(sql: str):
+    """Resultado de una consulta de chequeo; None en modo offline."""
+    if is_offline():
+        return None
+    return op.get_bind().execute(sa.text(sql)).scalar()
+
+def create_index(name, table, columns, **kw):
+    if is_postgres():
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **kw)
+    else:
+        op.create_index(name, table, columns, if_not_exists=True, **kw)
+
+def drop_index(name, table):
+    if is_postgres():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name=table, if_exists=True)
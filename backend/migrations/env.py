@@ -0,0 +1,47 @@
+from logging.config import fileConfig
+from alembic import context
+import models, database
+
+# --- ENTORNO DE ALEMBIC ---
+# Misma URL y mismos modelos que la aplicación: `target_metadata` permite
+# `alembic revision --autogenerate` contra models.py.
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = models.Base.metadata
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Las particiones mensuales de audit_logs (audit.ensure_partitions) no
+    # están en models.py: autogenerate no debe proponer borrarlas
+    if type_ == "table" and reflected and compare_to is None:
+        return False
+    return True
+
+def run_migrations_offline():
+    # `alembic upgrade head --sql`: genera el script para revisarlo o aplicarlo a mano
+    context.configure(
+        url=database.SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with database.engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,107 @@
+"""Esquema base: el que creaba models.Base.metadata.create_all antes de esta serie
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Clínicas, usuarios, pacientes, sitios web, citas y auditoría tal como los
+creaba la versión original (sin particiones, sin claves de RUT ni columnas
+de sincronización). Las bases creadas antes de Alembic se marcan con esta
+revisión sólo si su esquema coincide EXACTAMENTE con BASELINE_COLUMNS (ver
+migrate.py); las revisiones siguientes agregan, en orden, lo que introdujo
+cada cambio.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _created_at():
+    return sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+
+
+def _tables() -> dict:
+    # Columnas nuevas en cada llamada: un sa.Column pertenece a una sola tabla
+    uuid = postgresql.UUID(as_uuid=True)
+    return {
+        "clinics": [
+            sa.Column("id", uuid, primary_key=True, index=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("rut", sa.String(20), unique=True, index=True, nullable=False),
+            sa.Column("address", sa.String(200)),
+            sa.Column("phone", sa.String(20)),
+            _created_at(),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("domain", sa.String(100), unique=True, index=True, nullable=True),
+        ],
+        "users": [
+            sa.Column("id", uuid, primary_key=True, index=True),
+            sa.Column("email", sa.String(100), unique=True, index=True, nullable=False),
+            sa.Column("hashed_password", sa.String(255), nullable=False),
+            sa.Column("full_name", sa.String(100)),
+            sa.Column("role", sa.String(20)),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id")),
+        ],
+        "patients": [
+            sa.Column("id", uuid, primary_key=True, index=True),
+            sa.Column("full_name", sa.String(100), nullable=False),
+            sa.Column("rut", sa.String(20), index=True, nullable=False),
+            sa.Column("email", sa.String(100)),
+            sa.Column("phone", sa.String(20)),
+            sa.Column("address", sa.String(200)),
+            _created_at(),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id")),
+        ],
+        "website_configs": [
+            sa.Column("id", uuid, primary_key=True),
+            sa.Column("domain", sa.String(100), unique=True),
+            sa.Column("primary_color", sa.String(7)),
+            sa.Column("config_json", postgresql.JSONB),
+            sa.Column("logo_url", sa.String(255)),
+            sa.Column("welcome_text", sa.Text),
+            sa.Column("hero_image", sa.String(255), nullable=True),
+            sa.Column("hero_text", sa.Text, nullable=True),
+            sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id"), unique=True),
+        ],
+        "appointments": [
+            sa.Column("id", uuid, primary_key=True, index=True),
+            sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("status", sa.String(20)),
+            sa.Column("patient_name", sa.String(100)),
+            sa.Column("patient_rut", sa.String(20)),
+            sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id")),
+            sa.Column("doctor_id", uuid, sa.ForeignKey("users.id")),
+            sa.Column("patient_id", uuid, sa.ForeignKey("patients.id"), nullable=True),
+        ],
+        "audit_logs": [
+            sa.Column("id", uuid, primary_key=True, index=True),
+            sa.Column("action", sa.String(50), nullable=False),
+            sa.Column("details", sa.String),
+            sa.Column("ip_address", sa.String(50)),
+            _created_at(),
+            sa.Column("user_id", uuid, sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id"), nullable=True),
+        ],
+    }
+
+# Firma del esquema base: migrate.py la compara con una BD sin alembic_version
+BASELINE_COLUMNS = {name: {column.name for column in columns} for name, columns in _tables().items()}
+
+
+def upgrade():
+    # En orden de dependencia (claves foráneas)
+    for name, columns in _tables().items():
+        op.create_table(name, *columns)
+
+
+def downgrade():
+    for name in reversed(list(BASELINE_COLUMNS)):
+        op.drop_table(name)
@@ -0,0 +1,23 @@
+"""Agenda por clínica ordenada en el tiempo
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+appointments (clinic_id, start_time): ventanas de fecha y paginación por
+keyset del listado de citas.
+"""
+from migrations import ddl
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ddl.create_index("ix_appointments_clinic_start", "appointments", ["clinic_id", "start_time"])
+
+
+def downgrade():
+    ddl.drop_index("ix_appointments_clinic_start", "appointments")
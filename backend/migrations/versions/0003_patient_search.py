@@ -0,0 +1,50 @@
+"""Búsqueda de pacientes por nombre (trigramas) y por prefijo de RUT
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Sólo Postgres. Extensiones pg_trgm, unaccent y btree_gin, la función
+IMMUTABLE f_unaccent (unaccent() no se puede indexar directamente) y los
+índices de expresión que usan las consultas (models.patient_name_key y
+models.patient_rut_key deben repetir exactamente estas expresiones).
+Al bajar se conservan las extensiones: otras bases u objetos pueden usarlas.
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations import ddl
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not ddl.is_postgres():
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS "
+        "$$ SELECT public.unaccent('public.unaccent', $1) $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+    )
+    ddl.create_index(
+        "ix_patients_clinic_name_trgm", "patients",
+        [sa.text("clinic_id"), sa.text("f_unaccent(lower(full_name)) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+    ddl.create_index(
+        "ix_patients_clinic_rut_key", "patients",
+        [sa.text("clinic_id"), sa.text("regexp_replace(upper(rut), '[^0-9K]', '', 'g') text_pattern_ops")],
+    )
+
+
+def downgrade():
+    if not ddl.is_postgres():
+        return
+    ddl.drop_index("ix_patients_clinic_rut_key", "patients")
+    ddl.drop_index("ix_patients_clinic_name_trgm", "patients")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
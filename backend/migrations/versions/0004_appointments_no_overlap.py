@@ -0,0 +1,46 @@
+"""Un doctor no puede tener dos citas activas que se solapen
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Sólo Postgres: restricción EXCLUDE (GiST) sobre doctor_id + tstzrange de
+la cita, ignorando las canceladas. Necesita btree_gist para la igualdad de
+doctor_id. Con choques ya existentes la restricción no se puede crear:
+se avisa cuántos hay para resolverlos (cancelar o mover) antes de migrar.
+"""
+from alembic import op
+from migrations import ddl
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not ddl.is_postgres():
+        return
+    overlaps = ddl.scalar(
+        "SELECT count(*) FROM appointments a JOIN appointments b "
+        "ON a.doctor_id = b.doctor_id AND a.id < b.id "
+        "AND a.status <> 'CANCELLED' AND b.status <> 'CANCELLED' "
+        "AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)"
+    )
+    if overlaps:
+        raise RuntimeError(
+            f"{overlaps} pares de citas activas se solapan para un mismo doctor: "
+            "resolverlos antes de crear la restricción"
+        )
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "ALTER TABLE appointments ADD CONSTRAINT ex_appointments_doctor_no_overlap "
+        "EXCLUDE USING gist (doctor_id WITH =, tstzrange(start_time, end_time) WITH &&) "
+        "WHERE (status <> 'CANCELLED')"
+    )
+
+
+def downgrade():
+    if not ddl.is_postgres():
+        return
+    op.execute("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS ex_appointments_doctor_no_overlap")
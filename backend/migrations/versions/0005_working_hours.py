@@ -0,0 +1,33 @@
+"""Horario de atención semanal por clínica o doctor
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+working_hours: bloques en hora local de la clínica. doctor_id NULL es el
+horario general; las filas de un doctor lo reemplazan para ese doctor.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "working_hours",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("weekday", sa.Integer, nullable=False),
+        sa.Column("start_time", sa.Time, nullable=False),
+        sa.Column("end_time", sa.Time, nullable=False),
+        sa.Column("clinic_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("clinics.id"), nullable=False, index=True),
+        sa.Column("doctor_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("working_hours")
@@ -0,0 +1,36 @@
+"""Bandeja de auditoría y cadena HMAC en audit_logs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+- audit_outbox: eventos escritos en la transacción del request; el worker
+  de audit.py los traspasa en bloque. Sin FKs ni índices secundarios.
+- audit_logs.seq / record_hash: orden y hash encadenado de cada registro.
+  Las filas anteriores quedan con seq NULL (fuera de la cadena).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "audit_outbox",
+        sa.Column("id", sa.BigInteger, primary_key=True, autoincrement=True),
+        sa.Column("payload", sa.Text, nullable=False),
+    )
+    op.add_column("audit_logs", sa.Column("seq", sa.BigInteger))
+    op.add_column("audit_logs", sa.Column("record_hash", sa.String(64)))
+    op.create_index("audit_logs_seq_key", "audit_logs", ["seq"], unique=True)
+
+
+def downgrade():
+    op.drop_index("audit_logs_seq_key", table_name="audit_logs")
+    op.drop_column("audit_logs", "record_hash")
+    op.drop_column("audit_logs", "seq")
+    op.drop_table("audit_outbox")
@@ -0,0 +1,133 @@
+"""audit_logs particionada por mes, con details JSONB
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Una tabla existente no se puede convertir en particionada: se renombra, se
+crea la nueva (RANGE sobre created_at, clave primaria id + created_at), se
+crean las particiones mensuales que cubren los datos y los próximos
+AUDIT_PARTITIONS_AHEAD meses más la partición por defecto, se copian las
+filas y se elimina la anterior. Corre dentro de la transacción de la
+migración: si algo falla, no queda nada a medias.
+
+details pasa de texto a JSONB como string JSON (to_jsonb): el texto libre
+de los registros antiguos no siempre es JSON, y los encadenados se
+hashearon sobre ese mismo string, así que verify_chain los sigue aceptando.
+En otros motores (SQLite en desarrollo) no hay particiones.
+"""
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from migrations import ddl
+import os
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", 3))
+
+COLUMNS = "id, action, details, ip_address, created_at, user_id, clinic_id, seq, record_hash"
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _create_partitions(first: date, last: date):
+    # Mismos nombres y límites (UTC) que audit.ensure_partitions
+    month = first
+    while month <= last:
+        following = _next_month(month)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS audit_logs_p{month:%Y_%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+    op.execute("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+
+def _rename_to(name: str):
+    op.rename_table("audit_logs", name)
+    if ddl.is_postgres():
+        # El nombre de la clave primaria es global (índice): se libera para la tabla nueva
+        op.execute(f"ALTER TABLE {name} RENAME CONSTRAINT audit_logs_pkey TO {name}_pkey")
+
+
+def _details(expression: str) -> str:
+    return f"CASE WHEN details IS NULL THEN NULL ELSE {expression} END"
+
+
+def upgrade():
+    postgres = ddl.is_postgres()
+    _rename_to("audit_logs_legacy")
+
+    uuid = postgresql.UUID(as_uuid=True)
+    op.create_table(
+        "audit_logs",
+        sa.Column("id", uuid, nullable=False),
+        sa.Column("action", sa.String(50), nullable=False),
+        sa.Column("details", postgresql.JSONB),
+        sa.Column("ip_address", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("user_id", uuid, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id"), nullable=True),
+        sa.Column("seq", sa.BigInteger),
+        sa.Column("record_hash", sa.String(64)),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+
+    if postgres:
+        oldest = ddl.scalar("SELECT min(created_at) FROM audit_logs_legacy")
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        first = oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else current
+        last = current
+        for _ in range(AUDIT_PARTITIONS_AHEAD):
+            last = _next_month(last)
+        _create_partitions(min(first, current), last)
+
+    details = _details("to_jsonb(details)" if postgres else "json_quote(details)")
+    op.execute(
+        f"INSERT INTO audit_logs ({COLUMNS}) "
+        f"SELECT id, action, {details}, ip_address, COALESCE(created_at, CURRENT_TIMESTAMP), "
+        f"user_id, clinic_id, seq, record_hash FROM audit_logs_legacy"
+    )
+    op.drop_table("audit_logs_legacy")
+
+    # Después de copiar: construir el índice una vez es más barato que mantenerlo fila a fila
+    op.create_index("ix_audit_logs_clinic_created", "audit_logs", ["clinic_id", "created_at"])
+    op.create_index("ix_audit_logs_user_created", "audit_logs", ["user_id", "created_at"])
+    op.create_index("ix_audit_logs_seq", "audit_logs", ["seq"])
+
+
+def downgrade():
+    postgres = ddl.is_postgres()
+    _rename_to("audit_logs_partitioned")
+
+    uuid = postgresql.UUID(as_uuid=True)
+    op.create_table(
+        "audit_logs",
+        sa.Column("id", uuid, primary_key=True, index=True),
+        sa.Column("action", sa.String(50), nullable=False),
+        sa.Column("details", sa.String),
+        sa.Column("ip_address", sa.String(50)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("user_id", uuid, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("clinic_id", uuid, sa.ForeignKey("clinics.id"), nullable=True),
+        sa.Column("seq", sa.BigInteger),
+        sa.Column("record_hash", sa.String(64)),
+    )
+    # Un string JSON vuelve a ser el texto original; un objeto, su JSON
+    details = _details("details #>> '{}'" if postgres else "json_extract(details, '$')")
+    op.execute(
+        f"INSERT INTO audit_logs ({COLUMNS}) "
+        f"SELECT id, action, {details}, ip_address, created_at, user_id, clinic_id, seq, record_hash "
+        f"FROM audit_logs_partitioned"
+    )
+    # En Postgres se van también todas sus particiones
+    op.drop_table("audit_logs_partitioned")
+    op.create_index("audit_logs_seq_key", "audit_logs", ["seq"], unique=True)
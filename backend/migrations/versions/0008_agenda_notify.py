@@ -0,0 +1,52 @@
+"""NOTIFY 'agenda_changes' en cada cambio de una cita
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Sólo Postgres: trigger AFTER INSERT/UPDATE/DELETE sobre appointments que
+publica la fila resumida para la agenda en vivo (ver events.py). NOTIFY se
+entrega recién con el COMMIT.
+"""
+from alembic import op
+from migrations import ddl
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not ddl.is_postgres():
+        return
+    op.execute("""
+    CREATE OR REPLACE FUNCTION notify_appointment_change() RETURNS trigger AS $$
+    DECLARE
+        r appointments;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+        PERFORM pg_notify('agenda_changes', json_build_object(
+            'op', TG_OP,
+            'row', json_build_object(
+                'id', r.id, 'clinic_id', r.clinic_id, 'doctor_id', r.doctor_id,
+                'start_time', r.start_time, 'end_time', r.end_time,
+                'status', r.status, 'patient_name', r.patient_name
+            )
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER appointments_notify_change "
+        "AFTER INSERT OR UPDATE OR DELETE ON appointments "
+        "FOR EACH ROW EXECUTE FUNCTION notify_appointment_change()"
+    )
+
+
+def downgrade():
+    if not ddl.is_postgres():
+        return
+    op.execute("DROP TRIGGER IF EXISTS appointments_notify_change ON appointments")
+    op.execute("DROP FUNCTION IF EXISTS notify_appointment_change()")
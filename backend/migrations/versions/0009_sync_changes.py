@@ -0,0 +1,50 @@
+"""Columnas de sincronización incremental en pacientes y citas
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+- updated_at, change_seq (0 para las filas existentes: un cliente sin
+  cursor las recibe todas) y deleted_at (lápida del borrado lógico).
+- Índices (clinic_id, change_seq) para GET /sync?since=.
+- sync_counters: contador por clínica, sólo para motores sin
+  pg_current_xact_id (ver sync.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from migrations import ddl
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = ("patients", "appointments")
+
+
+def upgrade():
+    for table in SYNCED_TABLES:
+        # SQLite no admite ADD COLUMN con un default no constante: batch recrea la tabla
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()))
+            batch.add_column(sa.Column("change_seq", sa.BigInteger, nullable=False, server_default=sa.text("0")))
+            batch.add_column(sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        "sync_counters",
+        sa.Column("clinic_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("clinics.id"), primary_key=True),
+        sa.Column("seq", sa.BigInteger, nullable=False, server_default=sa.text("0")),
+    )
+    for table in SYNCED_TABLES:
+        ddl.create_index(f"ix_{table}_clinic_change_seq", table, ["clinic_id", "change_seq"])
+
+
+def downgrade():
+    for table in SYNCED_TABLES:
+        ddl.drop_index(f"ix_{table}_clinic_change_seq", table)
+    op.drop_table("sync_counters")
+    for table in SYNCED_TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("deleted_at")
+            batch.drop_column("change_seq")
+            batch.drop_column("updated_at")
@@ -0,0 +1,66 @@
+"""Clave canónica del RUT de pacientes (rut_body + rut_dv)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+
+Agrega las columnas (si `python ruts.py backfill` no lo hizo antes), las
+completa por bloques con la misma validación de la aplicación y crea el
+índice (clinic_id, rut_body). Los RUT inválidos quedan en NULL. El script
+de `alembic upgrade --sql` no puede validar RUTs: después de aplicarlo,
+`python ruts.py backfill` completa las claves.
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations import ddl
+import ruts
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = ruts.RUT_BACKFILL_BATCH
+
+
+def _backfill(conn):
+    patients = sa.table("patients", sa.column("id"), sa.column("rut"), sa.column("rut_body"), sa.column("rut_dv"))
+    stmt = (
+        sa.update(patients)
+        .where(patients.c.id == sa.bindparam("b_id"))
+        .values(rut_body=sa.bindparam("b_body"), rut_dv=sa.bindparam("b_dv"))
+    )
+    last_id = None
+    while True:
+        query = sa.select(patients.c.id, patients.c.rut).where(patients.c.rut_body.is_(None))
+        if last_id is not None:
+            query = query.where(patients.c.id > last_id)
+        rows = conn.execute(query.order_by(patients.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        params = [
+            {"b_id": row.id, "b_body": parsed[0], "b_dv": parsed[1]}
+            for row, parsed in zip(rows, ruts.parse_many([row.rut for row in rows]))
+            if parsed is not None
+        ]
+        if params:
+            conn.execute(stmt, params)
+
+
+def upgrade():
+    offline = ddl.is_offline()
+    columns = set() if offline else {column["name"] for column in sa.inspect(op.get_bind()).get_columns("patients")}
+    if "rut_body" not in columns:
+        op.add_column("patients", sa.Column("rut_body", sa.Integer, nullable=True))
+    if "rut_dv" not in columns:
+        op.add_column("patients", sa.Column("rut_dv", sa.String(1), nullable=True))
+    if not offline:
+        _backfill(op.get_bind())
+    ddl.create_index("ix_patients_clinic_rut_body", "patients", ["clinic_id", "rut_body"])
+
+
+def downgrade():
+    ddl.drop_index("ix_patients_clinic_rut_body", "patients")
+    op.drop_column("patients", "rut_dv")
+    op.drop_column("patients", "rut_body")
@@ -0,0 +1,52 @@
+"""Índices compuestos y parciales para las consultas por clínica
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+
+- patients (clinic_id, rut_body) UNIQUE: RUT duplicado y búsqueda exacta;
+  reemplaza al índice no único de las claves canónicas.
+- patients (clinic_id, full_name, id) WHERE is_active: listado paginado.
+- appointments (doctor_id, start_time) WHERE status <> 'CANCELLED':
+  choques de horario del doctor (lotes) y disponibilidad.
+La agenda por (clinic_id, start_time) ya tenía su índice.
+En Postgres se crean CONCURRENTLY (ver migrations/ddl.py).
+"""
+import sqlalchemy as sa
+from migrations import ddl
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Un índice CONCURRENTLY que falla queda INVALID: mejor avisar antes
+    duplicates = ddl.scalar(
+        "SELECT count(*) FROM (SELECT 1 FROM patients WHERE rut_body IS NOT NULL "
+        "GROUP BY clinic_id, rut_body HAVING count(*) > 1) AS d"
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} RUT repetidos dentro de una misma clínica: "
+            "fusionar esos pacientes antes de crear el índice único"
+        )
+
+    ddl.create_index("uq_patients_clinic_rut_body", "patients", ["clinic_id", "rut_body"], unique=True)
+    ddl.drop_index("ix_patients_clinic_rut_body", "patients")
+    ddl.create_index(
+        "ix_patients_clinic_active_name", "patients", ["clinic_id", "full_name", "id"],
+        postgresql_where=sa.text("is_active"),
+    )
+    ddl.create_index(
+        "ix_appointments_doctor_start_active", "appointments", ["doctor_id", "start_time"],
+        postgresql_where=sa.text("status <> 'CANCELLED'"),
+    )
+
+
+def downgrade():
+    ddl.drop_index("ix_appointments_doctor_start_active", "appointments")
+    ddl.drop_index("ix_patients_clinic_active_name", "patients")
+    ddl.create_index("ix_patients_clinic_rut_body", "patients", ["clinic_id", "rut_body"])
+    ddl.drop_index("uq_patients_clinic_rut_body", "patients")
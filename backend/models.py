@@ -1,117 +1,303 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-import uuid
-from database import Base
-
-# --- MODELO MULTI-TENANT (Clínicas) ---
-class Clinic(Base):
-    __tablename__ = "clinics"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    name = Column(String(100), nullable=False)
-    rut = Column(String(20), unique=True, index=True, nullable=False)
-    address = Column(String(200))
-    phone = Column(String(20))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    is_active = Column(Boolean, default=True)
-    domain = Column(String(100), unique=True, index=True, nullable=True)
-    
-    # Relaciones (El cerebro del sistema)
-    users = relationship("User", back_populates="clinic")
-    website_config = relationship("WebsiteConfig", back_populates="clinic", uselist=False)
-    appointments = relationship("Appointment", back_populates="clinic")
-    patients = relationship("Patient", back_populates="clinic") # <--- NUEVA RELACIÓN CRÍTICA
-
-# --- USUARIOS DEL SISTEMA (Staff) ---
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    email = Column(String(100), unique=True, index=True, nullable=False)
-    hashed_password = Column(String(255), nullable=False) # CORREGIDO: Coincide con auth.py
-    full_name = Column(String(100))
-    role = Column(String(20)) # ADMIN, DENTIST, RECEPTIONIST
-    is_active = Column(Boolean, default=True)
-    
-    # FK y Relación
-    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
-    clinic = relationship("Clinic", back_populates="users")
-
-# --- GESTIÓN DE PACIENTES (NUEVA TABLA - Requisito Eval 3) ---
-class Patient(Base):
-    __tablename__ = "patients"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    full_name = Column(String(100), nullable=False)
-    rut = Column(String(20), index=True, nullable=False) # RUT Chileno
-    email = Column(String(100))
-    phone = Column(String(20))
-    address = Column(String(200))
-    
-    # Auditoría de creación
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    is_active = Column(Boolean, default=True)
-
-    # Multi-tenancy (Ley 19.628: Aislamiento de Datos)
-    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
-    clinic = relationship("Clinic", back_populates="patients")
-    
-    # Relación con sus citas
-    appointments = relationship("Appointment", back_populates="patient_rel")
-
-# --- CONSTRUCTOR WEB (DIWY) ---
-class WebsiteConfig(Base):
-    __tablename__ = "website_configs"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    domain = Column(String(100), unique=True)
-    primary_color = Column(String(7), default="#1E3A8A") # Color azul por defecto
-    config_json = Column(JSONB, default={}) # Estructura flexible para el CMS
-    logo_url = Column(String(255))
-    welcome_text = Column(Text)
-    hero_image = Column(String(255), nullable=True) # Para la URL de la imagen de cabecera
-    hero_text = Column(Text, nullable=True)         # Para el texto grande de bienvenida
-
-    
-    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), unique=True)
-    clinic = relationship("Clinic", back_populates="website_config")
-
-# --- CITAS (CORE DEL NEGOCIO) ---
-class Appointment(Base):
-    __tablename__ = "appointments"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    start_time = Column(DateTime(timezone=True), nullable=False)
-    end_time = Column(DateTime(timezone=True), nullable=False)
-    status = Column(String(20), default="PENDING") 
-    
-    # Snapshot Data (Datos congelados al momento de la reserva)
-    patient_name = Column(String(100))
-    patient_rut = Column(String(20))
-    
-    # Relaciones Fuertes (Integridad Referencial)
-    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
-    clinic = relationship("Clinic", back_populates="appointments")
-    
-    # Relación con el Doctor (User)
-    doctor_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    doctor = relationship("User")
-
-    # Relación con el Paciente (Tabla Patient)
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=True)
-    patient_rel = relationship("Patient", back_populates="appointments")
-
-# --- AUDITORÍA Y SEGURIDAD (LEY 20.584) ---
-class AuditLog(Base):
-    __tablename__ = "audit_logs"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    action = Column(String(50), nullable=False) 
-    details = Column(String) 
-    ip_address = Column(String(50))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
-    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), nullable=True)
\ No newline at end of file
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text, Index, Integer, BigInteger, Time, DDL, event, literal_column, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ExcludeConstraint
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func
+import uuid
+from database import Base
+import ruts
+
+# --- MODELO MULTI-TENANT (Clínicas) ---
+class Clinic(Base):
+    __tablename__ = "clinics"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    name = Column(String(100), nullable=False)
+    rut = Column(String(20), unique=True, index=True, nullable=False)
+    address = Column(String(200))
+    phone = Column(String(20))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    is_active = Column(Boolean, default=True)
+    domain = Column(String(100), unique=True, index=True, nullable=True)
+    
+    # Relaciones (El cerebro del sistema)
+    users = relationship("User", back_populates="clinic")
+    website_config = relationship("WebsiteConfig", back_populates="clinic", uselist=False)
+    appointments = relationship("Appointment", back_populates="clinic")
+    patients = relationship("Patient", back_populates="clinic") # <--- NUEVA RELACIÓN CRÍTICA
+
+# --- USUARIOS DEL SISTEMA (Staff) ---
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    email = Column(String(100), unique=True, index=True, nullable=False)
+    hashed_password = Column(String(255), nullable=False) # CORREGIDO: Coincide con auth.py
+    full_name = Column(String(100))
+    role = Column(String(20)) # ADMIN, DENTIST, RECEPTIONIST
+    is_active = Column(Boolean, default=True)
+    
+    # FK y Relación
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
+    clinic = relationship("Clinic", back_populates="users")
+
+# --- GESTIÓN DE PACIENTES (NUEVA TABLA - Requisito Eval 3) ---
+class Patient(Base):
+    __tablename__ = "patients"
+    __table_args__ = (
+        # Sincronización incremental: GET /sync?since= (ver sync.py)
+        Index("ix_patients_clinic_change_seq", "clinic_id", "change_seq"),
+        # Un RUT por clínica; igualdad sobre el cuerpo entero (ver ruts.py)
+        Index("uq_patients_clinic_rut_body", "clinic_id", "rut_body", unique=True),
+        # Listado de pacientes activos en orden (nombre, id) con keyset
+        Index(
+            "ix_patients_clinic_active_name", "clinic_id", "full_name", "id",
+            postgresql_where=text("is_active")
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    full_name = Column(String(100), nullable=False)
+    rut = Column(String(20), index=True, nullable=False) # RUT Chileno
+    # Clave canónica del RUT (cuerpo sin puntos ni DV + DV). Se completa sola
+    # al asignar `rut`; NULL sólo en filas heredadas con RUT inválido.
+    rut_body = Column(Integer, nullable=True)
+    rut_dv = Column(String(1), nullable=True)
+    email = Column(String(100))
+    phone = Column(String(20))
+    address = Column(String(200))
+    
+    # Auditoría de creación
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    is_active = Column(Boolean, default=True)
+
+    # Sincronización: última modificación, secuencia de cambio de la clínica
+    # y lápida (borrado lógico) para que los clientes eliminen su copia local
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default=text("0"))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Multi-tenancy (Ley 19.628: Aislamiento de Datos)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
+    clinic = relationship("Clinic", back_populates="patients")
+    
+    # Relación con sus citas
+    appointments = relationship("Appointment", back_populates="patient_rel")
+
+    @validates("rut")
+    def _split_rut(self, key, value):
+        try:
+            self.rut_body, self.rut_dv = ruts.parse_rut(value)
+        except (ValueError, TypeError):
+            self.rut_body = self.rut_dv = None
+        return value
+
+# --- BÚSQUEDA INDEXADA DE PACIENTES (PostgreSQL) ---
+# Las expresiones de búsqueda se definen UNA vez y se reutilizan en los índices
+# y en las consultas: Postgres sólo usa un índice de expresión si la consulta
+# repite exactamente la misma expresión (por eso literales y no parámetros).
+
+# Nombre sin tildes y en minúsculas ("José Muñoz" -> "jose munoz")
+patient_name_key = func.f_unaccent(func.lower(Patient.full_name))
+
+# RUT sólo dígitos + DV ("12.345.678-5" -> "123456785") para búsqueda por prefijo
+patient_rut_key = func.regexp_replace(
+    func.upper(Patient.rut), literal_column("'[^0-9K]'"), literal_column("''"), literal_column("'g'")
+)
+
+# Extensiones: pg_trgm (similitud por trigramas), unaccent (tildes) y
+# btree_gin (permite clinic_id + trigramas en un mismo índice GIN multi-tenant)
+# y btree_gist (igualdad de doctor_id dentro de la restricción EXCLUDE de citas).
+# unaccent() no es IMMUTABLE, así que se envuelve para poder indexarla.
+event.listen(Base.metadata, "before_create", DDL("""
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+$$ SELECT public.unaccent('public.unaccent', $1) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+""").execute_if(dialect="postgresql"))
+
+Index(
+    "ix_patients_clinic_name_trgm",
+    Patient.clinic_id, patient_name_key.label("name_key"),
+    postgresql_using="gin",
+    postgresql_ops={"name_key": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_patients_clinic_rut_key",
+    Patient.clinic_id, patient_rut_key.label("rut_key"),
+    postgresql_ops={"rut_key": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+# --- CONSTRUCTOR WEB (DIWY) ---
+class WebsiteConfig(Base):
+    __tablename__ = "website_configs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    domain = Column(String(100), unique=True)
+    primary_color = Column(String(7), default="#1E3A8A") # Color azul por defecto
+    config_json = Column(JSONB, default={}) # Estructura flexible para el CMS
+    logo_url = Column(String(255))
+    welcome_text = Column(Text)
+    hero_image = Column(String(255), nullable=True) # Para la URL de la imagen de cabecera
+    hero_text = Column(Text, nullable=True)         # Para el texto grande de bienvenida
+
+    
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), unique=True)
+    clinic = relationship("Clinic", back_populates="website_config")
+
+# --- CITAS (CORE DEL NEGOCIO) ---
+class Appointment(Base):
+    __tablename__ = "appointments"
+    __table_args__ = (
+        # Agenda por clínica ordenada en el tiempo (ventanas de fecha + keyset)
+        Index("ix_appointments_clinic_start", "clinic_id", "start_time"),
+        # Sincronización incremental: GET /sync?since= (ver sync.py)
+        Index("ix_appointments_clinic_change_seq", "clinic_id", "change_seq"),
+        # Citas activas de un doctor en el tiempo: choques de un lote y disponibilidad
+        Index(
+            "ix_appointments_doctor_start_active", "doctor_id", "start_time",
+            postgresql_where=text("status <> 'CANCELLED'")
+        ),
+        # Regla de negocio en la BD: un doctor no puede tener dos citas activas
+        # que se solapen. A diferencia de un SELECT ... FOR UPDATE, también
+        # cubre dos INSERT concurrentes sobre un bloque vacío. '[)' permite
+        # citas contiguas (10:00-11:00 y 11:00-12:00).
+        ExcludeConstraint(
+            ("doctor_id", "="),
+            (func.tstzrange(literal_column("start_time"), literal_column("end_time")), "&&"),
+            where=text("status <> 'CANCELLED'"),
+            using="gist",
+            name="ex_appointments_doctor_no_overlap",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(20), default="PENDING") 
+    
+    # Sincronización (igual que Patient)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, server_default=text("0"))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Snapshot Data (Datos congelados al momento de la reserva)
+    patient_name = Column(String(100))
+    patient_rut = Column(String(20))
+    
+    # Relaciones Fuertes (Integridad Referencial)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"))
+    clinic = relationship("Clinic", back_populates="appointments")
+    
+    # Relación con el Doctor (User)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    doctor = relationship("User")
+
+    # Relación con el Paciente (Tabla Patient)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id"), nullable=True)
+    patient_rel = relationship("Patient", back_populates="appointments")
+
+# Agenda en vivo: cada cambio de una cita se publica con NOTIFY en el canal
+# 'agenda_changes' (ver events.py). Al ser un trigger cubre cualquier origen
+# (API, importaciones, scripts) y NOTIFY sólo se entrega tras el COMMIT.
+event.listen(
+    Appointment.__table__,
+    "after_create",
+    DDL("""
+    CREATE OR REPLACE FUNCTION notify_appointment_change() RETURNS trigger AS $$
+    DECLARE
+        r appointments;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+        PERFORM pg_notify('agenda_changes', json_build_object(
+            'op', TG_OP,
+            'row', json_build_object(
+                'id', r.id, 'clinic_id', r.clinic_id, 'doctor_id', r.doctor_id,
+                'start_time', r.start_time, 'end_time', r.end_time,
+                'status', r.status, 'patient_name', r.patient_name
+            )
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER appointments_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON appointments
+        FOR EACH ROW EXECUTE FUNCTION notify_appointment_change();
+    """).execute_if(dialect="postgresql")
+)
+
+# --- HORARIO DE ATENCIÓN (DISPONIBILIDAD) ---
+# Bloques de atención semanales en hora local de la clínica. Una fila con
+# doctor_id NULL es el horario general de la clínica; si un doctor tiene
+# filas propias, éstas reemplazan al horario general para ese doctor.
+class WorkingHours(Base):
+    __tablename__ = "working_hours"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    weekday = Column(Integer, nullable=False) # 0 = lunes ... 6 = domingo
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), nullable=False, index=True)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+
+# --- AUDITORÍA Y SEGURIDAD (LEY 20.584) ---
+# Tabla particionada por mes (RANGE sobre created_at): las consultas por
+# rango de fechas sólo leen los meses involucrados y la retención se hace
+# separando particiones completas, sin DELETE masivos (ver audit.py).
+# En Postgres la clave primaria debe incluir la columna de partición.
+class AuditLog(Base):
+    __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Consultas de cumplimiento: por clínica o por usuario en el tiempo
+        Index("ix_audit_logs_clinic_created", "clinic_id", "created_at"),
+        Index("ix_audit_logs_user_created", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    action = Column(String(50), nullable=False) 
+    details = Column(JSONB)
+    ip_address = Column(String(50))
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), nullable=True)
+
+    # Evidencia de manipulación: cadena HMAC en orden de `seq` (ver audit.py).
+    # Un UNIQUE global no es posible en una tabla particionada: la unicidad
+    # la garantiza el worker (único escritor) y la comprueba verify_chain.
+    seq = Column(BigInteger, index=True)
+    record_hash = Column(String(64))
+
+# Partición por defecto: red de seguridad para filas fuera de los meses
+# creados por audit.ensure_partitions (nunca debería recibir datos)
+event.listen(
+    AuditLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT").execute_if(dialect="postgresql")
+)
+
+# --- CONTADOR DE CAMBIOS POR CLÍNICA (SINCRONIZACIÓN, FUERA DE POSTGRES) ---
+# Una fila por clínica, incrementada por cada transacción que modifica
+# citas/pacientes. Sólo se usa sin Postgres (SQLite en desarrollo, un único
+# escritor); en Postgres el change_seq es el id de la transacción (ver sync.py).
+class SyncCounter(Base):
+    __tablename__ = "sync_counters"
+
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey("clinics.id"), primary_key=True)
+    seq = Column(BigInteger, nullable=False, server_default=text("0"))
+
+# --- BANDEJA DE SALIDA DE AUDITORÍA (OUTBOX) ---
+# Se escribe en la MISMA transacción que la operación auditada (no se pierde
+# nada si el proceso cae) y un worker la traspasa en bloque a audit_logs.
+# Sin FKs ni índices secundarios: el INSERT en la ruta del request es mínimo.
+class AuditOutbox(Base):
+    __tablename__ = "audit_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    payload = Column(Text, nullable=False)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# --- PAGINACIÓN POR CURSOR (KEYSET) ---
+# En vez de OFFSET (que obliga a la BD a recorrer y descartar filas),
+# el cliente nos devuelve la última clave de orden que recibió, por ejemplo
+# (start_time, id), y continuamos desde ahí usando el índice. El costo es
+# constante sin importar cuánto historial tenga la clínica.
+
+def encode_cursor(*values) -> str:
+    """
+    Serializa la clave de ordenamiento de la última fila en un token opaco.
+    """
+    parts = [v.isoformat() if isinstance(v, datetime) else str(v) for v in values]
+    raw = "|".join(parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers) -> tuple:
+    """
+    Operación inversa de encode_cursor: `parsers` convierte cada parte
+    (ej: datetime.fromisoformat, UUID). Lanza 400 si el token fue manipulado.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        # rsplit: sólo la primera parte (ej: un nombre) puede contener "|"
+        parts = base64.urlsafe_b64decode(padded).decode().rsplit("|", len(parsers) - 1)
+        if len(parts) != len(parsers):
+            raise ValueError("Cantidad de partes inválida")
+        return tuple(parse(part) for parse, part in zip(parsers, parts))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
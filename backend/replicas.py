@@ -0,0 +1,233 @@
+from fastapi import Request
+from sqlalchemy import exc, text
+from sqlalchemy.orm import sessionmaker
+import hashlib
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+import audit, database
+from cache import app_cache
+
+# --- RÉPLICAS DE LECTURA (OPCIONAL) ---
+# DATABASE_REPLICA_URL acepta una o varias URLs separadas por coma (standby
+# de streaming replication). Las rutas GET de sólo lectura piden la sesión
+# con `Depends(replicas.get_read_db)`:
+# - round-robin entre las réplicas sanas (recibiendo WAL del primario) y con
+#   retraso <= REPLICA_MAX_LAG;
+# - si la réplica elegida no entrega conexión, queda fuera REPLICA_RETRY_AFTER
+#   segundos y el request se atiende con el primario;
+# - read-your-writes: tras una escritura exitosa (POST/PUT/PATCH/DELETE) ese
+#   usuario lee del primario durante REPLICA_STICKY_SECONDS (ej. la agenda
+#   justo después de reservar). La marca vive en app_cache: con varios
+#   workers o instancias usar CACHE_REDIS_URL para que todos la vean.
+# Sin réplicas configuradas get_read_db es igual a database.get_db.
+# Las rutas async (DATABASE_ASYNC=true) siguen leyendo del primario.
+
+logger = logging.getLogger("odonto.replicas")
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URL", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+REPLICA_RETRY_AFTER = float(os.getenv("REPLICA_RETRY_AFTER", 30))
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 10))
+# Sin mensajes del primario por más de esto la conexión de replicación se
+# da por caída (mismo valor por defecto que wal_receiver_timeout)
+REPLICA_RECEIVER_TIMEOUT = int(os.getenv("REPLICA_RECEIVER_TIMEOUT", 60))
+
+# Segundos de atraso de la réplica, o NULL si no está recibiendo WAL.
+# Sin escrituras en el primario pg_last_xact_replay_timestamp() envejece
+# aunque no falte nada por aplicar: si lo recibido ya se aplicó, el atraso
+# es 0. Pero "recibido = aplicado" también se cumple para siempre en un
+# standby desconectado, así que antes se exige que el WAL receiver esté en
+# 'streaming' y haya oído al primario hace poco. El usuario de la réplica
+# necesita pg_monitor (o pg_read_all_stats) para ver pg_stat_wal_receiver:
+# sin él la réplica queda fuera de rotación.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming' "
+    "AND last_msg_receipt_time > now() - make_interval(secs => :receiver_timeout)) THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = database.create_read_engine(url)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.name = self.engine.url.host or self.engine.url.database
+        # Fuera de rotación hasta que el monitor la mida por primera vez
+        self.lag = math.inf
+        self.failed_until = 0.0
+        self.last_error = None
+
+    def available(self, now: float) -> bool:
+        return self.failed_until <= now and self.lag <= REPLICA_MAX_LAG
+
+    def mark_failed(self, error: Exception):
+        self.failed_until = time.monotonic() + REPLICA_RETRY_AFTER
+        self.last_error = type(error).__name__
+        logger.warning("Réplica %s fuera de rotación por %ss: %s", self.name, REPLICA_RETRY_AFTER, error)
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    conn.execute(text(f"SET LOCAL statement_timeout = {int(REPLICA_CHECK_INTERVAL * 1000)}"))
+                    lag = conn.execute(LAG_QUERY, {"receiver_timeout": REPLICA_RECEIVER_TIMEOUT}).scalar()
+                    self.lag = math.inf if lag is None else float(lag)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag = 0.0
+        except Exception as error:
+            self.mark_failed(error)
+            return
+        self.failed_until = 0.0
+        self.last_error = None
+        if self.lag == math.inf:
+            logger.warning("Réplica %s sin replicación activa desde el primario", self.name)
+        elif self.lag > REPLICA_MAX_LAG:
+            logger.warning("Réplica %s atrasada %.1f s (máximo %s s)", self.name, self.lag, REPLICA_MAX_LAG)
+
+    def status(self, now: float) -> dict:
+        return {
+            "name": self.name,
+            "available": self.available(now),
+            "lag_seconds": None if self.lag == math.inf else round(self.lag, 3),
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaSet:
+    """Réplicas configuradas + el hilo que mide su salud y atraso."""
+
+    def __init__(self, urls: list):
+        self.replicas = [Replica(url) for url in urls]
+        self._turn = itertools.count()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self):
+        now = time.monotonic()
+        candidates = [replica for replica in self.replicas if replica.available(now)]
+        if not candidates:
+            return None
+        return candidates[next(self._turn) % len(candidates)]
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            for replica in self.replicas:
+                replica.check()
+            self.stopping.wait(REPLICA_CHECK_INTERVAL)
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    def status(self) -> list:
+        now = time.monotonic()
+        return [replica.status(now) for replica in self.replicas]
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
+
+# --- READ-YOUR-WRITES ---
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+def _sticky_key(headers, client_ip) -> str:
+    # Por token (un usuario) y, en rutas anónimas, por IP. El token no se
+    # guarda tal cual en la caché compartida
+    identity = headers.get("authorization") or client_ip or ""
+    return "replica:sticky:" + hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+class ReadYourWritesMiddleware:
+    """
+    Middleware ASGI: una escritura exitosa deja la marca ANTES de enviar la
+    respuesta, así la lectura siguiente del mismo usuario ya va al primario.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_marking_writes(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+                app_cache.set(_sticky_key(headers, audit.client_ip.get()), "1", REPLICA_STICKY_SECONDS)
+            await send(message)
+
+        await self.app(scope, receive, send_marking_writes)
+
+def _recently_wrote(request: Request) -> bool:
+    return app_cache.get(_sticky_key(request.headers, audit.client_ip.get())) is not None
+
+# --- DEPENDENCIA DE LECTURA ---
+
+def _open_read_session(request: Request):
+    if not replica_set.enabled or _recently_wrote(request):
+        return database.SessionLocal()
+    replica = replica_set.choose()
+    if replica is None:
+        return database.SessionLocal()
+    db = replica.sessions()
+    try:
+        # Checkout inmediato: si la réplica no responde se cae al primario
+        # acá y no a mitad del endpoint
+        db.connection()
+    except (exc.DBAPIError, exc.TimeoutError) as error:
+        db.close()
+        replica.mark_failed(error)
+        return database.SessionLocal()
+    db.info["replica"] = replica.name
+    return db
+
+def get_read_db(request: Request):
+    """Como database.get_db, pero puede leer de una réplica (sólo rutas GET)."""
+    db = _open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# --- CACHÉS ALIMENTADAS DESDE RÉPLICAS ---
+# Tras invalidar una clave, un request que leyó de una réplica todavía
+# atrasada podría volver a cachear el dato viejo. La invalidación deja una
+# marca en app_cache con el instante hasta el que dura (ahora +
+# REPLICA_MAX_LAG) y, mientras siga vigente, esa clave no se vuelve a
+# cachear: el dato se sirve desde la BD. Vive en la misma caché que los
+# datos, así que con CACHE_REDIS_URL la respetan todos los workers.
+
+def _fence_key(key: str) -> str:
+    return "replica:fence:" + key
+
+def fence(*keys):
+    """Marca las claves como no cacheables por REPLICA_MAX_LAG. Sin réplicas no hace nada."""
+    if not replica_set.enabled or not keys:
+        return
+    until = time.time() + REPLICA_MAX_LAG
+    for key in keys:
+        app_cache.set(_fence_key(key), repr(until), max(1, math.ceil(REPLICA_MAX_LAG)))
+
+def fenced(key: str) -> bool:
+    """True si la clave se invalidó hace menos de REPLICA_MAX_LAG (no cachearla)."""
+    if not replica_set.enabled:
+        return False
+    until = app_cache.get(_fence_key(key))
+    return until is not None and float(until) > time.time()
@@ -0,0 +1,21 @@
+from fastapi.responses import ORJSONResponse
+import metrics
+
+# --- SERIALIZACIÓN RÁPIDA DE LISTADOS ---
+# Los listados seleccionan SÓLO las columnas del esquema de salida (sin
+# hidratar objetos ORM) y se serializan directo con orjson, sin pasar cada
+# fila por Pydantic. El `response_model` de la ruta se mantiene para la
+# documentación OpenAPI; FastAPI no lo aplica cuando se retorna un Response.
+
+def columns_for(model, schema) -> list:
+    """Columnas de `model` en el orden de los campos de `schema`."""
+    return [getattr(model, field) for field in schema.model_fields]
+
+def json_rows(rows, schema, headers: dict = None) -> ORJSONResponse:
+    """
+    Filas de una consulta que empieza con columns_for(model, schema) ->
+    respuesta JSON. Columnas extra al final (claves de orden) se ignoran.
+    """
+    fields = list(schema.model_fields)
+    with metrics.phase("serialize"):
+        return ORJSONResponse([dict(zip(fields, row)) for row in rows], headers=headers)
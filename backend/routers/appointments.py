@@ -1,75 +1,570 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-import json
-import models, database, schemas, security
-
-router = APIRouter(prefix="/appointments", tags=["Agenda y Citas"])
-
-@router.post("/", response_model=schemas.AppointmentResponse, status_code=201)
-def create_appointment(
-    appointment: schemas.AppointmentCreate,
-    current_user: models.User = Depends(security.get_current_user),
-    db: Session = Depends(database.get_db)
-):
-    # 1. Seguridad: Verificar que el doctor pertenezca a la misma clínica
-    doctor = db.query(models.User).filter(models.User.id == appointment.doctor_id).first()
-    if not doctor or doctor.clinic_id != current_user.clinic_id:
-        raise HTTPException(status_code=404, detail="Doctor no encontrado o de otra clínica")
-
-    # 2. Lógica de Negocio: Bloqueo de Horario (Prevención de Solapamiento)
-    collision = db.query(models.Appointment).filter(
-        models.Appointment.doctor_id == appointment.doctor_id,
-        models.Appointment.status != "CANCELLED",
-        models.Appointment.start_time < appointment.end_time,
-        models.Appointment.end_time > appointment.start_time
-    ).with_for_update().first() # SELECT FOR UPDATE (Bloqueo Pesimista DB)
-
-    if collision:
-        raise HTTPException(status_code=409, detail="Conflicto: El bloque horario ya está ocupado")
-
-    # 3. Gestión de Datos del Paciente (Híbrido Snapshot/Relacional)
-    # Si viene un patient_id, usamos ese. Si no, usamos los datos de texto (para demo rápida)
-    patient_id_ref = appointment.patient_id
-    
-    # 4. Crear Cita
-    new_appointment = models.Appointment(
-        start_time=appointment.start_time,
-        end_time=appointment.end_time,
-        status="CONFIRMED",
-        # Datos Snapshot
-        patient_name=appointment.patient_name,
-        patient_rut=appointment.patient_rut,
-        patient_id=patient_id_ref,
-        # Relaciones
-        doctor_id=appointment.doctor_id,
-        clinic_id=current_user.clinic_id 
-    )
-    db.add(new_appointment)
-    
-    # 5. Auditoría (Ley 20.584)
-    audit_log = models.AuditLog(
-        action="CREATE_APPOINTMENT",
-        user_id=current_user.id,
-        clinic_id=current_user.clinic_id,
-        details=json.dumps({
-            "doctor_id": str(appointment.doctor_id),
-            "time": str(appointment.start_time),
-            "patient_rut": appointment.patient_rut
-        }),
-        ip_address="REQUEST_IP"
-    )
-    db.add(audit_log)
-
-    db.commit()
-    db.refresh(new_appointment)
-    return new_appointment
-
-@router.get("/", response_model=list[schemas.AppointmentResponse])
-def get_appointments(
-    current_user: models.User = Depends(security.get_current_user),
-    db: Session = Depends(database.get_db)
-):
-    # Solo citas de MI clínica
-    return db.query(models.Appointment).filter(
-        models.Appointment.clinic_id == current_user.clinic_id
-    ).all()
\ No newline at end of file
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+import asyncio
+import calendar
+import json
+import time
+import models, database, schemas, security, pagination, availability, audit, events, responses, replicas, dates
+
+router = APIRouter(prefix="/appointments", tags=["Agenda y Citas"])
+
+@router.post("/", response_model=schemas.AppointmentResponse, status_code=201)
+def create_appointment(
+    appointment: schemas.AppointmentCreate,
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    # 1. Seguridad: Verificar que el doctor pertenezca a la misma clínica
+    doctor = db.query(models.User).filter(models.User.id == appointment.doctor_id).first()
+    if not doctor or doctor.clinic_id != current_user.clinic_id:
+        raise HTTPException(status_code=404, detail="Doctor no encontrado o de otra clínica")
+
+    # 2. Lógica de Negocio: Prevención de Solapamiento
+    # La garantiza la restricción EXCLUDE 'ex_appointments_doctor_no_overlap'
+    # al hacer COMMIT (ver models.Appointment): sin SELECT previo ni bloqueos.
+
+    # 3. Gestión de Datos del Paciente (Híbrido Snapshot/Relacional)
+    # Si viene un patient_id, usamos ese. Si no, usamos los datos de texto (para demo rápida)
+    patient_id_ref = appointment.patient_id
+    
+    # 4. Crear Cita
+    new_appointment = models.Appointment(
+        start_time=appointment.start_time,
+        end_time=appointment.end_time,
+        status="CONFIRMED",
+        # Datos Snapshot
+        patient_name=appointment.patient_name,
+        patient_rut=appointment.patient_rut,
+        patient_id=patient_id_ref,
+        # Relaciones
+        doctor_id=appointment.doctor_id,
+        clinic_id=current_user.clinic_id 
+    )
+    db.add(new_appointment)
+    
+    # 5. Auditoría (Ley 20.584)
+    audit.record(
+        db,
+        action="CREATE_APPOINTMENT",
+        user_id=current_user.id,
+        clinic_id=current_user.clinic_id,
+        details={
+            "doctor_id": str(appointment.doctor_id),
+            "time": str(appointment.start_time),
+            "patient_rut": appointment.patient_rut
+        }
+    )
+
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_overlap_violation(e):
+            raise HTTPException(status_code=409, detail="Conflicto: El bloque horario ya está ocupado")
+        raise
+    db.refresh(new_appointment)
+    return new_appointment
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    # 23P01 = exclusion_violation (psycopg2 y asyncpg exponen `pgcode`)
+    return (
+        getattr(error.orig, "pgcode", None) == "23P01"
+        or "ex_appointments_doctor_no_overlap" in str(error.orig)
+    )
+
+APPOINTMENT_LIST_COLUMNS = responses.columns_for(models.Appointment, schemas.AppointmentResponse)
+
+@router.get("/", response_model=list[schemas.AppointmentResponse])
+def get_appointments(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    doctor_id: Optional[UUID] = None,
+    status_filter: Optional[str] = Query(None, alias="status", max_length=20),
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Agenda de la clínica en una ventana de fechas, ordenada por (start_time, id).
+    Paginación keyset: si quedan más citas, el header `X-Next-Cursor` trae el
+    token a enviar como `?cursor=` para obtener la página siguiente.
+    """
+    # Solo citas de MI clínica (usa el índice compuesto clinic_id + start_time),
+    # leyendo sólo las columnas de AppointmentResponse
+    query = db.query(*APPOINTMENT_LIST_COLUMNS).filter(
+        models.Appointment.clinic_id == current_user.clinic_id,
+        models.Appointment.deleted_at == None
+    )
+
+    if date_from:
+        query = query.filter(models.Appointment.start_time >= date_from)
+    if date_to:
+        query = query.filter(models.Appointment.start_time < date_to)
+    if doctor_id:
+        query = query.filter(models.Appointment.doctor_id == doctor_id)
+    if status_filter:
+        query = query.filter(models.Appointment.status == status_filter)
+
+    if cursor:
+        last_start, last_id = pagination.decode_cursor(cursor, datetime.fromisoformat, UUID)
+        query = query.filter(
+            tuple_(models.Appointment.start_time, models.Appointment.id) > tuple_(last_start, last_id)
+        )
+
+    # Pedimos una fila extra para saber si existe una página siguiente
+    rows = query.order_by(
+        models.Appointment.start_time, models.Appointment.id
+    ).limit(limit + 1).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(rows[-1].start_time, rows[-1].id)
+
+    return responses.json_rows(rows, schemas.AppointmentResponse, headers)
+
+@router.delete("/{appointment_id}", status_code=204)
+def delete_appointment(
+    appointment_id: UUID,
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Borrado lógico: la cita se cancela (libera el bloque) y queda como
+    lápida para GET /sync; el historial se conserva (Ley 20.584).
+    """
+    appointment = db.query(models.Appointment).filter(
+        models.Appointment.id == appointment_id,
+        models.Appointment.clinic_id == current_user.clinic_id,
+        models.Appointment.deleted_at == None
+    ).first()
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Cita no encontrada")
+
+    appointment.status = "CANCELLED"
+    appointment.deleted_at = func.now()
+    audit.record(
+        db,
+        action="DELETE_APPOINTMENT",
+        user_id=current_user.id,
+        clinic_id=current_user.clinic_id,
+        details={"appointment_id": str(appointment.id), "time": str(appointment.start_time)}
+    )
+    db.commit()
+    return Response(status_code=204)
+
+# --- RESERVA EN LOTE (TRATAMIENTOS RECURRENTES) ---
+
+@router.post("/batch", response_model=schemas.AppointmentBatchResult, status_code=201)
+def create_appointments_batch(
+    batch: schemas.AppointmentBatchCreate,
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Agenda varias citas del mismo paciente con el mismo doctor en UNA transacción.
+    - all_or_nothing: si alguna ocurrencia choca, no se crea ninguna (409 con el detalle).
+    - best_effort: se crean las que caben y se informan las que chocaron.
+    """
+    # 1. Seguridad: el doctor se valida una sola vez para todo el lote
+    doctor = db.query(models.User.id).filter(
+        models.User.id == batch.doctor_id,
+        models.User.clinic_id == current_user.clinic_id
+    ).first()
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor no encontrado o de otra clínica")
+
+    occurrences = expand_occurrences(batch)
+
+    # 2. Choques: entre ocurrencias del lote y contra la agenda (UNA consulta)
+    conflicts = find_batch_conflicts(db, batch.doctor_id, occurrences)
+    if conflicts and batch.mode == "all_or_nothing":
+        raise HTTPException(status_code=409, detail={
+            "message": "Conflicto: hay bloques ocupados, no se agendó ninguna cita",
+            "results": [item.model_dump(mode="json") for item in _batch_items(occurrences, conflicts, {})]
+        })
+
+    # 3. Inserción en una sola transacción. En best_effort cada cita va en su
+    # SAVEPOINT: si otra reserva concurrente gana el bloque (restricción
+    # EXCLUDE), sólo se descarta esa ocurrencia.
+    created = {}
+    for index, (start, end) in enumerate(occurrences):
+        if index in conflicts:
+            continue
+        new_appointment = models.Appointment(
+            start_time=start,
+            end_time=end,
+            status="CONFIRMED",
+            patient_name=batch.patient_name,
+            patient_rut=batch.patient_rut,
+            patient_id=batch.patient_id,
+            doctor_id=batch.doctor_id,
+            clinic_id=current_user.clinic_id
+        )
+        if batch.mode == "best_effort":
+            try:
+                with db.begin_nested():
+                    db.add(new_appointment)
+            except IntegrityError as e:
+                if not is_overlap_violation(e):
+                    raise
+                conflicts[index] = "El bloque horario ya está ocupado"
+                continue
+        else:
+            db.add(new_appointment)
+        created[index] = new_appointment
+
+    if not created:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={
+            "message": "Conflicto: ninguna de las citas pudo agendarse",
+            "results": [item.model_dump(mode="json") for item in _batch_items(occurrences, conflicts, {})]
+        })
+
+    # 4. Auditoría (Ley 20.584): un registro por lote
+    audit.record(
+        db,
+        action="CREATE_APPOINTMENT_BATCH",
+        user_id=current_user.id,
+        clinic_id=current_user.clinic_id,
+        details={
+            "doctor_id": str(batch.doctor_id),
+            "mode": batch.mode,
+            "times": [str(occurrences[index][0]) for index in sorted(created)],
+            "patient_rut": batch.patient_rut
+        }
+    )
+
+    try:
+        db.flush()
+        # Los ids se leen antes del COMMIT (después quedan expirados)
+        ids = {index: appointment.id for index, appointment in created.items()}
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_overlap_violation(e):
+            raise HTTPException(status_code=409, detail="Conflicto: El bloque horario ya está ocupado")
+        raise
+
+    return {
+        "mode": batch.mode,
+        "created": len(ids),
+        "conflicts": len(conflicts),
+        "results": _batch_items(occurrences, conflicts, ids)
+    }
+
+def _shift_local(start: datetime, frequency: str, steps: int) -> datetime:
+    # Aritmética de calendario sobre la hora local "de pared"
+    if frequency == "DAILY":
+        return start + timedelta(days=steps)
+    if frequency == "WEEKLY":
+        return start + timedelta(weeks=steps)
+    month_index = start.month - 1 + steps
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    # 31 de enero + 1 mes -> 28/29 de febrero
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+def expand_occurrences(batch: schemas.AppointmentBatchCreate) -> list:
+    """Lista de (inicio, fin) en UTC, en el orden de la solicitud."""
+    if batch.occurrences:
+        return [
+            (dates.as_utc(o.start_time), dates.as_utc(o.end_time))
+            for o in batch.occurrences
+        ]
+
+    rule = batch.recurrence
+    first_start = dates.as_utc(batch.first.start_time)
+    duration = dates.as_utc(batch.first.end_time) - first_start
+    # Se repite la hora local: un control semanal a las 10:00 sigue a las
+    # 10:00 después del cambio de horario, aunque cambie su hora UTC.
+    local = first_start.astimezone(availability.CLINIC_TIMEZONE).replace(tzinfo=None)
+    until = dates.as_utc(rule.until) if rule.until else None
+    limit = rule.count or schemas.APPOINTMENT_BATCH_MAX + 1
+
+    occurrences = []
+    for step in range(limit):
+        start = _shift_local(local, rule.frequency, step * rule.interval).replace(
+            tzinfo=availability.CLINIC_TIMEZONE
+        ).astimezone(timezone.utc)
+        if until and start > until:
+            break
+        occurrences.append((start, start + duration))
+    if len(occurrences) > schemas.APPOINTMENT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {schemas.APPOINTMENT_BATCH_MAX} citas por lote")
+    return occurrences
+
+def find_batch_conflicts(db: Session, doctor_id, occurrences: list) -> dict:
+    """{índice: motivo} de las ocurrencias que no se pueden agendar."""
+    conflicts = {}
+
+    # a) Solapes dentro del mismo lote (barrido por inicio; gana la primera)
+    kept_end, kept_index = None, None
+    for index in sorted(range(len(occurrences)), key=lambda i: occurrences[i][0]):
+        start, end = occurrences[index]
+        if kept_end is not None and start < kept_end:
+            conflicts[index] = f"Se solapa con la ocurrencia #{kept_index}"
+            continue
+        kept_end, kept_index = end, index
+
+    # b) Contra la agenda: UNA consulta con todos los intervalos
+    # (el rango global deja usar el índice; el OR filtra los intervalos exactos)
+    pending = [i for i in range(len(occurrences)) if i not in conflicts]
+    if not pending:
+        return conflicts
+    busy = db.query(models.Appointment.start_time, models.Appointment.end_time).filter(
+        models.Appointment.doctor_id == doctor_id,
+        models.Appointment.status != "CANCELLED",
+        models.Appointment.start_time < max(occurrences[i][1] for i in pending),
+        models.Appointment.end_time > min(occurrences[i][0] for i in pending),
+        or_(*[
+            and_(models.Appointment.start_time < occurrences[i][1], models.Appointment.end_time > occurrences[i][0])
+            for i in pending
+        ])
+    ).all()
+    busy = [(dates.as_utc(row.start_time), dates.as_utc(row.end_time)) for row in busy]
+    for index in pending:
+        start, end = occurrences[index]
+        if any(busy_start < end and busy_end > start for busy_start, busy_end in busy):
+            conflicts[index] = "El bloque horario ya está ocupado"
+    return conflicts
+
+def _batch_items(occurrences: list, conflicts: dict, ids: dict) -> list:
+    return [
+        schemas.AppointmentBatchItem(
+            index=index,
+            start_time=start,
+            end_time=end,
+            status="CREATED" if index in ids else "CONFLICT" if index in conflicts else "SKIPPED",
+            appointment_id=ids.get(index),
+            detail=conflicts.get(index)
+        )
+        for index, (start, end) in enumerate(occurrences)
+    ]
+
+# --- DISPONIBILIDAD (BLOQUES LIBRES) ---
+AVAILABILITY_MAX_DAYS = 31
+AVAILABILITY_MAX_DOCTORS = 50
+
+@router.get("/availability", response_model=list[schemas.DoctorAvailability])
+def get_availability(
+    doctor_id: List[UUID] = Query(..., description="Uno o más doctores (?doctor_id=a&doctor_id=b)"),
+    date_from: date = Query(..., description="Primer día (hora local de la clínica)"),
+    date_to: Optional[date] = Query(None, description="Último día, inclusive (por defecto: una semana)"),
+    slot_minutes: int = Query(30, ge=5, le=480),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Bloques libres de uno o más doctores en un rango de días, según su horario
+    de atención (propio, de la clínica o el por defecto) menos sus citas activas.
+    Los días ya calculados se sirven desde caché; el resto se resuelve con una
+    sola consulta por rango para todos los doctores faltantes.
+    """
+    date_to = date_to or date_from + timedelta(days=6)
+    if date_to < date_from or (date_to - date_from).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango debe ser de 1 a {AVAILABILITY_MAX_DAYS} días")
+    doctor_ids = list(dict.fromkeys(doctor_id))
+    if len(doctor_ids) > AVAILABILITY_MAX_DOCTORS:
+        raise HTTPException(status_code=400, detail=f"Máximo {AVAILABILITY_MAX_DOCTORS} doctores por consulta")
+
+    # 1. Seguridad: todos los doctores deben pertenecer a MI clínica
+    found = {row.id for row in db.query(models.User.id).filter(
+        models.User.id.in_(doctor_ids),
+        models.User.clinic_id == current_user.clinic_id
+    )}
+    if len(found) != len(doctor_ids):
+        raise HTTPException(status_code=404, detail="Doctor no encontrado o de otra clínica")
+
+    days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+    generation = availability.clinic_generation(current_user.clinic_id)
+
+    # 2. Caché por (doctor, día)
+    free = {}
+    missing = set()
+    for doc in doctor_ids:
+        for day in days:
+            cached = availability.get_cached_free(generation, doc, day)
+            if cached is None:
+                missing.add(doc)
+            else:
+                free[(doc, day)] = cached
+
+    # 3. Lo que falta: horario + UNA consulta por rango de citas, y barrido
+    if missing:
+        hours_rows = db.query(models.WorkingHours).filter(
+            models.WorkingHours.clinic_id == current_user.clinic_id,
+            (models.WorkingHours.doctor_id == None) | models.WorkingHours.doctor_id.in_(missing)
+        ).all()
+
+        range_start = datetime.combine(date_from, datetime.min.time(), tzinfo=availability.CLINIC_TIMEZONE)
+        range_end = datetime.combine(date_to + timedelta(days=1), datetime.min.time(), tzinfo=availability.CLINIC_TIMEZONE)
+        busy = {doc: [] for doc in missing}
+        for row in db.query(
+            models.Appointment.doctor_id, models.Appointment.start_time, models.Appointment.end_time
+        ).filter(
+            models.Appointment.doctor_id.in_(missing),
+            models.Appointment.status != "CANCELLED",
+            models.Appointment.start_time < range_end,
+            models.Appointment.end_time > range_start
+        ).order_by(models.Appointment.doctor_id, models.Appointment.start_time):
+            busy[row.doctor_id].append((dates.as_utc(row.start_time), dates.as_utc(row.end_time)))
+
+        for doc in missing:
+            hours = availability.resolve_working_hours(hours_rows, doc)
+            for day in days:
+                if (doc, day) in free:
+                    continue
+                day_free = availability.subtract_busy(availability.working_windows(day, hours), busy[doc])
+                availability.cache_free(generation, doc, day, day_free)
+                free[(doc, day)] = day_free
+
+    # 4. Corte en bloques (sólo futuros)
+    now = datetime.now(timezone.utc)
+    slot = timedelta(minutes=slot_minutes)
+    return [
+        {
+            "doctor_id": doc,
+            "slots": [
+                {"start_time": start, "end_time": end}
+                for day in days
+                for start, end in availability.split_slots(free[(doc, day)], slot, now)
+            ]
+        }
+        for doc in doctor_ids
+    ]
+
+# --- AGENDA EN VIVO (SERVER-SENT EVENTS) ---
+AGENDA_STREAM_MAX_DAYS = 31
+AGENDA_HEARTBEAT_SECONDS = 15
+
+@router.get("/stream")
+async def stream_appointments(
+    request: Request,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    doctor_id: Optional[UUID] = None,
+    token: str = Depends(security.oauth2_scheme)
+):
+    """
+    Agenda en vivo por SSE (text/event-stream). Primero un `snapshot` con las
+    citas de la ventana (por defecto: hoy + 7 días) y luego un evento por
+    cambio: `created`, `updated`, `cancelled` o `deleted`. Un `resync` pide
+    al cliente reconectarse para obtener un snapshot nuevo; también se envía
+    (y se cierra el stream) al vencer el token o si el usuario deja de estar
+    activo, lo que se revisa en cada intervalo de heartbeat.
+    """
+    # Sesiones cortas: la conexión SSE dura horas y no debe retener una
+    # conexión del pool (por eso no se usa Depends(get_db))
+    current_user = await run_in_threadpool(_stream_principal, token)
+    expires_at = security.token_expiry(token)
+
+    if date_from is None:
+        today = datetime.now(availability.CLINIC_TIMEZONE).date()
+        date_from = datetime.combine(today, datetime.min.time(), tzinfo=availability.CLINIC_TIMEZONE)
+    date_from = dates.as_utc(date_from)
+    date_to = dates.as_utc(date_to) if date_to else date_from + timedelta(days=7)
+    if date_to <= date_from or (date_to - date_from).days > AGENDA_STREAM_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango debe ser de hasta {AGENDA_STREAM_MAX_DAYS} días")
+
+    # Suscripción ANTES del snapshot: ningún cambio queda entre ambos
+    queue = events.agenda_bus.subscribe(current_user.clinic_id)
+    try:
+        snapshot = await run_in_threadpool(
+            _stream_snapshot, current_user.clinic_id, date_from, date_to, doctor_id
+        )
+    except Exception:
+        events.agenda_bus.unsubscribe(current_user.clinic_id, queue)
+        raise
+
+    async def event_source():
+        # Ids que el cliente tiene en pantalla: si una cita sale de la
+        # ventana igual se le avisa, para que la quite
+        known = {item["id"] for item in snapshot}
+        next_check = time.monotonic() + AGENDA_HEARTBEAT_SECONDS
+        try:
+            yield f"retry: 3000\nevent: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                # La espera no pasa del vencimiento del token
+                wait = AGENDA_HEARTBEAT_SECONDS
+                if expires_at is not None:
+                    wait = max(min(wait, expires_at - time.time()), 0)
+                try:
+                    message = await asyncio.wait_for(queue.get(), wait)
+                except asyncio.TimeoutError:
+                    message = None
+
+                # Token vencido o usuario desactivado: al reconectar recibe 401
+                if expires_at is not None and time.time() >= expires_at:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if time.monotonic() >= next_check:
+                    if not await run_in_threadpool(_stream_still_authorized, token, current_user):
+                        yield "event: resync\ndata: {}\n\n"
+                        return
+                    next_check = time.monotonic() + AGENDA_HEARTBEAT_SECONDS
+
+                if message is None:
+                    yield ": ping\n\n"
+                    continue
+                if message["type"] == "resync":
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                item = _stream_item(message["appointment"])
+                in_view = (
+                    (doctor_id is None or item["doctor_id"] == str(doctor_id))
+                    and date_from <= datetime.fromisoformat(item["start_time"]) < date_to
+                )
+                if not in_view and item["id"] not in known:
+                    continue
+                known.add(item["id"])
+                yield f"event: {message['type']}\ndata: {json.dumps(item)}\n\n"
+        finally:
+            events.agenda_bus.unsubscribe(current_user.clinic_id, queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _stream_principal(token: str) -> schemas.UserPrincipal:
+    with database.SessionLocal() as db:
+        return security.get_current_user(token, db)
+
+def _stream_still_authorized(token: str, principal: schemas.UserPrincipal) -> bool:
+    # Pasa por la caché de identidades: la baja de un usuario la invalida
+    try:
+        current = _stream_principal(token)
+    except HTTPException:
+        return False
+    return current.clinic_id == principal.clinic_id
+
+def _stream_snapshot(clinic_id, date_from: datetime, date_to: datetime, doctor_id) -> list:
+    with database.SessionLocal() as db:
+        query = db.query(models.Appointment).filter(
+            models.Appointment.clinic_id == clinic_id,
+            models.Appointment.deleted_at == None,
+            models.Appointment.start_time >= date_from,
+            models.Appointment.start_time < date_to
+        )
+        if doctor_id:
+            query = query.filter(models.Appointment.doctor_id == doctor_id)
+        return [
+            _stream_item(schemas.AppointmentResponse.model_validate(row).model_dump(mode="json"))
+            for row in query.order_by(models.Appointment.start_time, models.Appointment.id)
+        ]
+
+def _stream_item(row: dict) -> dict:
+    # Mismo formato en snapshot y eventos (fechas ISO en UTC)
+    item = {key: row[key] for key in schemas.AppointmentResponse.model_fields}
+    for key in ("start_time", "end_time"):
+        item[key] = dates.as_utc(datetime.fromisoformat(item[key].replace("Z", "+00:00"))).isoformat()
+    return item
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+import database, schemas, security
+from routers import auth, patients, appointments, public
+
+# --- VARIANTES ASÍNCRONAS DE LOS ROUTERS (DATABASE_ASYNC=true) ---
+# Mismos paths y contratos que los routers sync. La lógica de negocio NO se
+# duplica: cada ruta ejecuta la función sync original con `run_sync`, que
+# corre sobre la conexión asyncpg sin bloquear el event loop. Sólo el
+# bcrypt (CPU) se espera aparte, fuera de la sesión.
+
+auth_router = APIRouter(prefix=auth.router.prefix, tags=auth.router.tags)
+patients_router = APIRouter(prefix=patients.router.prefix, tags=patients.router.tags)
+appointments_router = APIRouter(prefix=appointments.router.prefix, tags=appointments.router.tags)
+public_router = APIRouter(prefix=public.router.prefix, tags=public.router.tags)
+
+routers = [auth_router, patients_router, appointments_router, public_router]
+
+
+# --- AUTH ---
+
+@auth_router.post("/register", response_model=schemas.UserResponse)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    await db.run_sync(lambda session: auth.ensure_email_available(session, user.email))
+    # La conexión vuelve al pool mientras se espera el bcrypt
+    await db.close()
+    hashed_pwd = await security.get_password_hash_async(user.password)
+    return await db.run_sync(lambda session: auth.insert_user(session, user, hashed_pwd))
+
+@auth_router.post("/login", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = await db.run_sync(lambda session: auth.find_user(session, form_data.username))
+    await db.close()
+
+    valid, new_hash = (
+        await security.verify_and_update_password_async(form_data.password, user.hashed_password)
+        if user else (False, None)
+    )
+    if not valid:
+        raise auth.invalid_credentials()
+
+    # Rehash transparente si cambió el costo de bcrypt (BCRYPT_ROUNDS)
+    if new_hash:
+        await db.run_sync(lambda session: auth.save_password_hash(session, user, new_hash))
+
+    return auth.issue_access_token(user)
+
+@auth_router.get("/me", response_model=schemas.UserResponse)
+async def read_users_me(current_user: schemas.UserPrincipal = Depends(security.get_current_user_async)):
+    return current_user
+
+
+# --- PACIENTES ---
+
+@patients_router.post("/", response_model=schemas.PatientResponse, status_code=status.HTTP_201_CREATED)
+async def create_patient(
+    patient: schemas.PatientCreate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user_async)
+):
+    return await db.run_sync(lambda session: patients.create_patient(patient, session, current_user))
+
+@patients_router.get("/", response_model=List[schemas.PatientResponse])
+async def get_patients(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    search: str = Query(None, max_length=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user_async)
+):
+    return await db.run_sync(
+        lambda session: patients.get_patients(skip, limit, search, cursor, session, current_user)
+    )
+
+
+# --- AGENDA ---
+
+@appointments_router.post("/", response_model=schemas.AppointmentResponse, status_code=201)
+async def create_appointment(
+    appointment: schemas.AppointmentCreate,
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await db.run_sync(
+        lambda session: appointments.create_appointment(appointment, current_user, session)
+    )
+
+@appointments_router.get("/", response_model=list[schemas.AppointmentResponse])
+async def get_appointments(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    doctor_id: Optional[UUID] = None,
+    status_filter: Optional[str] = Query(None, alias="status", max_length=20),
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user_async),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await db.run_sync(
+        lambda session: appointments.get_appointments(
+            date_from, date_to, doctor_id, status_filter, cursor, limit, current_user, session
+        )
+    )
+
+
+# --- SITIO PÚBLICO ---
+
+@public_router.get("/sites/{domain}", response_model=schemas.PublicSiteData)
+async def get_public_site_data(domain: str, request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    # Un acierto de caché no toca la sesión (ni el pool)
+    generation = public.site_generation(domain)
+    entry = public.get_cached_site(generation, domain)
+    if entry is None:
+        site, _ = await db.run_sync(lambda session: public.build_public_site(domain, session))
+        entry = public.cache_site(generation, domain, site)
+    return public.site_response(entry, request)
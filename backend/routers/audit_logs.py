@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+import models, database, schemas, security, pagination, responses, dates
+
+router = APIRouter(prefix="/audit", tags=["Auditoría (Ley 20.584)"])
+
+# Ventana por defecto y máxima: acotar created_at permite a Postgres leer
+# sólo las particiones mensuales involucradas (partition pruning)
+AUDIT_QUERY_DEFAULT_DAYS = 30
+AUDIT_QUERY_MAX_DAYS = 366
+
+AUDIT_LIST_COLUMNS = responses.columns_for(models.AuditLog, schemas.AuditLogResponse)
+
+@router.get("/", response_model=List[schemas.AuditLogResponse])
+def get_audit_logs(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[UUID] = None,
+    action: Optional[str] = Query(None, max_length=50),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: schemas.UserPrincipal = Depends(security.require_roles("ADMIN")),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Registro de auditoría de MI clínica, del más reciente al más antiguo.
+    Sólo ADMIN (responsable de cumplimiento). Paginación keyset por
+    (created_at, id) con el header `X-Next-Cursor`, igual que la agenda.
+    """
+    # Fechas sin zona se interpretan como UTC (created_at es timestamptz)
+    date_to = dates.as_utc(date_to) if date_to else datetime.now(timezone.utc)
+    date_from = dates.as_utc(date_from) if date_from else date_to - timedelta(days=AUDIT_QUERY_DEFAULT_DAYS)
+    if date_from >= date_to or (date_to - date_from).days > AUDIT_QUERY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango debe ser de hasta {AUDIT_QUERY_MAX_DAYS} días")
+
+    # Usa ix_audit_logs_clinic_created (o ix_audit_logs_user_created)
+    query = db.query(*AUDIT_LIST_COLUMNS).filter(
+        models.AuditLog.clinic_id == current_user.clinic_id,
+        models.AuditLog.created_at >= date_from,
+        models.AuditLog.created_at < date_to
+    )
+    if user_id:
+        query = query.filter(models.AuditLog.user_id == user_id)
+    if action:
+        query = query.filter(models.AuditLog.action == action)
+
+    if cursor:
+        last_created, last_id = pagination.decode_cursor(cursor, datetime.fromisoformat, UUID)
+        query = query.filter(
+            tuple_(models.AuditLog.created_at, models.AuditLog.id) < tuple_(last_created, last_id)
+        )
+
+    rows = query.order_by(
+        models.AuditLog.created_at.desc(), models.AuditLog.id.desc()
+    ).limit(limit + 1).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return responses.json_rows(rows, schemas.AuditLogResponse, headers)
+
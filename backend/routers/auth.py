@@ -1,60 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import timedelta
-import database, schemas, models, security
-
-router = APIRouter(prefix="/auth", tags=["Auth & Seguridad"])
-
-@router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="El email ya está registrado")
-    
-    hashed_pwd = security.get_password_hash(user.password)
-    
-    new_user = models.User(
-        email=user.email,
-        hashed_password=hashed_pwd,
-        full_name=user.full_name,
-        role=user.role,
-        clinic_id=user.clinic_id
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
-
-@router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    
-    # Verificación de password
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Credenciales incorrectas",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Generación de Token JWT
-    access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    # --- CORRECCIÓN CRÍTICA AQUÍ ---
-    # Antes: "role": user.role.value (Error)
-    # Ahora: "role": user.role       (Correcto, porque es un String)
-    access_token = security.create_access_token(
-        data={
-            "sub": user.email, 
-            "role": user.role, 
-            "clinic_id": str(user.clinic_id)
-        },
-        expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
-
-@router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(security.get_current_user)):
-    return current_user
\ No newline at end of file
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from datetime import timedelta
+import database, schemas, models, security
+
+router = APIRouter(prefix="/auth", tags=["Auth & Seguridad"])
+
+# Login y registro son async: la consulta a `users` corre en el threadpool,
+# la sesión se cierra (conexión de vuelta al pool) y recién entonces se
+# espera el bcrypt, sin ocupar hilo ni conexión mientras hace cola.
+
+@router.post("/register", response_model=schemas.UserResponse)
+async def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    await run_in_threadpool(ensure_email_available, db, user.email)
+    await run_in_threadpool(db.close)
+    hashed_pwd = await security.get_password_hash_async(user.password)
+    return await run_in_threadpool(insert_user, db, user, hashed_pwd)
+
+@router.post("/login", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    user = await run_in_threadpool(find_user, db, form_data.username)
+    await run_in_threadpool(db.close)
+
+    # Verificación de password (en el pool de hashing)
+    valid, new_hash = (
+        await security.verify_and_update_password_async(form_data.password, user.hashed_password)
+        if user else (False, None)
+    )
+    if not valid:
+        raise invalid_credentials()
+
+    token = issue_access_token(user)
+    # Rehash transparente si cambió el costo de bcrypt (BCRYPT_ROUNDS)
+    if new_hash:
+        await run_in_threadpool(save_password_hash, db, user, new_hash)
+    return token
+
+@router.get("/me", response_model=schemas.UserResponse)
+def read_users_me(current_user: schemas.UserPrincipal = Depends(security.get_current_user)):
+    return current_user
+
+# --- PASOS COMPARTIDOS (rutas sync y async) ---
+# El bcrypt queda fuera de estas funciones: se espera con la sesión cerrada.
+
+def find_user(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def ensure_email_available(db: Session, email: str):
+    db_user = db.query(models.User).filter(models.User.email == email).first()
+    if db_user:
+        raise HTTPException(status_code=400, detail="El email ya está registrado")
+
+def insert_user(db: Session, user: schemas.UserCreate, hashed_pwd: str):
+    new_user = models.User(
+        email=user.email,
+        hashed_password=hashed_pwd,
+        full_name=user.full_name,
+        role=user.role,
+        clinic_id=user.clinic_id
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+def save_password_hash(db: Session, user: models.User, new_hash: str):
+    # `user` quedó desasociado al cerrar la sesión antes del bcrypt
+    db.add(user)
+    user.hashed_password = new_hash
+    db.commit()
+
+def invalid_credentials():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Credenciales incorrectas",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue_access_token(user: models.User):
+    # Generación de Token JWT
+    access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
+    
+    # --- CORRECCIÓN CRÍTICA AQUÍ ---
+    # Antes: "role": user.role.value (Error)
+    # Ahora: "role": user.role       (Correcto, porque es un String)
+    access_token = security.create_access_token(
+        data={
+            "sub": user.email, 
+            "role": user.role, 
+            "clinic_id": str(user.clinic_id)
+        },
+        expires_delta=access_token_expires
+    )
+    
+    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
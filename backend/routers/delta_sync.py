@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from typing import Optional
+from uuid import UUID
+import models, database, schemas, security, pagination, sync
+
+router = APIRouter(prefix="/sync", tags=["Sincronización"])
+
+# Orden global de la página: (change_seq, tipo, id). Los cambios de una misma
+# transacción comparten change_seq, así que el tipo y el id desempatan.
+SYNC_KINDS = (
+    ("appointment", models.Appointment),
+    ("patient", models.Patient),
+)
+
+@router.get("/", response_model=schemas.SyncChanges)
+def get_changes(
+    since: Optional[str] = Query(None, description="Cursor `next_cursor` de la respuesta anterior (vacío = todo)"),
+    limit: int = Query(500, ge=1, le=2000),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Cambios de citas y pacientes de MI clínica posteriores a `since`.
+    El cliente guarda `next_cursor` y repite mientras `has_more` sea true;
+    una resincronización sólo transfiere lo que cambió desde entonces.
+    """
+    if since:
+        cursor = pagination.decode_cursor(since, int, str, UUID)
+    else:
+        cursor = None
+
+    # Cada tabla aporta hasta limit+1 filas posteriores al cursor (índice
+    # clinic_id + change_seq) y se mezclan en el orden global. Lo de
+    # transacciones todavía en curso queda para la próxima llamada.
+    horizon = sync.visible_horizon(db)
+    changes = []
+    for kind, model in SYNC_KINDS:
+        query = db.query(model).filter(model.clinic_id == current_user.clinic_id)
+        if horizon is not None:
+            query = query.filter(model.change_seq < horizon)
+        if cursor:
+            query = query.filter(_after_cursor(kind, model, *cursor))
+        rows = query.order_by(model.change_seq, model.id).limit(limit + 1).all()
+        changes.extend((row.change_seq, kind, str(row.id), row) for row in rows)
+    changes.sort(key=lambda change: change[:3])
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    result = {
+        "appointments": [], "patients": [],
+        "deleted_appointments": [], "deleted_patients": [],
+        "has_more": has_more,
+        "next_cursor": pagination.encode_cursor(*changes[-1][:3]) if changes else (since or pagination.encode_cursor(0, "", UUID(int=0))),
+    }
+    for _, kind, _, row in changes:
+        if row.deleted_at is not None:
+            result[f"deleted_{kind}s"].append(row.id)
+        else:
+            result[f"{kind}s"].append(row)
+    return result
+
+def _after_cursor(kind: str, model, last_seq: int, last_kind: str, last_id: UUID):
+    """Filas de `model` cuyo (change_seq, kind, id) es mayor que el cursor."""
+    if kind > last_kind:
+        return model.change_seq >= last_seq
+    if kind < last_kind:
+        return model.change_seq > last_seq
+    return or_(
+        model.change_seq > last_seq,
+        and_(model.change_seq == last_seq, model.id > last_id)
+    )
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query, Response, status
+from typing import Literal
+import database, schemas, security
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnóstico"])
+
+@router.get("/slow-queries", response_model=schemas.SlowQueryReport)
+def get_slow_queries(
+    order_by: Literal["total", "max", "calls"] = "total",
+    limit: int = Query(20, ge=1, le=100),
+    current_user: schemas.UserPrincipal = Depends(security.require_platform_operator)
+):
+    """
+    Sentencias sobre SLOW_QUERY_MS vistas por ESTE proceso, agrupadas por
+    huella, con el último plan EXPLAIN (ANALYZE, BUFFERS) muestreado.
+    El SQL y los planes no llevan valores de pacientes (ver slow_queries.py),
+    pero la tabla mezcla todas las clínicas: sólo PLATFORM_OPERATOR_EMAILS.
+    """
+    log = database.slow_query_log
+    return {
+        "threshold_ms": log.threshold * 1000,
+        "explain_enabled": log.explain is not None,
+        "queries": log.top(limit, order_by),
+    }
+
+@router.delete("/slow-queries", status_code=204)
+def reset_slow_queries(
+    current_user: schemas.UserPrincipal = Depends(security.require_platform_operator)
+):
+    """Vacía la tabla (ej. después de desplegar un índice)."""
+    database.slow_query_log.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
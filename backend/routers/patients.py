@@ -1,82 +1,377 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import json
-import models, database, schemas, security
-
-router = APIRouter(prefix="/patients", tags=["Gestión de Pacientes"])
-
-@router.post("/", response_model=schemas.PatientResponse, status_code=status.HTTP_201_CREATED)
-def create_patient(
-    patient: schemas.PatientCreate,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_user)
-):
-    """
-    Registra un nuevo paciente en la clínica del usuario actual.
-    Cumplimiento: Ley 20.584 (Trazabilidad) y OWASP BOLA.
-    """
-    # 1. Validación de Negocio: Evitar RUT duplicado EN ESTA clínica
-    existing_patient = db.query(models.Patient).filter(
-        models.Patient.rut == patient.rut,
-        models.Patient.clinic_id == current_user.clinic_id
-    ).first()
-    
-    if existing_patient:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"El paciente con RUT {patient.rut} ya existe en su clínica."
-        )
-
-    # 2. Creación del Paciente (Aislamiento Multi-tenant)
-    new_patient = models.Patient(
-        **patient.model_dump(),
-        clinic_id=current_user.clinic_id 
-    )
-    db.add(new_patient)
-    
-    # 3. Auditoría Forense (Ley 20.584 - Trazabilidad)
-    # Registramos QUIÉN creó el paciente y CUÁNDO.
-    audit_log = models.AuditLog(
-        action="CREATE_PATIENT",
-        user_id=current_user.id,
-        clinic_id=current_user.clinic_id,
-        details=json.dumps({"rut": patient.rut, "name": patient.full_name}),
-        ip_address="REQUEST_IP" 
-    )
-    db.add(audit_log)
-
-    # 4. Commit Atómico
-    try:
-        db.commit()
-        db.refresh(new_patient)
-        return new_patient
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Error al registrar paciente")
-
-@router.get("/", response_model=List[schemas.PatientResponse])
-def get_patients(
-    skip: int = 0, 
-    limit: int = 100,
-    search: str = None,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_user)
-):
-    """
-    Obtiene la lista de pacientes.
-    Seguridad: Solo devuelve pacientes de la clínica del usuario (BOLA Protection).
-    """
-    query = db.query(models.Patient).filter(
-        models.Patient.clinic_id == current_user.clinic_id,
-        models.Patient.is_active == True
-    )
-
-    # Filtro de búsqueda simple (por nombre o RUT)
-    if search:
-        query = query.filter(
-            (models.Patient.full_name.ilike(f"%{search}%")) | 
-            (models.Patient.rut.ilike(f"%{search}%"))
-        )
-
-    return query.offset(skip).limit(limit).all()
\ No newline at end of file
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy import Float, and_, cast, func, insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Iterator, List, Optional
+from uuid import UUID
+import csv
+import io
+import json
+import os
+import re
+import unicodedata
+import models, database, schemas, security, pagination, audit, sync, responses, ruts, replicas
+
+router = APIRouter(prefix="/patients", tags=["Gestión de Pacientes"])
+
+@router.post("/", response_model=schemas.PatientResponse, status_code=status.HTTP_201_CREATED)
+def create_patient(
+    patient: schemas.PatientCreate,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user)
+):
+    """
+    Registra un nuevo paciente en la clínica del usuario actual.
+    Cumplimiento: Ley 20.584 (Trazabilidad) y OWASP BOLA.
+    """
+    # 1. Validación de Negocio: Evitar RUT duplicado EN ESTA clínica
+    # (por cuerpo entero: "11.111.111-1" y "11111111-1" son el mismo RUT)
+    rut_body, _ = ruts.parse_rut(patient.rut)
+    existing_patient = db.query(models.Patient.id).filter(
+        models.Patient.rut_body == rut_body,
+        models.Patient.clinic_id == current_user.clinic_id
+    ).first()
+    
+    if existing_patient:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"El paciente con RUT {patient.rut} ya existe en su clínica."
+        )
+
+    # 2. Creación del Paciente (Aislamiento Multi-tenant)
+    new_patient = models.Patient(
+        **patient.model_dump(),
+        clinic_id=current_user.clinic_id 
+    )
+    db.add(new_patient)
+    
+    # 3. Auditoría Forense (Ley 20.584 - Trazabilidad)
+    # Registramos QUIÉN creó el paciente y CUÁNDO.
+    audit.record(
+        db,
+        action="CREATE_PATIENT",
+        user_id=current_user.id,
+        clinic_id=current_user.clinic_id,
+        details={"rut": patient.rut, "name": patient.full_name}
+    )
+
+    # 4. Commit Atómico
+    try:
+        db.commit()
+        db.refresh(new_patient)
+        return new_patient
+    except IntegrityError:
+        # Dos altas simultáneas del mismo RUT: las frena el índice único
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"El paciente con RUT {patient.rut} ya existe en su clínica."
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Error al registrar paciente")
+
+@router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_patient(
+    patient_id: UUID,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user)
+):
+    """
+    Borrado lógico (la ficha clínica se conserva, Ley 20.584): el paciente
+    deja de listarse y queda como lápida para GET /sync.
+    """
+    patient = db.query(models.Patient).filter(
+        models.Patient.id == patient_id,
+        models.Patient.clinic_id == current_user.clinic_id,
+        models.Patient.deleted_at == None
+    ).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Paciente no encontrado")
+
+    patient.is_active = False
+    patient.deleted_at = func.now()
+    audit.record(
+        db,
+        action="DELETE_PATIENT",
+        user_id=current_user.id,
+        clinic_id=current_user.clinic_id,
+        details={"rut": patient.rut}
+    )
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# --- BÚSQUEDA DE PACIENTES ---
+# "trigram": índices GIN pg_trgm + unaccent y prefijo de RUT normalizado.
+# "basic": ILIKE '%term%' (para bases sin las extensiones; no usa índices).
+PATIENT_SEARCH_MODE = os.getenv("PATIENT_SEARCH_MODE", "trigram")
+
+# Un término compuesto sólo por dígitos, puntos, guión y K se trata como RUT
+RUT_TERM_PATTERN = re.compile(r"^[0-9.\-kK ]+$")
+
+# El listado lee sólo las columnas de PatientResponse (sin hidratar el ORM)
+PATIENT_LIST_COLUMNS = responses.columns_for(models.Patient, schemas.PatientResponse)
+
+@router.get("/", response_model=List[schemas.PatientResponse])
+def get_patients(
+    skip: int = 0, 
+    limit: int = Query(100, ge=1, le=500),
+    search: str = Query(None, max_length=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(replicas.get_read_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user)
+):
+    """
+    Obtiene la lista de pacientes.
+    Seguridad: Solo devuelve pacientes de la clínica del usuario (BOLA Protection).
+    Con `search` los resultados vienen ordenados por relevancia. Paginación
+    keyset: el header `X-Next-Cursor` trae el `?cursor=` de la página siguiente
+    (`skip` se mantiene por compatibilidad, pero escanea y descarta filas).
+    """
+    query = db.query(*PATIENT_LIST_COLUMNS).filter(
+        models.Patient.clinic_id == current_user.clinic_id,
+        models.Patient.is_active == True
+    )
+
+    search = (search or "").strip()
+    exact_rut_body = _exact_rut_body(search)
+    if exact_rut_body is not None:
+        # RUT completo con DV válido: igualdad sobre el índice (clinic_id, rut_body)
+        query, sort_key = _name_order(query.filter(models.Patient.rut_body == exact_rut_body), cursor)
+    elif search and PATIENT_SEARCH_MODE == "trigram":
+        if RUT_TERM_PATTERN.match(search) and any(c.isdigit() for c in search):
+            query, sort_key = _rut_prefix_search(query, search, cursor)
+        else:
+            query, sort_key = _name_search(query, search, cursor)
+    else:
+        if search:
+            # Filtro de búsqueda simple (por nombre o RUT)
+            query = query.filter(
+                (models.Patient.full_name.ilike(f"%{search}%")) | 
+                (models.Patient.rut.ilike(f"%{search}%"))
+            )
+        query, sort_key = _name_order(query, cursor)
+
+    if skip:
+        query = query.offset(skip)
+
+    # Pedimos una fila extra para saber si existe una página siguiente
+    rows = query.limit(limit + 1).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(*sort_key(rows[-1]))
+
+    return responses.json_rows(rows, schemas.PatientResponse, headers)
+
+def _normalize_name_term(term: str) -> str:
+    # Mismo criterio que f_unaccent(lower(...)) en la BD
+    decomposed = unicodedata.normalize("NFKD", term.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def _exact_rut_body(term: str) -> Optional[int]:
+    # Sólo con guión: "12345678" también podría ser el prefijo de otro RUT
+    if "-" not in term or not RUT_TERM_PATTERN.match(term):
+        return None
+    try:
+        return ruts.parse_rut(term)[0]
+    except ValueError:
+        return None
+
+def _rut_prefix_search(query, term: str, cursor: Optional[str]):
+    # "12.345" -> prefijo "12345" sobre el RUT normalizado (índice btree)
+    prefix = re.sub(r"[^0-9K]", "", term.upper())
+    query = query.filter(models.patient_rut_key.startswith(prefix, autoescape=True))
+    if cursor:
+        last_key, last_id = pagination.decode_cursor(cursor, str, UUID)
+        query = query.filter(tuple_(models.patient_rut_key, models.Patient.id) > tuple_(last_key, last_id))
+    query = query.add_columns(models.patient_rut_key.label("sort_key")).order_by(models.patient_rut_key, models.Patient.id)
+    return query, lambda row: (row.sort_key, row.id)
+
+def _name_search(query, term: str, cursor: Optional[str]):
+    # Coincidencia por subcadena o por similitud de palabra (tolera errores
+    # de tipeo), ambas resueltas por el índice GIN de trigramas.
+    normalized = _normalize_name_term(term)
+    # word_similarity devuelve real (float4); en el cursor viaja como float de
+    # Python (double). Se ordena y compara en double precision para que el
+    # valor del cursor sea exactamente el de la fila y el empate no se repita.
+    rank = cast(func.word_similarity(normalized, models.patient_name_key), Float(precision=53))
+    query = query.filter(or_(
+        models.patient_name_key.contains(normalized, autoescape=True),
+        models.patient_name_key.op("%>")(normalized)
+    ))
+    if cursor:
+        last_rank, last_id = pagination.decode_cursor(cursor, float, UUID)
+        query = query.filter(or_(
+            rank < cast(last_rank, Float(precision=53)),
+            and_(rank == cast(last_rank, Float(precision=53)), models.Patient.id > last_id)
+        ))
+    query = query.add_columns(rank.label("sort_key")).order_by(rank.desc(), models.Patient.id)
+    return query, lambda row: (row.sort_key, row.id)
+
+def _name_order(query, cursor: Optional[str]):
+    if cursor:
+        last_name, last_id = pagination.decode_cursor(cursor, str, UUID)
+        query = query.filter(tuple_(models.Patient.full_name, models.Patient.id) > tuple_(last_name, last_id))
+    query = query.order_by(models.Patient.full_name, models.Patient.id)
+    return query, lambda row: (row.full_name, row.id)
+
+# --- IMPORTACIÓN MASIVA (ONBOARDING DE CLÍNICAS) ---
+# Migrar 20-50k pacientes por POST /patients/ cuesta 1 SELECT + 2 INSERT + 1
+# COMMIT por fila. Aquí se procesa el archivo en streaming y por bloques:
+# 1 SELECT de duplicados, 1 INSERT multi-fila y 1 AuditLog resumido por bloque.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", 1000))
+
+PATIENT_IMPORT_FIELDS = ("full_name", "rut", "email", "phone", "address")
+
+@router.post("/bulk", response_model=schemas.BulkImportReport)
+def bulk_import_patients(
+    file: UploadFile = File(..., description="CSV con encabezado o NDJSON (un paciente por línea)"),
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserPrincipal = Depends(security.get_current_user)
+):
+    """
+    Importación masiva de pacientes a la clínica del usuario actual.
+    Las filas inválidas o con RUT ya existente se informan en el reporte
+    y no detienen la importación. Cada bloque se confirma por separado.
+    """
+    if file_format is None:
+        name = (file.filename or "").lower()
+        is_ndjson = name.endswith((".ndjson", ".jsonl")) or "ndjson" in (file.content_type or "")
+        file_format = "ndjson" if is_ndjson else "csv"
+
+    # El archivo ya está en un SpooledTemporaryFile (disco si es grande):
+    # lo leemos línea a línea sin cargarlo completo en memoria.
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = _iter_ndjson(stream) if file_format == "ndjson" else _iter_csv(stream)
+
+    report = {"total_rows": 0, "inserted": 0, "duplicates": 0, "failed": 0, "errors": []}
+    seen_ruts = set() # Duplicados dentro del mismo archivo
+    chunk = []
+
+    for row_number, raw in rows:
+        report["total_rows"] += 1
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            patient = schemas.PatientCreate.model_validate(_clean_row(raw))
+        except (ValidationError, ValueError) as e:
+            report["failed"] += 1
+            _report_error(report, row_number, _raw_rut(raw), _error_message(e))
+            continue
+
+        if patient.rut in seen_ruts:
+            report["duplicates"] += 1
+            _report_error(report, row_number, patient.rut, "RUT repetido dentro del archivo")
+            continue
+        seen_ruts.add(patient.rut)
+
+        chunk.append((row_number, patient))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            _import_chunk(db, chunk, current_user, report)
+            chunk = []
+
+    if chunk:
+        _import_chunk(db, chunk, current_user, report)
+
+    return report
+
+def _iter_csv(stream) -> Iterator:
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel # Por defecto: coma
+    for row_number, row in enumerate(csv.DictReader(stream, dialect=dialect), start=1):
+        yield row_number, row
+
+def _iter_ndjson(stream) -> Iterator:
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("Cada línea debe ser un objeto JSON")
+            yield row_number, data
+        except ValueError as e:
+            yield row_number, ValueError(f"JSON inválido: {e}")
+
+def _clean_row(raw: dict) -> dict:
+    # Las celdas vacías de un CSV llegan como "": se tratan como ausentes
+    cleaned = {}
+    for field in PATIENT_IMPORT_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None:
+            cleaned[field] = value
+    return cleaned
+
+def _raw_rut(raw) -> Optional[str]:
+    return raw.get("rut") if isinstance(raw, dict) else None
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+def _report_error(report: dict, row_number: int, rut: Optional[str], message: str):
+    if len(report["errors"]) < BULK_MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row_number, "rut": rut, "error": message})
+
+def _import_chunk(db: Session, chunk: list, current_user: schemas.UserPrincipal, report: dict):
+    # 1. Duplicados contra la BD: una sola consulta por bloque (índice clinic_id, rut_body)
+    keys = ruts.parse_many([patient.rut for _, patient in chunk])
+    existing = set(db.execute(
+        select(models.Patient.rut_body).where(
+            models.Patient.clinic_id == current_user.clinic_id,
+            models.Patient.rut_body.in_([body for body, _ in keys])
+        )
+    ).scalars())
+
+    to_insert = []
+    for (row_number, patient), (rut_body, rut_dv) in zip(chunk, keys):
+        if rut_body in existing:
+            report["duplicates"] += 1
+            _report_error(report, row_number, patient.rut, f"El paciente con RUT {patient.rut} ya existe en su clínica.")
+            continue
+        # El INSERT de Core no pasa por el ORM: las claves del RUT van explícitas
+        to_insert.append({
+            **patient.model_dump(),
+            "rut_body": rut_body,
+            "rut_dv": rut_dv,
+            "clinic_id": current_user.clinic_id
+        })
+
+    if not to_insert:
+        return
+
+    # 2. INSERT multi-fila (executemany) + 3. Auditoría resumida del bloque
+    try:
+        change_seq = sync.next_change_seq(db, current_user.clinic_id)
+        db.execute(insert(models.Patient), [{**row, "change_seq": change_seq} for row in to_insert])
+        audit.record(
+            db,
+            action="BULK_IMPORT_PATIENTS",
+            user_id=current_user.id,
+            clinic_id=current_user.clinic_id,
+            details={
+                "count": len(to_insert),
+                "first_row": chunk[0][0],
+                "last_row": chunk[-1][0],
+                "ruts": [row["rut"] for row in to_insert]
+            }
+        )
+        db.commit()
+        report["inserted"] += len(to_insert)
+    except Exception:
+        db.rollback()
+        report["failed"] += len(to_insert)
+        _report_error(report, chunk[0][0], None, f"Error al registrar el bloque de filas {chunk[0][0]}-{chunk[-1][0]}")
@@ -1,53 +1,190 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
-import database, models, schemas
-
-router = APIRouter(
-    prefix="/public", 
-    tags=["Sitio Público (Generador)"]
-)
-
-@router.get("/sites/{domain}", response_model=schemas.PublicSiteData)
-def get_public_site_data(domain: str, db: Session = Depends(database.get_db)):
-    """
-    Este endpoint es el corazón del generador de sitios.
-    Es PÚBLICO y devuelve toda la data necesaria para renderizar
-    el sitio web de un cliente específico.
-    """
-    # === CORRECCIÓN CRÍTICA INICIA AQUÍ ===
-
-    # 1. Buscamos primero en la tabla correcta: website_configs
-    website_config = db.query(models.WebsiteConfig).filter(models.WebsiteConfig.domain == domain).first()
-
-    if not website_config:
-        raise HTTPException(status_code=404, detail="Sitio no encontrado")
-
-    # 2. Una vez encontrada la configuración, obtenemos la clínica asociada
-    #    usando la relación que ya definimos en models.py.
-    #    Usamos 'options' para cargar las relaciones de 'users' de forma eficiente.
-    clinic = db.query(models.Clinic).options(
-        joinedload(models.Clinic.users)
-    ).filter(models.Clinic.id == website_config.clinic_id).first()
-
-    if not clinic:
-        # Este error es improbable si la base de datos es consistente, pero es una buena práctica de seguridad
-        raise HTTPException(status_code=500, detail="Inconsistencia de datos: Configuración de sitio sin clínica asociada.")
-
-    # === CORRECCIÓN CRÍTICA TERMINA AQUÍ ===
-
-
-    # Filtramos para obtener solo los doctores
-    doctors_list = [user for user in clinic.users if user.role == 'DENTIST']
-
-    # Construimos la respuesta
-    # Nota: ahora usamos 'website_config' para el config, y 'clinic' para el resto
-    response_data = schemas.PublicSiteData(
-        clinic_name=clinic.name,
-        address=clinic.address,
-        phone=clinic.phone,
-        config=website_config, # Usamos el objeto que encontramos
-        doctors=doctors_list
-    )
-    
-    return response_data
\ No newline at end of file
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import and_, event, inspect, select
+from sqlalchemy.orm import Session
+import hashlib
+import os
+import uuid
+import models, schemas, replicas
+from cache import app_cache
+
+router = APIRouter(
+    prefix="/public",
+    tags=["Sitio Público (Generador)"]
+)
+
+# --- CACHÉ DEL SITIO PÚBLICO ---
+# Es el endpoint con más tráfico (cada visita a cada sitio) y los datos
+# cambian muy rara vez. Guardamos el JSON ya serializado + su ETag por dominio
+# y lo invalidamos cuando se escribe WebsiteConfig, Clinic o un DENTIST.
+# Cada dominio tiene una "generación" que forma parte de la clave (mismo
+# esquema que availability.clinic_generation): se lee ANTES de armar el
+# sitio, así un request que leyó datos justo antes de un COMMIT los guarda
+# bajo la generación vieja, que ya nadie consulta.
+PUBLIC_SITE_CACHE_TTL = int(os.getenv("PUBLIC_SITE_CACHE_TTL", 300))
+PUBLIC_SITE_MAX_AGE = int(os.getenv("PUBLIC_SITE_MAX_AGE", 60))
+
+def _generation_key(domain: str) -> str:
+    return f"public_site:gen:{domain}"
+
+def site_generation(domain: str) -> str:
+    key = _generation_key(domain)
+    generation = app_cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex[:8]
+        app_cache.set(key, generation, PUBLIC_SITE_CACHE_TTL * 12)
+    return generation
+
+def _site_key(generation: str, domain: str) -> str:
+    return f"public_site:{generation}:{domain}"
+
+@router.get("/sites/{domain}", response_model=schemas.PublicSiteData)
+def get_public_site_data(domain: str, request: Request, db: Session = Depends(replicas.get_read_db)):
+    """
+    Este endpoint es el corazón del generador de sitios.
+    Es PÚBLICO y devuelve toda la data necesaria para renderizar
+    el sitio web de un cliente específico.
+    Soporta caché HTTP: ETag fuerte + If-None-Match (304).
+    """
+    generation = site_generation(domain)
+    entry = get_cached_site(generation, domain)
+    if entry is None:
+        site = build_public_site(domain, db)[0]
+        entry = cache_site(generation, domain, site)
+    return site_response(entry, request)
+
+def build_public_site(domain: str, db: Session):
+    """
+    Arma PublicSiteData desde la BD en UN solo round trip.
+    Retorna (sitio, clinic_id).
+    """
+    # website_configs -> clinics -> users (sólo DENTIST activos), seleccionando
+    # únicamente las columnas públicas: nunca se hidratan admins, recepcionistas
+    # ni columnas sensibles como hashed_password.
+    rows = db.execute(
+        select(
+            models.WebsiteConfig.logo_url,
+            models.WebsiteConfig.primary_color,
+            models.WebsiteConfig.welcome_text,
+            models.Clinic.id.label("clinic_id"),
+            models.Clinic.name.label("clinic_name"),
+            models.Clinic.address,
+            models.Clinic.phone,
+            models.User.full_name.label("doctor_name"),
+        )
+        .select_from(models.WebsiteConfig)
+        .outerjoin(models.Clinic, models.Clinic.id == models.WebsiteConfig.clinic_id)
+        .outerjoin(models.User, and_(
+            models.User.clinic_id == models.Clinic.id,
+            models.User.role == "DENTIST",
+            models.User.is_active == True
+        ))
+        .where(models.WebsiteConfig.domain == domain)
+        .order_by(models.User.full_name)
+    ).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Sitio no encontrado")
+
+    first = rows[0]
+    if first.clinic_id is None:
+        # Este error es improbable si la base de datos es consistente, pero es una buena práctica de seguridad
+        raise HTTPException(status_code=500, detail="Inconsistencia de datos: Configuración de sitio sin clínica asociada.")
+
+    # Construimos la respuesta (una fila por doctor; sin doctores llega una fila con NULL)
+    response_data = schemas.PublicSiteData(
+        clinic_name=first.clinic_name,
+        address=first.address,
+        phone=first.phone,
+        config=schemas.WebsiteConfigPublic(
+            logo_url=first.logo_url,
+            primary_color=first.primary_color,
+            welcome_text=first.welcome_text
+        ),
+        doctors=[
+            schemas.DoctorPublicInfo(full_name=row.doctor_name)
+            for row in rows if row.doctor_name is not None
+        ]
+    )
+
+    return response_data, first.clinic_id
+
+def get_cached_site(generation: str, domain: str):
+    """Retorna (etag, body) desde la caché, o None si no está."""
+    cached = app_cache.get(_site_key(generation, domain))
+    if cached is None:
+        return None
+    etag, body = cached.split("\n", 1)
+    return etag, body
+
+def cache_site(generation: str, domain: str, site: schemas.PublicSiteData):
+    body = site.model_dump_json()
+    etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+    # Recién invalidado: pudo leerse de una réplica atrasada (ver replicas.py)
+    if not replicas.fenced(_generation_key(domain)):
+        app_cache.set(_site_key(generation, domain), f"{etag}\n{body}", PUBLIC_SITE_CACHE_TTL)
+    return etag, body
+
+def site_response(entry, request: Request) -> Response:
+    etag, body = entry
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PUBLIC_SITE_MAX_AGE}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def invalidate_public_site(*domains: str):
+    """Renueva la generación de esos dominios: sus entradas dejan de valer."""
+    keys = [_generation_key(domain) for domain in domains if domain]
+    # Antes de borrar: que nadie recachee lo leído de una réplica atrasada
+    replicas.fence(*keys)
+    app_cache.delete(*keys)
+
+# --- INVALIDACIÓN AUTOMÁTICA ---
+# Se anotan los dominios afectados durante el flush y se invalidan recién
+# tras el COMMIT: así otro request no vuelve a cachear datos sin confirmar.
+# Un cambio a Clinic o a un DENTIST sólo trae la clínica: su dominio se busca
+# en la misma transacción (cambios raros, un SELECT por flush).
+
+def _affected_sites(obj):
+    """Retorna (dominios, clinic_ids) afectados por el cambio de obj."""
+    state = inspect(obj)
+    if isinstance(obj, models.WebsiteConfig):
+        return [obj.domain, *state.attrs.domain.history.deleted], []
+    if isinstance(obj, models.Clinic):
+        return [], [obj.id]
+    if isinstance(obj, models.User):
+        roles = {obj.role, *state.attrs.role.history.deleted}
+        if "DENTIST" in roles:
+            return [], [obj.clinic_id, *state.attrs.clinic_id.history.deleted]
+    return [], []
+
+@event.listens_for(Session, "after_flush")
+def _collect_public_site_changes(session, flush_context):
+    pending = session.info.setdefault("public_site_invalidations", set())
+    clinic_ids = set()
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        domains, clinics = _affected_sites(obj)
+        pending.update(domain for domain in domains if domain)
+        clinic_ids.update(clinic_id for clinic_id in clinics if clinic_id)
+    if clinic_ids:
+        # Por la conexión: un SELECT de la sesión dispararía otro flush
+        pending.update(session.connection().execute(
+            select(models.WebsiteConfig.domain)
+            .where(models.WebsiteConfig.clinic_id.in_(clinic_ids), models.WebsiteConfig.domain.isnot(None))
+        ).scalars())
+
+@event.listens_for(Session, "after_commit")
+def _flush_public_site_invalidations(session):
+    domains = session.info.pop("public_site_invalidations", set())
+    if domains:
+        invalidate_public_site(*domains)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_public_site_invalidations(session, previous_transaction):
+    # Un SAVEPOINT revertido no descarta lo pendiente de la transacción externa
+    if previous_transaction.nested:
+        return
+    session.info.pop("public_site_invalidations", None)
@@ -0,0 +1,141 @@
+from functools import lru_cache
+import os
+import re
+
+# --- RUT CANÓNICO (CUERPO ENTERO + DÍGITO VERIFICADOR) ---
+# "11.111.111-1", "11111111-1" y " 111111111" son el mismo RUT. La BD guarda
+# además del texto el cuerpo como entero (patients.rut_body, indexado junto a
+# clinic_id) y el DV aparte: la igualdad se resuelve con un índice btree de
+# enteros sin importar cómo se escribió. La forma de presentación sigue
+# siendo la de siempre: 12345678-5.
+
+# Valores distintos que se recuerdan ya validados (payloads repetidos,
+# reintentos, el mismo paciente en cada cita)
+RUT_CACHE_SIZE = int(os.getenv("RUT_CACHE_SIZE", 65536))
+
+_RUT_FORMAT = re.compile(r"([0-9]{1,8})([0-9K])")
+_RUT_SEPARATORS = str.maketrans("", "", ".-")
+_DV_BY_REMAINDER = "0K987654321" # 11 - (suma % 11), con 11 -> 0 y 10 -> K
+
+# Módulo 11 sin recorrer dígitos: la suma ponderada de los 4 dígitos bajos
+# (pesos 2,3,4,5) y de los 4 altos (pesos 6,7,2,3) se precalcula por tramo.
+# (Aritmética directa por dígito: se arma en cada arranque de la API.)
+def _weighted_sums(weights: tuple) -> list:
+    w0, w1, w2, w3 = weights
+    return [
+        d3 * w3 + d2 * w2 + d1 * w1 + d0 * w0
+        for d3 in range(10) for d2 in range(10) for d1 in range(10) for d0 in range(10)
+    ]
+
+_LOW_SUMS = _weighted_sums((2, 3, 4, 5))
+_HIGH_SUMS = _weighted_sums((6, 7, 2, 3))
+
+def check_digit(body: int) -> str:
+    """Dígito verificador (Módulo 11) de un cuerpo de hasta 8 dígitos."""
+    high, low = divmod(body, 10000)
+    return _DV_BY_REMAINDER[(_HIGH_SUMS[high] + _LOW_SUMS[low]) % 11]
+
+@lru_cache(maxsize=RUT_CACHE_SIZE)
+def parse_rut(rut: str) -> tuple:
+    """
+    "12.345.678-5" -> (12345678, "5"). Lanza ValueError con el mismo
+    mensaje que ve el usuario si el formato o el dígito verificador fallan.
+    """
+    if not rut:
+        raise ValueError("El RUT es obligatorio")
+    match = _RUT_FORMAT.fullmatch(rut.translate(_RUT_SEPARATORS).upper().strip())
+    if not match:
+        raise ValueError("Formato de RUT inválido")
+    body, dv = int(match.group(1)), match.group(2)
+    if check_digit(body) != dv:
+        raise ValueError("RUT inválido (Dígito verificador incorrecto)")
+    return body, dv
+
+def format_rut(body: int, dv: str) -> str:
+    return f"{body}-{dv}"
+
+def normalize_rut(rut: str) -> str:
+    """Forma canónica (12345678-5) de un RUT válido."""
+    return format_rut(*parse_rut(rut))
+
+def parse_many(values) -> list:
+    """
+    Valida un arreglo de RUTs (importaciones, deduplicación, backfill).
+    Cada valor distinto se procesa una sola vez. Retorna, en el mismo orden,
+    (cuerpo, dv) o None para los inválidos.
+    """
+    parsed = {}
+    for value in set(values):
+        try:
+            parsed[value] = parse_rut(value)
+        except (ValueError, TypeError):
+            parsed[value] = None
+    return [parsed[value] for value in values]
+
+# --- BACKFILL DE CLAVES (PACIENTES EXISTENTES) ---
+# Agrega las columnas si faltan, completa rut_body/rut_dv por bloques
+# (keyset por id, un UPDATE executemany por bloque) y al final crea el índice
+# (CONCURRENTLY en Postgres: no bloquea las escrituras de las clínicas).
+
+RUT_BACKFILL_BATCH = int(os.getenv("RUT_BACKFILL_BATCH", 5000))
+
+def backfill(batch_size: int = RUT_BACKFILL_BATCH) -> dict:
+    from sqlalchemy import bindparam, inspect, select, text, update
+    import models, database
+
+    engine = database.engine
+    columns = {c["name"] for c in inspect(engine).get_columns("patients")}
+    with engine.begin() as conn:
+        if "rut_body" not in columns:
+            conn.execute(text("ALTER TABLE patients ADD COLUMN rut_body INTEGER"))
+        if "rut_dv" not in columns:
+            conn.execute(text("ALTER TABLE patients ADD COLUMN rut_dv VARCHAR(1)"))
+
+    patients = models.Patient.__table__
+    stmt = (
+        update(patients)
+        .where(patients.c.id == bindparam("b_id"))
+        .values(rut_body=bindparam("b_body"), rut_dv=bindparam("b_dv"))
+    )
+    report = {"updated": 0, "invalid": 0, "invalid_ids": []}
+    last_id = None
+    while True:
+        query = select(patients.c.id, patients.c.rut).where(patients.c.rut_body.is_(None))
+        if last_id is not None:
+            query = query.where(patients.c.id > last_id)
+        with engine.begin() as conn:
+            rows = conn.execute(query.order_by(patients.c.id).limit(batch_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            params = []
+            for row, parsed in zip(rows, parse_many([row.rut for row in rows])):
+                if parsed is None:
+                    report["invalid"] += 1
+                    if len(report["invalid_ids"]) < 100:
+                        report["invalid_ids"].append(str(row.id))
+                    continue
+                params.append({"b_id": row.id, "b_body": parsed[0], "b_dv": parsed[1]})
+            if params:
+                conn.execute(stmt, params)
+                report["updated"] += len(params)
+
+    index = next(i for i in patients.indexes if i.name == "uq_patients_clinic_rut_body")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON patients (clinic_id, rut_body)"
+            ))
+    else:
+        index.create(engine, checkfirst=True)
+    return report
+
+if __name__ == "__main__":
+    # Uso: python ruts.py backfill [--batch N]
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Claves canónicas de RUT (patients.rut_body / rut_dv)")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch", type=int, default=RUT_BACKFILL_BATCH, help="Filas por bloque")
+    args = parser.parse_args()
+    print(json.dumps(backfill(args.batch), indent=2))
@@ -1,168 +1,297 @@
-from pydantic import BaseModel, EmailStr, field_validator, ConfigDict, Field
-from typing import Optional
-from uuid import UUID
-from datetime import datetime
-import re 
-
-# --- FUNCIÓN AUXILIAR DE VALIDACIÓN DE RUT (MÓDULO 11) ---
-def validar_rut_chileno(rut: str) -> str:
-    """
-    Valida y formatea un RUT chileno usando el algoritmo Módulo 11.
-    Retorna el RUT limpio y formateado (ej: 12345678-5) o lanza ValueError.
-    """
-    if not rut:
-        raise ValueError("El RUT es obligatorio")
-        
-    # Limpieza: sacar puntos y guiones, pasar a mayúsculas
-    rut_limpio = rut.replace(".", "").replace("-", "").upper().strip()
-    
-    # Regex básico para formato (números + K al final)
-    if not re.match(r"^\d{1,8}[0-9K]$", rut_limpio):
-        raise ValueError("Formato de RUT inválido")
-
-    # Separar cuerpo y dígito verificador
-    cuerpo = rut_limpio[:-1]
-    dv_ingresado = rut_limpio[-1]
-
-    # Algoritmo Módulo 11
-    suma = 0
-    multiplo = 2
-    
-    for c in reversed(cuerpo):
-        suma += int(c) * multiplo
-        multiplo += 1
-        if multiplo == 8: 
-            multiplo = 2
-        
-    resultado = 11 - (suma % 11)
-    
-    if resultado == 11: 
-        dv_calculado = '0'
-    elif resultado == 10: 
-        dv_calculado = 'K'
-    else: 
-        dv_calculado = str(resultado)
-    
-    if dv_ingresado != dv_calculado:
-        raise ValueError("RUT inválido (Dígito verificador incorrecto)")
-    
-    return f"{cuerpo}-{dv_ingresado}"
-
-
-# --- ESQUEMAS DE SEGURIDAD (JWT) ---
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TokenData(BaseModel):
-    email: Optional[str] = None
-    role: Optional[str] = None
-    clinic_id: Optional[str] = None
-
-
-# --- ESQUEMAS DE USUARIO (STAFF) ---
-
-class UserBase(BaseModel):
-    email: EmailStr
-    full_name: Optional[str] = Field(None, max_length=100)
-    role: str = Field(default="RECEPTIONIST", pattern="^(ADMIN|DENTIST|RECEPTIONIST)$")
-
-class UserCreate(UserBase):
-    password: str = Field(min_length=12, max_length=50) # OWASP: Longitud mínima
-    clinic_id: Optional[UUID] = None # Opcional porque al registrar la clínica se crea el primer admin
-
-class UserResponse(UserBase):
-    id: UUID
-    clinic_id: UUID
-    is_active: bool
-    # SECURITY: Jamás devolvemos el password_hash
-
-    model_config = ConfigDict(from_attributes=True)
-
-
-# --- ESQUEMAS DE PACIENTES (NUEVO - REQUISITO CRUD) ---
-
-class PatientBase(BaseModel):
-    full_name: str = Field(min_length=3, max_length=100)
-    rut: str
-    email: Optional[EmailStr] = None
-    phone: Optional[str] = Field(None, max_length=20)
-    address: Optional[str] = Field(None, max_length=200)
-
-    # Validar RUT automáticamente al recibir datos
-    @field_validator('rut')
-    @classmethod
-    def validate_rut_field(cls, v):
-        return validar_rut_chileno(v)
-
-class PatientCreate(PatientBase):
-    pass # Hereda todo, sin campos extra por ahora
-
-class PatientResponse(PatientBase):
-    id: UUID
-    clinic_id: UUID
-    created_at: datetime
-    is_active: bool
-
-    model_config = ConfigDict(from_attributes=True)
-
-
-# --- ESQUEMAS DE CITAS (AGENDA) ---
-
-class AppointmentCreate(BaseModel):
-    doctor_id: UUID
-    start_time: datetime
-    end_time: datetime
-    
-    # Datos "Snapshot" del paciente (para agilidad en la demo)
-    patient_id: Optional[UUID] = None 
-    patient_name: str
-    patient_email: Optional[EmailStr] = None
-    patient_rut: str
-
-    @field_validator('patient_rut')
-    @classmethod
-    def validate_rut(cls, v):
-        return validar_rut_chileno(v)
-
-    @field_validator('end_time')
-    @classmethod
-    def validate_times(cls, v, info):
-        if 'start_time' in info.data and v <= info.data['start_time']:
-            raise ValueError('La hora de término debe ser posterior a la de inicio')
-        return v
-
-class AppointmentResponse(BaseModel):
-    id: UUID
-    start_time: datetime
-    end_time: datetime
-    status: str
-    doctor_id: UUID
-    patient_name: str
-    # patient_rut se omite en la respuesta pública por privacidad, o se puede incluir si es vista interna
-    
-    model_config = ConfigDict(from_attributes=True)
-
-# --- ESQUEMAS PÚBLICOS PARA EL GENERADOR DE SITIOS ---
-
-class DoctorPublicInfo(BaseModel):
-    full_name: str
-    # Omitimos email, id, etc. por seguridad
-
-    model_config = ConfigDict(from_attributes=True)
-
-class WebsiteConfigPublic(BaseModel):
-    logo_url: Optional[str] = None
-    primary_color: str
-    welcome_text: Optional[str] = None
-
-    model_config = ConfigDict(from_attributes=True)
-
-class PublicSiteData(BaseModel):
-    clinic_name: str
-    address: Optional[str] = None
-    phone: Optional[str] = None
-    config: WebsiteConfigPublic
-    doctors: list[DoctorPublicInfo]
-
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+from pydantic import BaseModel, EmailStr, field_validator, model_validator, ConfigDict, Field
+from typing import Literal, Optional
+from uuid import UUID
+from datetime import datetime
+import ruts
+
+# --- FUNCIÓN AUXILIAR DE VALIDACIÓN DE RUT (MÓDULO 11) ---
+def validar_rut_chileno(rut: str) -> str:
+    """
+    Valida y formatea un RUT chileno usando el algoritmo Módulo 11.
+    Retorna el RUT limpio y formateado (ej: 12345678-5) o lanza ValueError.
+    El resultado se memoiza por valor (ver ruts.py).
+    """
+    return ruts.normalize_rut(rut)
+
+
+# --- ESQUEMAS DE SEGURIDAD (JWT) ---
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class TokenData(BaseModel):
+    email: Optional[str] = None
+    role: Optional[str] = None
+    clinic_id: Optional[str] = None
+
+class UserPrincipal(BaseModel):
+    """
+    Identidad validada del usuario autenticado (snapshot inmutable).
+    Se cachea por token, por eso NO está ligada a una sesión de SQLAlchemy.
+    """
+    id: UUID
+    email: str
+    full_name: Optional[str] = None
+    role: Optional[str] = None
+    clinic_id: Optional[UUID] = None
+    is_active: bool = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
+# --- ESQUEMAS DE USUARIO (STAFF) ---
+
+class UserBase(BaseModel):
+    email: EmailStr
+    full_name: Optional[str] = Field(None, max_length=100)
+    role: str = Field(default="RECEPTIONIST", pattern="^(ADMIN|DENTIST|RECEPTIONIST)$")
+
+class UserCreate(UserBase):
+    password: str = Field(min_length=12, max_length=50) # OWASP: Longitud mínima
+    clinic_id: Optional[UUID] = None # Opcional porque al registrar la clínica se crea el primer admin
+
+# Los esquemas *Response son de SALIDA: sin validadores ni restricciones
+# (EmailStr, pattern, Módulo 11). Los datos ya se validaron al escribirse y
+# re-validarlos en cada fila de un listado es costo puro.
+class UserResponse(BaseModel):
+    id: UUID
+    email: str
+    full_name: Optional[str] = None
+    role: str
+    clinic_id: UUID
+    is_active: bool
+    # SECURITY: Jamás devolvemos el password_hash
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# --- ESQUEMAS DE PACIENTES (NUEVO - REQUISITO CRUD) ---
+
+class PatientBase(BaseModel):
+    full_name: str = Field(min_length=3, max_length=100)
+    rut: str
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = Field(None, max_length=20)
+    address: Optional[str] = Field(None, max_length=200)
+
+    # Validar RUT automáticamente al recibir datos
+    @field_validator('rut')
+    @classmethod
+    def validate_rut_field(cls, v):
+        return validar_rut_chileno(v)
+
+class PatientCreate(PatientBase):
+    pass # Hereda todo, sin campos extra por ahora
+
+class PatientResponse(BaseModel):
+    # Salida: mismos campos que PatientBase, sin validar el RUT otra vez
+    full_name: str
+    rut: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    id: UUID
+    clinic_id: UUID
+    created_at: datetime
+    is_active: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# --- IMPORTACIÓN MASIVA DE PACIENTES ---
+
+class BulkImportRowError(BaseModel):
+    row: int # Número de fila de datos (1 = primera fila después del encabezado)
+    rut: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    total_rows: int
+    inserted: int
+    duplicates: int
+    failed: int
+    errors: list[BulkImportRowError] # Truncado a BULK_MAX_REPORTED_ERRORS
+
+
+# --- ESQUEMAS DE CITAS (AGENDA) ---
+
+class AppointmentCreate(BaseModel):
+    doctor_id: UUID
+    start_time: datetime
+    end_time: datetime
+    
+    # Datos "Snapshot" del paciente (para agilidad en la demo)
+    patient_id: Optional[UUID] = None 
+    patient_name: str
+    patient_email: Optional[EmailStr] = None
+    patient_rut: str
+
+    @field_validator('patient_rut')
+    @classmethod
+    def validate_rut(cls, v):
+        return validar_rut_chileno(v)
+
+    @field_validator('end_time')
+    @classmethod
+    def validate_times(cls, v, info):
+        if 'start_time' in info.data and v <= info.data['start_time']:
+            raise ValueError('La hora de término debe ser posterior a la de inicio')
+        return v
+
+class AppointmentResponse(BaseModel):
+    id: UUID
+    start_time: datetime
+    end_time: datetime
+    status: str
+    doctor_id: UUID
+    patient_name: str
+    # patient_rut se omite en la respuesta pública por privacidad, o se puede incluir si es vista interna
+    
+    model_config = ConfigDict(from_attributes=True)
+
+# --- RESERVA EN LOTE (TRATAMIENTOS RECURRENTES) ---
+# Ortodoncia/implantes agendan 10-30 controles de una vez: o una lista
+# explícita de horarios, o un patrón tipo RRULE a partir de la primera cita.
+
+APPOINTMENT_BATCH_MAX = 60
+
+class AppointmentOccurrence(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+    @field_validator('end_time')
+    @classmethod
+    def validate_times(cls, v, info):
+        if 'start_time' in info.data and v <= info.data['start_time']:
+            raise ValueError('La hora de término debe ser posterior a la de inicio')
+        return v
+
+class AppointmentRecurrence(BaseModel):
+    # Se repite en hora local de la clínica (respeta el horario de verano)
+    frequency: Literal["DAILY", "WEEKLY", "MONTHLY"] = "WEEKLY"
+    interval: int = Field(1, ge=1, le=52)
+    count: Optional[int] = Field(None, ge=1, le=APPOINTMENT_BATCH_MAX)
+    until: Optional[datetime] = None
+
+    @model_validator(mode='after')
+    def validate_end(self):
+        if self.count is None and self.until is None:
+            raise ValueError('La recurrencia requiere count o until')
+        return self
+
+class AppointmentBatchCreate(BaseModel):
+    doctor_id: UUID
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+    # Opción A: lista explícita de horarios
+    occurrences: Optional[list[AppointmentOccurrence]] = Field(None, max_length=APPOINTMENT_BATCH_MAX)
+    # Opción B: primera cita + patrón de repetición
+    first: Optional[AppointmentOccurrence] = None
+    recurrence: Optional[AppointmentRecurrence] = None
+
+    # Datos "Snapshot" del paciente (iguales para todas las citas)
+    patient_id: Optional[UUID] = None
+    patient_name: str
+    patient_email: Optional[EmailStr] = None
+    patient_rut: str
+
+    @field_validator('patient_rut')
+    @classmethod
+    def validate_rut(cls, v):
+        return validar_rut_chileno(v)
+
+    @model_validator(mode='after')
+    def validate_source(self):
+        if bool(self.occurrences) == bool(self.first and self.recurrence):
+            raise ValueError('Envíe "occurrences" o bien "first" + "recurrence"')
+        return self
+
+class AppointmentBatchItem(BaseModel):
+    index: int
+    start_time: datetime
+    end_time: datetime
+    status: Literal["CREATED", "CONFLICT", "SKIPPED"]
+    appointment_id: Optional[UUID] = None
+    detail: Optional[str] = None
+
+class AppointmentBatchResult(BaseModel):
+    mode: str
+    created: int
+    conflicts: int
+    results: list[AppointmentBatchItem]
+
+class TimeSlot(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class DoctorAvailability(BaseModel):
+    doctor_id: UUID
+    slots: list[TimeSlot]
+
+# --- ESQUEMAS PÚBLICOS PARA EL GENERADOR DE SITIOS ---
+
+class DoctorPublicInfo(BaseModel):
+    full_name: str
+    # Omitimos email, id, etc. por seguridad
+
+    model_config = ConfigDict(from_attributes=True)
+
+class WebsiteConfigPublic(BaseModel):
+    logo_url: Optional[str] = None
+    primary_color: str
+    welcome_text: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PublicSiteData(BaseModel):
+    clinic_name: str
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    config: WebsiteConfigPublic
+    doctors: list[DoctorPublicInfo]
+
+    model_config = ConfigDict(from_attributes=True)
+# --- AUDITORÍA (CONSULTA DE CUMPLIMIENTO) ---
+
+class AuditLogResponse(BaseModel):
+    id: UUID
+    seq: Optional[int] = None
+    action: str
+    details: Optional[dict] = None
+    ip_address: Optional[str] = None
+    created_at: datetime
+    user_id: Optional[UUID] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+# --- SINCRONIZACIÓN INCREMENTAL (GET /sync) ---
+
+class SyncChanges(BaseModel):
+    appointments: list[AppointmentResponse]
+    patients: list[PatientResponse]
+    # Lápidas: ids que el cliente debe borrar de su copia local
+    deleted_appointments: list[UUID]
+    deleted_patients: list[UUID]
+    next_cursor: str
+    has_more: bool
+
+# --- DIAGNÓSTICO: CONSULTAS LENTAS (slow_queries.py) ---
+
+class SlowQuery(BaseModel):
+    fingerprint: str
+    # SQL normalizado: sin literales ni parámetros (Ley 19.628)
+    statement: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    first_seen: datetime
+    last_seen: datetime
+    # Salida de EXPLAIN (ANALYZE, BUFFERS), una línea por elemento
+    plan: Optional[list[str]] = None
+    plan_captured_at: Optional[datetime] = None
+
+class SlowQueryReport(BaseModel):
+    threshold_ms: float
+    explain_enabled: bool
+    queries: list[SlowQuery]
@@ -1,63 +1,332 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
-import models, database, schemas
-import os
-
-# CONFIGURACIÓN (En prod esto va a variables de entorno .env)
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
-
-# Contexto de Hashing (Bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Esquema de OAuth2 para Swagger UI
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-
-# --- FUNCIONES DE HASHING ---
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-# --- FUNCIONES JWT ---
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-# --- DEPENDENCIA DE USUARIO ACTUAL (El Guardián) ---
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from jose import JWTError, jwt
+from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models, database, schemas, hashing, metrics
+from cache import create_cache
+import os
+
+# CONFIGURACIÓN (En prod esto va a variables de entorno .env)
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+# Caché de identidades validadas (0 = deshabilitado)
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+# Entradas de la caché de identidades en cada proceso (aparte de CACHE_MAX_ENTRIES)
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 1024))
+
+# Operadores de la plataforma (emails separados por coma): los únicos que ven
+# diagnósticos globales, que cruzan clínicas. Un ADMIN es sólo de su clínica
+# y cualquiera puede registrarse como ADMIN de una clínica propia.
+PLATFORM_OPERATOR_EMAILS = {
+    email.strip().lower() for email in os.getenv("PLATFORM_OPERATOR_EMAILS", "").split(",") if email.strip()
+}
+
+# Pool de hashing: procesos dedicados a bcrypt (0 = hashing en línea)
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", 1))
+HASH_POOL_MAX_PENDING = int(os.getenv("HASH_POOL_MAX_PENDING", 16))
+HASH_POOL_QUEUE_TIMEOUT = float(os.getenv("HASH_POOL_QUEUE_TIMEOUT", 5))
+
+# Contexto de Hashing (Bcrypt)
+pwd_context = hashing.pwd_context
+
+# Esquema de OAuth2 para Swagger UI
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+# --- FUNCIONES DE HASHING ---
+# Cada bcrypt cuesta ~250ms de CPU. Para que una avalancha de logins (8:00 AM)
+# no deje sin CPU al resto de endpoints, el trabajo se envía a un pool de
+# procesos acotado. Si la cola está llena más de HASH_POOL_QUEUE_TIMEOUT
+# segundos respondemos 503 (back-pressure) en lugar de acumular requests.
+# Las rutas de login/registro son async: esperan su turno y el bcrypt como
+# corrutinas, sin ocupar un hilo del threadpool ni una conexión del pool
+# (cierran la sesión antes de hashear).
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(max(HASH_POOL_MAX_PENDING, 1))
+# Mismo cupo para las rutas async (un event loop por worker)
+_hash_slots_async = asyncio.Semaphore(max(HASH_POOL_MAX_PENDING, 1))
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS)
+        return _hash_pool
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=True, cancel_futures=True)
+            _hash_pool = None
+
+def _hashing_saturated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servicio de autenticación saturado, reintente en unos segundos",
+        headers={"Retry-After": "2"},
+    )
+
+def _run_hashing(fn, *args):
+    # Camino sync: scripts (populate_demo) y llamadas fuera de un request
+    if HASH_POOL_WORKERS <= 0:
+        return fn(*args)
+
+    if not _hash_slots.acquire(timeout=HASH_POOL_QUEUE_TIMEOUT):
+        raise _hashing_saturated()
+    try:
+        return _get_hash_pool().submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+async def _run_hashing_async(fn, *args):
+    if HASH_POOL_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+
+    try:
+        await asyncio.wait_for(_hash_slots_async.acquire(), HASH_POOL_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _hashing_saturated()
+    try:
+        return await asyncio.wrap_future(_get_hash_pool().submit(fn, *args))
+    finally:
+        _hash_slots_async.release()
+
+def verify_password(plain_password, hashed_password):
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password, hashed_password):
+    """
+    Verifica la contraseña y, si el hash usa un costo obsoleto, retorna
+    también el hash re-generado para persistirlo (rehash transparente).
+    """
+    return _run_hashing(hashing.verify_and_update, plain_password, hashed_password)
+
+def get_password_hash(password):
+    return _run_hashing(hashing.hash_password, password)
+
+# Variantes async: la espera (cola + bcrypt) es un await, no un hilo bloqueado
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await _run_hashing_async(hashing.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_hashing_async(hashing.hash_password, password)
+
+# --- FUNCIONES JWT ---
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=15)
+    
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def token_expiry(token: str) -> Optional[float]:
+    """`exp` (epoch) de un token ya validado; None si no tiene."""
+    return jwt.get_unverified_claims(token).get("exp")
+
+# --- CACHÉ DE IDENTIDADES (TOKEN -> USUARIO) ---
+# Evita un SELECT a `users` en cada request autenticado. La entrada vive
+# como máximo AUTH_CACHE_TTL_SECONDS o hasta que expire el token, lo que
+# ocurra primero. Usa su propia caché (cache.create_cache) acotada a
+# AUTH_CACHE_MAX_SIZE: los tokens de una clínica con mucho movimiento no
+# desplazan sitios públicos ni disponibilidad, ni al revés. Con
+# CACHE_REDIS_URL la comparten todos los workers, y también la invalidación.
+# Cada usuario tiene una "generación" que forma parte de la entrada: al
+# confirmarse un cambio a su fila se borra y sus tokens cacheados dejan de
+# valer de una vez (mismo esquema que availability.clinic_generation).
+
+AUTH_GLOBAL_GENERATION_KEY = "auth:gen:*"
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.store = create_cache(max_size)
+        # Aciertos/fallos de ESTE proceso (la caché puede ser compartida)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # El token no se guarda tal cual en la caché compartida
+        return "auth:principal:" + hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _generation_key(email: str) -> str:
+        return f"auth:gen:{email.lower()}"
+
+    def _generation(self, key: str) -> str:
+        generation = self.store.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex[:8]
+            self.store.set(key, generation, max(self.ttl_seconds, 1) * 12)
+        return generation
+
+    def generation(self, email: str) -> str:
+        """
+        Generación vigente del usuario. Se lee ANTES de consultar la BD: si
+        un cambio se confirma en medio, lo cacheado queda con la generación
+        vieja y nunca se sirve.
+        """
+        return self._generation(AUTH_GLOBAL_GENERATION_KEY) + "." + self._generation(self._generation_key(email))
+
+    def get(self, token: str) -> Optional[schemas.UserPrincipal]:
+        cached = self.store.get(self._key(token))
+        if cached is not None:
+            generation, payload = cached.split("\n", 1)
+            principal = schemas.UserPrincipal.model_validate_json(payload)
+            if generation == self.generation(principal.email):
+                self._count(hit=True)
+                return principal
+        self._count(hit=False)
+        return None
+
+    def put(self, token: str, principal: schemas.UserPrincipal, generation: str, token_exp: Optional[float] = None):
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            ttl = min(ttl, int(token_exp - time.time()))
+        if ttl <= 0:
+            return
+        self.store.set(self._key(token), f"{generation}\n{principal.model_dump_json()}", ttl)
+
+    def invalidate_subjects(self, emails):
+        """Descarta todos los tokens cacheados de esos usuarios (rol, baja, etc.)."""
+        self.store.delete(*(self._generation_key(email) for email in emails))
+
+    def clear(self):
+        self.store.delete(AUTH_GLOBAL_GENERATION_KEY)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits_total": self.hits, "misses_total": self.misses}
+
+principal_cache = PrincipalCache(AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+# Cualquier cambio a un User (rol, desactivación, email, clínica) invalida
+# sus identidades cacheadas. Se anota en el flush y se aplica tras el COMMIT:
+# antes, otro request podría volver a cachear la fila sin el cambio.
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    emails = session.info.setdefault("auth_invalidations", set())
+    for obj in [*session.dirty, *session.deleted]:
+        if isinstance(obj, models.User):
+            emails.add(obj.email)
+            # Si cambió el email, los tokens emitidos con el anterior también caen
+            emails.update(e for e in inspect(obj).attrs.email.history.deleted if e)
+
+# UPDATE / DELETE masivos (Query.update(), update(User)) no pasan por el
+# flush: no se sabe a quién tocaron, así que se invalida a todos
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is inspect(models.User):
+        orm_execute_state.session.info["auth_invalidate_all"] = True
+
+@event.listens_for(Session, "after_commit")
+def _flush_user_invalidations(session):
+    emails = session.info.pop("auth_invalidations", set())
+    if emails:
+        principal_cache.invalidate_subjects(emails)
+    if session.info.pop("auth_invalidate_all", False):
+        principal_cache.clear()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_user_invalidations(session, previous_transaction):
+    # Un SAVEPOINT revertido no descarta lo pendiente de la transacción externa
+    if previous_transaction.nested:
+        return
+    session.info.pop("auth_invalidations", None)
+    session.info.pop("auth_invalidate_all", None)
+
+# --- DEPENDENCIA DE USUARIO ACTUAL (El Guardián) ---
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    with metrics.phase("auth"):
+        # Camino rápido: token ya validado recientemente por este proceso
+        if principal_cache.enabled:
+            cached = principal_cache.get(token)
+            if cached is not None:
+                return cached
+        return _resolve_principal(token, db)
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
+    """Variante para las rutas async (DATABASE_ASYNC=true)."""
+    with metrics.phase("auth"):
+        if principal_cache.enabled:
+            # Con CACHE_REDIS_URL la lectura es de red: fuera del event loop
+            cached = await run_in_threadpool(principal_cache.get, token)
+            if cached is not None:
+                return cached
+        return await db.run_sync(lambda session: _resolve_principal(token, session))
+
+def require_roles(*roles: str):
+    """
+    Dependencia que además exige uno de los roles indicados (ej. ADMIN).
+    Uso: current_user = Depends(security.require_roles("ADMIN"))
+    """
+    def checker(current_user: schemas.UserPrincipal = Depends(get_current_user)):
+        if current_user.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tiene permisos para este recurso")
+        return current_user
+    return checker
+
+def require_platform_operator(current_user: schemas.UserPrincipal = Depends(get_current_user)):
+    """Dependencia para datos de toda la plataforma: sólo PLATFORM_OPERATOR_EMAILS."""
+    if current_user.email.lower() not in PLATFORM_OPERATOR_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tiene permisos para este recurso")
+    return current_user
+
+def _resolve_principal(token: str, db: Session):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+        token_data = schemas.TokenData(email=email)
+    except JWTError:
+        raise credentials_exception
+        
+    generation = principal_cache.generation(token_data.email) if principal_cache.enabled else None
+    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    if user is None or not user.is_active:
+        raise credentials_exception
+
+    principal = schemas.UserPrincipal.model_validate(user)
+    if principal_cache.enabled:
+        principal_cache.put(token, principal, generation, payload.get("exp"))
+    return principal
\ No newline at end of file
@@ -0,0 +1,167 @@
+from gunicorn.app.base import BaseApplication
+from typing import Optional
+from uvicorn.workers import UvicornWorker
+import math
+import os
+import sys
+import time
+
+# --- SERVIDOR DE PRODUCCIÓN (PREFORK) ---
+# `python serve.py` (ver Dockerfile, después de `python migrate.py`):
+# - N workers uvicorn bajo gunicorn, N según la cuota de CPU del cgroup
+#   (límite `cpus` de docker-compose / ECS), no según los núcleos del host.
+# - preload_app: main.py se importa UNA vez en el proceso maestro y los
+#   workers nacen por fork ya listos (arranque en frío < 1 s, medido con
+#   benchmarks/cold_start.py). Nada abre conexiones al importar.
+# - SIGTERM: deja de aceptar conexiones, espera los requests en curso hasta
+#   GRACEFUL_TIMEOUT y corta los SSE que sigan abiertos; luego corre el
+#   lifespan de cada worker (auditoría pendiente, LISTEN, pools).
+# - Presupuesto de conexiones: DB_CONNECTION_BUDGET es el total que puede
+#   abrir el contenedor; se reparte entre los workers ANTES de importar
+#   database.py (que lee DB_POOL_SIZE / DB_MAX_OVERFLOW del entorno). Cada
+#   worker abre un pool por motor (el principal, el async con
+#   DATABASE_ASYNC y uno por réplica) más conexiones sueltas (LISTEN de la
+#   agenda y, en Postgres, el EXPLAIN del muestreo de consultas lentas).
+# - Varios workers sólo con CACHE_REDIS_URL: con la caché local de cada
+#   proceso las invalidaciones (disponibilidad, sitio público) y la marca
+#   read-your-writes de las réplicas sólo las ve el worker que atendió la
+#   escritura. Sin Redis se levanta un único worker.
+
+BOOT_STARTED = time.perf_counter()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+# Fija la cantidad de workers (sin él se calcula desde la cuota de CPU)
+WEB_CONCURRENCY = os.getenv("WEB_CONCURRENCY")
+WORKERS_PER_CPU = float(os.getenv("WORKERS_PER_CPU", 1))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", 8))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", 60))
+# Conexiones propias de cada worker fuera del pool (LISTEN de la agenda en vivo)
+DB_RESERVED_PER_WORKER = int(os.getenv("DB_RESERVED_PER_WORKER", 1))
+# Mismas variables que database.py / replicas.py / cache.py (sin importarlos:
+# el presupuesto se calcula antes)
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+DATABASE_REPLICA_URLS = [url for url in os.getenv("DATABASE_REPLICA_URL", "").split(",") if url.strip()]
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+# --- DIMENSIONAMIENTO ---
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs asignadas por el cgroup (v2 o v1); None si no hay cuota."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def available_cpus() -> float:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+def worker_count() -> int:
+    if WEB_CONCURRENCY:
+        workers = max(1, int(WEB_CONCURRENCY))
+        if workers > 1 and not CACHE_REDIS_URL:
+            sys.exit(
+                f"WEB_CONCURRENCY={workers} requiere CACHE_REDIS_URL: con la caché local "
+                "cada worker vería sólo sus propias invalidaciones"
+            )
+        return workers
+    # Hacia abajo: con 1.5 CPU, 2 workers se pelearían la cuota (throttling)
+    workers = max(1, min(MAX_WORKERS, math.floor(available_cpus() * WORKERS_PER_CPU)))
+    if workers > 1 and not CACHE_REDIS_URL:
+        print(
+            f"ADVERTENCIA: hay CPU para {workers} workers pero sin CACHE_REDIS_URL se levanta "
+            "uno solo (la caché local no se comparte entre procesos)",
+            file=sys.stderr,
+        )
+        return 1
+    return workers
+
+def pools_per_worker() -> int:
+    return 1 + int(DATABASE_ASYNC) + len(DATABASE_REPLICA_URLS)
+
+def reserved_per_worker() -> int:
+    # EXPLAIN ANALYZE del muestreo: motor sin pool, a lo más uno a la vez
+    explain = 1 if DATABASE_URL.startswith("postgres") else 0
+    return DB_RESERVED_PER_WORKER + explain
+
+def pool_budget(workers: int) -> dict:
+    """
+    pool_size / max_overflow de CADA motor para que
+    workers x (motores x (pool + overflow) + reservadas) no supere
+    DB_CONNECTION_BUDGET. Sin presupuesto explícito se mantiene lo que
+    usaba un solo proceso.
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    pools, reserved = pools_per_worker(), reserved_per_worker()
+    budget = int(os.getenv("DB_CONNECTION_BUDGET", pools * (pool_size + max_overflow) + reserved))
+    per_pool = max(1, (budget // workers - reserved) // pools)
+    size = min(pool_size, per_pool)
+    return {"DB_POOL_SIZE": size, "DB_MAX_OVERFLOW": per_pool - size}
+
+# --- GANCHOS DE GUNICORN ---
+
+def _post_fork(server, worker):
+    # Por si el maestro llegó a abrir alguna conexión: el socket no se comparte entre procesos
+    import database
+    database.engine.dispose(close=False)
+
+def _when_ready(server):
+    server.log.info("App precargada y socket abierto en %.0f ms", (time.perf_counter() - BOOT_STARTED) * 1000)
+
+def _worker_exit(server, worker):
+    import database
+    database.engine.dispose()
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """Worker uvicorn que, al recibir SIGTERM, corta los SSE antes de que gunicorn lo mate."""
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "timeout_graceful_shutdown": max(GRACEFUL_TIMEOUT - 5, 1),
+    }
+
+
+class OdontoApplication(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import main
+        return main.app
+
+
+if __name__ == "__main__":
+    workers = worker_count()
+    os.environ.update({key: str(value) for key, value in pool_budget(workers).items()})
+    OdontoApplication({
+        "bind": f"{HOST}:{PORT}",
+        "workers": workers,
+        "worker_class": "serve.DrainingUvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": WORKER_TIMEOUT,
+        "keepalive": 5,
+        "post_fork": _post_fork,
+        "when_ready": _when_ready,
+        "worker_exit": _worker_exit,
+    }).run()
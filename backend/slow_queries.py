@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Optional
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+# --- MUESTREO DE CONSULTAS LENTAS ---
+# Los hooks de database.py avisan cada sentencia que supera SLOW_QUERY_MS.
+# Se agrupan por huella (SQL normalizado, sin literales ni parámetros) en una
+# tabla en memoria acotada a SLOW_QUERY_TOP_N entradas; al llenarse se
+# descarta la de menor tiempo acumulado. A una muestra de los SELECT lentos
+# se les captura EXPLAIN (ANALYZE, BUFFERS) en segundo plano, con una
+# conexión aparte (ver database.py), para no frenar el request.
+# Ley 19.628: nunca se guardan los parámetros (nombres, RUT), y los
+# literales que Postgres imprime en el plan (textos y números de cada
+# condición) se reemplazan por '?'. La tabla es de todo el proceso, con
+# consultas de todas las clínicas: sólo la ven los operadores de la
+# plataforma (security.require_platform_operator).
+
+logger = logging.getLogger("odonto.slow_queries")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", 50))
+# Fracción de las sentencias lentas que se re-ejecutan con EXPLAIN ANALYZE
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", 0.1))
+# Como máximo un plan por huella en esta ventana (EXPLAIN ANALYZE repite la consulta)
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", 300))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 5000))
+
+# --- NORMALIZACIÓN Y HUELLA ---
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """
+    SQL sin literales ni parámetros: dos ejecuciones de la misma consulta con
+    distintos valores (o distinto largo de IN / VALUES) quedan iguales.
+    Las sentencias salen de la caché de compilación de SQLAlchemy, así que
+    se repiten y el lru_cache evita las regex en el camino caliente.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub("VALUES (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+# EXPLAIN ANALYZE ejecuta la sentencia: sólo lecturas sin bloqueos ni efectos
+_SIDE_EFFECTS = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b|advisory|nextval|setval|pg_notify",
+    re.IGNORECASE,
+)
+
+def explainable(statement: str) -> bool:
+    return statement.lstrip()[:6].upper() == "SELECT" and not _SIDE_EFFECTS.search(statement)
+
+# Líneas del plan con una expresión de la consulta (Index Cond, Filter,
+# Hash Cond, Sort Key, Output...). En el resto los números son del plan
+# (cost, rows, Buffers, tiempos) y se conservan.
+_PLAN_CONDITION = re.compile(r"^(?!\s*Rows Removed)\s*[A-Za-z -]*(?:Cond|Filter|Key|Order By|Output):")
+
+def scrub_plan(lines: list) -> list:
+    """
+    Quita del plan los literales que trae cada condición: textos
+    ('%juan%', '12345678'::text) y números (rut_body = 12345678).
+    """
+    scrubbed = []
+    for line in lines:
+        line = _STRING.sub("'?'", line)
+        if _PLAN_CONDITION.match(line):
+            line = _NUMBER.sub("?", line)
+        scrubbed.append(line)
+    return scrubbed
+
+
+class SlowQueryLog:
+    """Top-N de sentencias lentas por huella, con su último plan muestreado."""
+
+    def __init__(
+        self,
+        explain: Optional[Callable[[str, object], list]] = None,
+        threshold_ms: float = SLOW_QUERY_MS,
+        max_entries: int = SLOW_QUERY_TOP_N,
+        explain_rate: float = SLOW_QUERY_EXPLAIN_RATE,
+        explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL,
+    ):
+        self.explain = explain
+        self.threshold = threshold_ms / 1000
+        self.max_entries = max_entries
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Un solo hilo y a lo más un plan en curso: con la BD ya lenta no
+        # apilamos más EXPLAIN ANALYZE encima
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._explaining = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_entries > 0
+
+    def record(self, statement: str, parameters, elapsed: float, can_explain: bool = True):
+        """Llamado desde after_cursor_execute con el tiempo de la sentencia (segundos)."""
+        if not self.enabled or elapsed < self.threshold:
+            return
+        normalized = normalize_sql(statement)
+        key = fingerprint(normalized)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    coldest = min(self._entries, key=lambda k: self._entries[k]["total_seconds"])
+                    del self._entries[coldest]
+                entry = self._entries[key] = {
+                    "fingerprint": key,
+                    "statement": normalized,
+                    "calls": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "first_seen": now,
+                    "last_seen": now,
+                    "plan": None,
+                    "plan_captured_at": None,
+                    "plan_requested_at": 0.0,
+                }
+            entry["calls"] += 1
+            entry["total_seconds"] += elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+            entry["last_seen"] = now
+            sample = (
+                can_explain
+                and self.explain is not None
+                and not self._explaining
+                and now - entry["plan_requested_at"] >= self.explain_interval
+                and random.random() < self.explain_rate
+                and explainable(statement)
+            )
+            if sample:
+                entry["plan_requested_at"] = now
+                self._explaining = True
+        logger.warning("Consulta lenta (%.1f ms) [%s]: %s", elapsed * 1000, key, normalized[:300])
+        if sample:
+            self._executor.submit(self._capture_plan, key, statement, parameters)
+
+    def _capture_plan(self, key: str, statement: str, parameters):
+        try:
+            plan = scrub_plan(self.explain(statement, parameters))
+        except Exception as exc:
+            logger.info("No se pudo capturar el plan de %s: %s", key, exc)
+            return
+        finally:
+            with self._lock:
+                self._explaining = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["plan_captured_at"] = time.time()
+
+    def top(self, limit: int = SLOW_QUERY_TOP_N, order_by: str = "total") -> list:
+        sort_key = {"total": "total_seconds", "max": "max_seconds", "calls": "calls"}[order_by]
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e[sort_key], reverse=True)[:limit]
+            return [_public(entry) for entry in entries]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value, timezone.utc).isoformat() if value else None
+
+def _public(entry: dict) -> dict:
+    return {
+        "fingerprint": entry["fingerprint"],
+        "statement": entry["statement"],
+        "calls": entry["calls"],
+        "total_ms": round(entry["total_seconds"] * 1000, 2),
+        "mean_ms": round(entry["total_seconds"] / entry["calls"] * 1000, 2),
+        "max_ms": round(entry["max_seconds"] * 1000, 2),
+        "first_seen": _timestamp(entry["first_seen"]),
+        "last_seen": _timestamp(entry["last_seen"]),
+        "plan": entry["plan"],
+        "plan_captured_at": _timestamp(entry["plan_captured_at"]),
+    }
@@ -0,0 +1,69 @@
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+import models
+
+# --- SECUENCIA DE CAMBIOS (SINCRONIZACIÓN INCREMENTAL) ---
+# Toda escritura de Appointment/Patient queda marcada con un change_seq.
+# GET /sync?since= devuelve sólo lo posterior al cursor del cliente, en
+# orden (change_seq, tipo, id).
+# En Postgres el change_seq es el id de la transacción (pg_current_xact_id,
+# xid8: crece siempre) y no se bloquea nada: dos reservas de una misma
+# clínica avanzan en paralelo. Como las transacciones no confirman en el
+# orden de su id, la lectura sólo entrega filas de transacciones anteriores
+# al horizonte `xmin` (todas ya terminadas, ver visible_horizon): un cliente
+# que leyó hasta N nunca verá aparecer después un cambio con secuencia <= N.
+# Una transacción larga retrasa la sincronización, nunca le hace perder cambios.
+# En otros motores (SQLite en desarrollo, un solo escritor) se usa el
+# contador por clínica models.SyncCounter.
+
+SYNCED_MODELS = (models.Appointment, models.Patient)
+
+XACT_ID_QUERY = text("SELECT pg_current_xact_id()::text::bigint")
+HORIZON_QUERY = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+def next_change_seq(db: Session, clinic_id) -> int:
+    """
+    change_seq de la transacción en curso para `clinic_id`. Todas las
+    escrituras de una transacción comparten el mismo valor.
+    """
+    cache = db.info.setdefault("change_seq", {})
+    if clinic_id not in cache:
+        if db.get_bind().dialect.name == "postgresql":
+            cache[clinic_id] = db.execute(XACT_ID_QUERY).scalar_one()
+            return cache[clinic_id]
+        cache[clinic_id] = db.execute(
+            pg_insert(models.SyncCounter)
+            .values(clinic_id=clinic_id, seq=1)
+            .on_conflict_do_update(
+                index_elements=[models.SyncCounter.clinic_id],
+                set_={"seq": models.SyncCounter.seq + 1}
+            )
+            .returning(models.SyncCounter.seq)
+        ).scalar_one()
+    return cache[clinic_id]
+
+def visible_horizon(db: Session):
+    """
+    Límite (exclusivo) de change_seq que ya se puede entregar: toda
+    transacción con id menor terminó. None fuera de Postgres.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return db.execute(HORIZON_QUERY).scalar_one()
+
+@event.listens_for(Session, "before_flush")
+def _stamp_change_seq(session, flush_context, instances):
+    for obj in [*session.new, *session.dirty]:
+        if isinstance(obj, SYNCED_MODELS) and obj.clinic_id is not None:
+            if obj in session.new or session.is_modified(obj):
+                obj.change_seq = next_change_seq(session, obj.clinic_id)
+
+@event.listens_for(Session, "after_commit")
+def _reset_change_seq(session):
+    session.info.pop("change_seq", None)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_change_seq(session, previous_transaction):
+    # También con un SAVEPOINT: el incremento del contador (SQLite) pudo revertirse
+    session.info.pop("change_seq", None)
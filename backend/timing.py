@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from starlette.datastructures import MutableHeaders
+from sqlalchemy import event
+import json
+import logging
+import os
+import database, metrics, security
+
+# --- TIEMPOS POR REQUEST ---
+# Cada request HTTP lleva un metrics.RequestStats: los hooks de database.py
+# le suman consultas, tiempo en BD y filas; metrics.phase() mide tramos como
+# auth o serialize. Al terminar se publica en tres lugares:
+# - header Server-Timing (visible en las DevTools del navegador),
+# - una línea JSON en el logger "odonto.requests",
+# - histogramas por ruta en GET /metrics (formato Prometheus).
+
+logger = logging.getLogger("odonto.requests")
+
+# El header revela cuánto tarda la BD: se puede apagar si la API es pública
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+# Sobre este umbral el log del request sube a WARNING
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 1000))
+
+route_metrics = metrics.RouteMetrics()
+
+def _route_template(scope) -> str:
+    # Starlette deja la ruta resuelta en el scope; sin ella (404) no se usa
+    # el path real para no crear una serie por cada URL inventada
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def server_timing(stats: metrics.RequestStats, total: float) -> str:
+    parts = [f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries, {stats.rows} rows"']
+    parts += [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in stats.phases.items()]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+class TimingMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware: no bufferiza el streaming de
+    /appointments/stream). El Server-Timing se agrega al enviar los headers;
+    el log y los histogramas se registran cuando termina la respuesta.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        response = {"status": 500, "streaming": False}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                response["streaming"] = headers.get("content-type", "").startswith("text/event-stream")
+                if SERVER_TIMING:
+                    headers.append("Server-Timing", server_timing(stats, stats.elapsed()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.current_request.reset(token)
+            self._record(scope, stats, response)
+
+    def _record(self, scope, stats: metrics.RequestStats, response: dict):
+        duration = stats.elapsed()
+        route = _route_template(scope)
+        # Un SSE dura minutos: distorsionaría los histogramas de latencia
+        if not response["streaming"]:
+            route_metrics.observe(scope["method"], route, response["status"], duration, stats)
+        level = logging.WARNING if duration * 1000 >= SLOW_REQUEST_MS and not response["streaming"] else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                "method": scope["method"],
+                "route": route,
+                "path": scope["path"],
+                "status": response["status"],
+                "duration_ms": round(duration * 1000, 2),
+                "db_ms": round(stats.db_time * 1000, 2),
+                "queries": stats.queries,
+                "rows": stats.rows,
+                "phases_ms": {name: round(elapsed * 1000, 2) for name, elapsed in stats.phases.items()},
+            }))
+
+def prometheus_text() -> str:
+    return metrics.render_prometheus(route_metrics, database.pool_metrics, security.principal_cache.stats())
+
+
+# --- GUARDIA N+1 (pruebas y scripts) ---
+# Uso:
+#     with timing.assert_max_queries(3):
+#         client.get("/patients/?limit=50", headers=headers)
+# Escucha el motor directamente (no el contexto del request): funciona igual
+# con TestClient, que atiende el request en otro hilo.
+
+@contextmanager
+def count_queries(engine=None):
+    """Lista con cada sentencia SQL ejecutada dentro del bloque."""
+    target = engine or database.engine
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", _capture)
+
+@contextmanager
+def assert_max_queries(limit: int, engine=None):
+    """Falla (AssertionError) si el bloque ejecuta más de `limit` consultas."""
+    with count_queries(engine) as statements:
+        yield statements
+    if len(statements) > limit:
+        listed = "\n".join(f"  {i}. {' '.join(s.split())[:200]}" for i, s in enumerate(statements, 1))
+        raise AssertionError(f"{len(statements)} consultas, máximo {limit} (¿N+1?):\n{listed}")